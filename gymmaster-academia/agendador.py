@@ -0,0 +1,294 @@
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Agendador de tarefas de manutenção em segundo plano
+
+
+class ExpressaoCron:
+    """Expressão cron de 5 campos (minuto hora dia mês dia-da-semana)
+
+    Aceita '*', '*/n', 'a-b', 'a-b/n' e listas separadas por vírgula.
+    O dia da semana vai de 0 (domingo) a 6 (sábado). Como no cron, quando dia
+    do mês e dia da semana são ambos restritos (não começam por '*'), basta
+    um dos dois corresponder.
+    """
+
+    LIMITES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expressao):
+        self.expressao = expressao
+        campos = expressao.split()
+        if len(campos) != 5:
+            raise ValueError(f"Expressão cron inválida: {expressao!r}")
+
+        self.minutos, self.horas, self.dias, self.meses, self.dias_semana = (
+            self._expandir(campo, minimo, maximo)
+            for campo, (minimo, maximo) in zip(campos, self.LIMITES)
+        )
+        self.dia_ou_semana = not campos[2].startswith('*') and not campos[4].startswith('*')
+
+    @staticmethod
+    def _expandir(campo, minimo, maximo):
+        """Converte um campo cron no conjunto de valores aceitos"""
+        valores = set()
+        for parte in campo.split(','):
+            faixa, _, passo = parte.partition('/')
+            passo = int(passo) if passo else 1
+
+            if faixa == '*':
+                inicio, fim = minimo, maximo
+            elif '-' in faixa:
+                inicio, fim = (int(v) for v in faixa.split('-'))
+            else:
+                inicio = fim = int(faixa)
+
+            if inicio < minimo or fim > maximo or inicio > fim or passo < 1:
+                raise ValueError(f"Campo cron fora do intervalo: {campo!r}")
+            valores.update(range(inicio, fim + 1, passo))
+        return frozenset(valores)
+
+    def corresponde(self, momento):
+        """Indica se a expressão dispara no minuto informado"""
+        no_dia = momento.day in self.dias
+        na_semana = momento.isoweekday() % 7 in self.dias_semana
+        return (momento.minute in self.minutos
+                and momento.hour in self.horas
+                and momento.month in self.meses
+                and ((no_dia or na_semana) if self.dia_ou_semana else (no_dia and na_semana)))
+
+
+class Tarefa:
+    def __init__(self, nome, cron, funcao, descricao=""):
+        self.nome = nome
+        self.cron = ExpressaoCron(cron)
+        self.funcao = funcao
+        self.descricao = descricao
+        self.trava = threading.Lock()
+
+
+class Agendador:
+    """Executa tarefas cron numa thread de fundo, uma instância por servidor
+
+    Cada tarefa roda no máximo uma vez por minuto agendado, mesmo com vários
+    processos apontando para o mesmo banco: a posse da execução é disputada
+    numa linha de tarefas_agendadas com prazo de expiração.
+    """
+
+    def __init__(self, db_name='academia.db', intervalo=20, max_execucoes=2,
+                 duracao_maxima=3600):
+        self.db_name = db_name
+        self.intervalo = intervalo
+        self.duracao_maxima = duracao_maxima
+        self.dono = f"{uuid.uuid4().hex[:8]}"
+        self.tarefas = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_execucoes, thread_name_prefix="agendador")
+        self._parar = threading.Event()
+        self._thread = None
+        self.init_tabelas()
+
+    def init_tabelas(self):
+        """Cria as tabelas de controle e histórico das tarefas"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tarefas_agendadas (
+                nome TEXT PRIMARY KEY,
+                ultimo_agendamento TEXT,
+                dono TEXT,
+                bloqueada_ate REAL DEFAULT 0
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS execucoes_tarefas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL,
+                inicio TEXT NOT NULL,
+                duracao_ms INTEGER,
+                status TEXT,
+                mensagem TEXT
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_execucoes_tarefas_inicio
+            ON execucoes_tarefas (inicio)
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def registrar(self, nome, cron, funcao, descricao=""):
+        """Registra uma tarefa com sua expressão cron"""
+        self.tarefas[nome] = Tarefa(nome, cron, funcao, descricao)
+
+    def iniciar(self):
+        """Inicia a thread do agendador (chamadas repetidas são ignoradas)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="agendador", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """Interrompe o agendador e aguarda as execuções em curso"""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def executar_agora(self, nome):
+        """Dispara uma tarefa imediatamente, fora do horário agendado"""
+        return self._executor.submit(self._executar, self.tarefas[nome], None)
+
+    def _loop(self):
+        """Verifica as expressões cron a cada minuto novo"""
+        ultimo_minuto = None
+        while not self._parar.is_set():
+            minuto = datetime.now().replace(second=0, microsecond=0)
+            if minuto != ultimo_minuto:
+                for tarefa in self.tarefas.values():
+                    if tarefa.cron.corresponde(minuto):
+                        self._executor.submit(
+                            self._executar, tarefa, minuto.strftime('%Y-%m-%d %H:%M'))
+                ultimo_minuto = minuto
+            self._parar.wait(self.intervalo)
+
+    def _adquirir(self, tarefa, agendamento):
+        """Tenta tomar a posse da execução agendada (entre threads e processos)
+
+        Execuções manuais (agendamento None) só respeitam a trava, sem consumir
+        o minuto agendado.
+        """
+        agora = time.time()
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        try:
+            cursor = conn.execute('''
+                INSERT INTO tarefas_agendadas (nome, ultimo_agendamento, dono, bloqueada_ate)
+                VALUES (:nome, :agendamento, :dono, :ate)
+                ON CONFLICT(nome) DO UPDATE SET
+                    ultimo_agendamento = COALESCE(excluded.ultimo_agendamento,
+                                                  tarefas_agendadas.ultimo_agendamento),
+                    dono = excluded.dono,
+                    bloqueada_ate = excluded.bloqueada_ate
+                WHERE tarefas_agendadas.bloqueada_ate < :agora
+                AND (excluded.ultimo_agendamento IS NULL
+                     OR tarefas_agendadas.ultimo_agendamento IS NULL
+                     OR tarefas_agendadas.ultimo_agendamento < excluded.ultimo_agendamento)
+            ''', {'nome': tarefa.nome, 'agendamento': agendamento, 'dono': self.dono,
+                  'ate': agora + self.duracao_maxima, 'agora': agora})
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def _liberar(self, tarefa):
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        try:
+            conn.execute('''
+                UPDATE tarefas_agendadas SET bloqueada_ate = 0
+                WHERE nome = ? AND dono = ?
+            ''', (tarefa.nome, self.dono))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _executar(self, tarefa, agendamento):
+        """Executa a tarefa se ninguém mais estiver com ela e grava o histórico"""
+        if not tarefa.trava.acquire(blocking=False):
+            return None
+        try:
+            if not self._adquirir(tarefa, agendamento):
+                return None
+
+            inicio = datetime.now()
+            status, mensagem = 'sucesso', None
+            try:
+                resultado = tarefa.funcao()
+                if resultado is not None:
+                    mensagem = str(resultado)
+            except Exception as e:
+                status, mensagem = 'erro', f"{e}\n{traceback.format_exc(limit=3)}"
+            finally:
+                self._liberar(tarefa)
+
+            duracao_ms = int((datetime.now() - inicio).total_seconds() * 1000)
+            self._registrar_execucao(
+                tarefa.nome, inicio, duracao_ms, status, mensagem)
+            return status
+        finally:
+            tarefa.trava.release()
+
+    def _registrar_execucao(self, nome, inicio, duracao_ms, status, mensagem):
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        try:
+            conn.execute('''
+                INSERT INTO execucoes_tarefas (nome, inicio, duracao_ms, status, mensagem)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (nome, inicio.strftime('%Y-%m-%d %H:%M:%S'), duracao_ms, status, mensagem))
+
+            # Mantém só os últimos 90 dias de histórico
+            limite = (inicio - timedelta(days=90)).strftime('%Y-%m-%d')
+            conn.execute(
+                "DELETE FROM execucoes_tarefas WHERE inicio < ?", (limite,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_historico(self, limite=50):
+        """Retorna as últimas execuções com suas durações"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT nome, inicio, duracao_ms, status, mensagem
+            FROM execucoes_tarefas
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (limite,))
+        colunas = [c[0] for c in cursor.description]
+        historico = [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+        conn.close()
+        return historico
+
+
+def criar_agendador(roteador, intervalo=20):
+    """Cria o agendador com as tarefas de manutenção padrão do GymMaster
+
+    As tarefas de banco rodam em todas as filiais do roteador, sem passar pelo
+    cache LRU das filiais (ver RoteadorFiliais.para_cada_filial); o controle e
+    o histórico ficam no banco principal.
+    """
+    agendador = Agendador(roteador.db_name, intervalo=intervalo)
+
+    def em_todas(metodo):
+        return lambda: roteador.para_cada_filial(lambda db: getattr(db, metodo)())
+
+    agendador.registrar("atualizar_status", "*/15 * * * *", em_todas("update_atleta_status"),
+                        "Recalcula o status dos atletas pelo vencimento")
+    agendador.registrar("virar_dia", "0 0 * * *", em_todas("virar_dia_buckets"),
+                        "Reclassifica os buckets de vencimento para o novo dia")
+    agendador.registrar("verificar_buckets", "15 3 * * *", em_todas("verificar_buckets_vencimento"),
+                        "Confere os buckets de vencimento contra a tabela atletas")
+    agendador.registrar("backup", "0 2 * * *", em_todas("criar_backup"),
+                        "Cópia diária dos bancos em backups/")
+    agendador.registrar("otimizar", "30 3 * * *", em_todas("otimizar_banco"),
+                        "Atualiza as estatísticas do planejador (ANALYZE)")
+    agendador.registrar("vacuum", "0 4 * * 0", em_todas("vacuum"),
+                        "Compacta os arquivos dos bancos (semanal)")
+    agendador.registrar("limpar_arquivo", "45 3 * * *",
+                        lambda: roteador.para_cada_filial(
+                            lambda db: db.arquivo.limpar_arquivos_antigos()),
+                        "Apaga os Parquet substituídos por um novo arquivamento")
+    agendador.registrar("fechar_filiais_ociosas", "*/5 * * * *", roteador.fechar_ociosas,
+                        "Fecha os bancos das filiais sem uso recente")
+    return agendador
@@ -0,0 +1,338 @@
+"""API JSON local do GymMaster para integrações (catraca, conciliação Multicaixa)
+
+Uso: python api.py [--host 127.0.0.1] [--porta 8502]
+     uvicorn api:criar_app --factory --port 8502
+
+Se a variável GYMMASTER_API_TOKEN estiver definida, as requisições devem
+enviar o cabeçalho "Authorization: Bearer <token>". A filial é escolhida pelo
+parâmetro ?filial=<id> (padrão: 1, a filial principal).
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import math
+import os
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from urllib.parse import parse_qs
+
+from cache_disco import CacheDisco
+from database import FORMAS_PAGAMENTO
+from filiais import RoteadorFiliais
+
+log = logging.getLogger('gymmaster.api')
+
+# Erros e serialização
+
+
+class ErroHTTP(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+def _valor_json(valor):
+    """Converte tipos do numpy/pandas e datas em tipos nativos do JSON"""
+    if hasattr(valor, 'item'):
+        valor = valor.item()
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _inteiro(valor, campo):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ErroHTTP(400, f"{campo} deve ser um número inteiro")
+
+
+# Aplicação ASGI
+
+
+class ApiGymMaster:
+    """Aplicação ASGI que expõe as operações do DatabaseManager em JSON
+
+    As consultas ao SQLite são bloqueantes, então rodam num pool de threads do
+    tamanho do pool de conexões de cada filial; o laço de eventos fica livre
+    para aceitar requisições enquanto isso.
+    """
+
+    def __init__(self, roteador=None, token=None, max_threads=16,
+                 intervalo_sincronizacao=5):
+        self.roteador = roteador or RoteadorFiliais(
+            tamanho_pool=max_threads, cache_disco=CacheDisco())
+        self.intervalo_sincronizacao = intervalo_sincronizacao
+        self.token = token if token is not None else os.environ.get(
+            'GYMMASTER_API_TOKEN')
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_threads, thread_name_prefix="api")
+        self._registradores = {}
+
+        self.rotas = [
+            ('GET', re.compile(r'^/saude$'), self.saude),
+            ('GET', re.compile(r'^/atletas$'), self.buscar_atletas),
+            ('GET', re.compile(r'^/atletas/(?P<atleta_id>\d+)$'), self.obter_atleta),
+            ('GET', re.compile(r'^/acesso/(?P<atleta_id>\d+)$'), self.verificar_acesso),
+            ('POST', re.compile(r'^/frequencia$'), self.registrar_frequencia),
+            ('POST', re.compile(r'^/pagamentos$'), self.registrar_pagamento),
+            ('GET', re.compile(r'^/kpis$'), self.kpis),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        try:
+            self._autenticar(scope)
+            handler, parametros = self._resolver(scope['method'], scope['path'])
+            consulta = {chave: valores[-1] for chave, valores in
+                        parse_qs(scope['query_string'].decode()).items()}
+            corpo = await self._ler_corpo(receive) if scope['method'] == 'POST' else None
+            status, resposta = await handler(consulta, corpo, **parametros)
+        except ErroHTTP as e:
+            status, resposta = e.status, {'erro': e.mensagem}
+        except Exception:
+            # O detalhe fica no log do servidor; o cliente recebe só a mensagem genérica
+            log.exception("Erro em %s %s", scope['method'], scope['path'])
+            status, resposta = 500, {'erro': "Erro interno"}
+
+        await self._responder(send, status, resposta)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'lifespan.startup':
+                # Carrega o índice da filial principal antes de aceitar requisições
+                try:
+                    await asyncio.get_running_loop().run_in_executor(
+                        self._executor, self.roteador.indice_acesso, 1)
+                except Exception as e:
+                    log.exception("Falha ao carregar o índice de acesso na partida")
+                    self._executor.shutdown(wait=False)
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                sincronizacao = asyncio.create_task(self._sincronizar_indices())
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensagem['type'] == 'lifespan.shutdown':
+                sincronizacao.cancel()
+                self._executor.shutdown(wait=True)
+                self.roteador.parar_registradores()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _sincronizar_indices(self):
+        """Recarrega periodicamente os índices alterados por outros processos (app Streamlit)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.intervalo_sincronizacao)
+            try:
+                await loop.run_in_executor(self._executor, self.roteador.sincronizar_indices)
+            except Exception:
+                pass  # Tenta de novo no próximo intervalo
+
+    def _autenticar(self, scope):
+        if not self.token:
+            return
+        cabecalhos = dict(scope['headers'])
+        recebido = cabecalhos.get(b'authorization', b'').decode()
+        if not hmac.compare_digest(recebido, f"Bearer {self.token}"):
+            raise ErroHTTP(401, "Token inválido ou ausente")
+
+    def _resolver(self, metodo, caminho):
+        caminho_existe = False
+        for metodo_rota, padrao, handler in self.rotas:
+            encontrado = padrao.match(caminho)
+            if encontrado:
+                caminho_existe = True
+                if metodo_rota == metodo:
+                    return handler, encontrado.groupdict()
+        if caminho_existe:
+            raise ErroHTTP(405, "Método não permitido")
+        raise ErroHTTP(404, "Rota não encontrada")
+
+    async def _ler_corpo(self, receive):
+        partes = []
+        while True:
+            mensagem = await receive()
+            partes.append(mensagem.get('body', b''))
+            if not mensagem.get('more_body'):
+                break
+        try:
+            return json.loads(b''.join(partes) or b'{}')
+        except json.JSONDecodeError:
+            raise ErroHTTP(400, "Corpo da requisição não é um JSON válido")
+
+    async def _responder(self, send, status, resposta):
+        corpo = json.dumps(resposta, ensure_ascii=False,
+                           default=_valor_json).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json; charset=utf-8'),
+                        (b'content-length', str(len(corpo)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': corpo})
+
+    async def _no_banco(self, consulta, funcao, *args):
+        """Executa funcao(db, *args) no banco da filial, fora do laço de eventos"""
+        filial_id = _inteiro(consulta.get('filial', 1), "filial")
+
+        def executar():
+            try:
+                db = self.roteador.obter(filial_id)
+            except KeyError:
+                raise ErroHTTP(404, f"Filial {filial_id} não encontrada")
+            return funcao(db, *args)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, executar)
+
+    async def _indice(self, consulta):
+        """Índice de acesso da filial; só vai ao banco na primeira carga"""
+        filial_id = _inteiro(consulta.get('filial', 1), "filial")
+        indice = self.roteador.indice_carregado(filial_id)
+        if indice is None:
+            indice = await self._no_banco(
+                consulta, lambda db: self.roteador.indice_acesso(filial_id))
+        return indice
+
+    # Endpoints
+
+    async def saude(self, consulta, corpo):
+        return 200, {'status': 'ok'}
+
+    async def buscar_atletas(self, consulta, corpo):
+        termo = consulta.get('q', '').strip()
+        if not termo:
+            raise ErroHTTP(400, "Informe o parâmetro q (nome, telefone ou email)")
+        limite = min(_inteiro(consulta.get('limite', 20), "limite"), 100)
+
+        atletas = await self._no_banco(
+            consulta, lambda db: db.buscar_atletas(termo, limite))
+        return 200, {'atletas': atletas}
+
+    async def obter_atleta(self, consulta, corpo, atleta_id):
+        atleta = await self._no_banco(
+            consulta, lambda db: db.get_atleta_by_id(int(atleta_id)))
+        if atleta is None:
+            raise ErroHTTP(404, f"Atleta {atleta_id} não encontrado")
+
+        atleta = atleta.drop(labels=['valor_plano_centavos'])
+        return 200, {chave: _valor_json(valor) for chave, valor in atleta.items()}
+
+    async def verificar_acesso(self, consulta, corpo, atleta_id):
+        # Caminho quente da catraca: responde pelo índice em memória, sem SQLite
+        indice = await self._indice(consulta)
+        acesso = indice.verificar(int(atleta_id))
+        if acesso is None:
+            raise ErroHTTP(404, f"Atleta {atleta_id} não encontrado")
+        return 200, acesso
+
+    async def registrar_frequencia(self, consulta, corpo):
+        if not isinstance(corpo, dict) or 'atleta_id' not in corpo:
+            raise ErroHTTP(400, "Campo obrigatório: atleta_id")
+        atleta_id = _inteiro(corpo['atleta_id'], "atleta_id")
+        filial_id = _inteiro(consulta.get('filial', 1), "filial")
+
+        indice = await self._indice(consulta)
+        if indice.verificar(atleta_id) is None:
+            raise ErroHTTP(404, f"Atleta {atleta_id} não encontrado")
+
+        # A gravação é assíncrona (em lote); 202 indica que o check-in foi aceito
+        registrador = self._registradores.get(filial_id)
+        if registrador is None:
+            registrador = await self._no_banco(
+                consulta, lambda db: self.roteador.registrador_frequencia(filial_id))
+            self._registradores[filial_id] = registrador
+        try:
+            registrador.registrar(atleta_id, corpo.get('data_hora'),
+                                  corpo.get('origem', 'catraca'), timeout=0)
+        except ValueError as e:
+            raise ErroHTTP(422, str(e))
+        except queue.Full:
+            raise ErroHTTP(503, "Fila de check-ins cheia, tente novamente")
+        return 202, {'aceito': True, 'pendentes': registrador.pendentes()}
+
+    async def registrar_pagamento(self, consulta, corpo):
+        if not isinstance(corpo, dict):
+            raise ErroHTTP(400, "O corpo deve ser um objeto JSON")
+        if 'atleta_id' not in corpo or 'valor' not in corpo:
+            raise ErroHTTP(400, "Campos obrigatórios: atleta_id, valor")
+
+        atleta_id = _inteiro(corpo['atleta_id'], "atleta_id")
+        try:
+            valor = float(corpo['valor'])
+        except (TypeError, ValueError):
+            raise ErroHTTP(400, "valor deve ser numérico")
+        if valor <= 0:
+            raise ErroHTTP(422, "valor deve ser maior que zero")
+
+        forma_pagamento = corpo.get('forma_pagamento', "Multicaixa")
+        if forma_pagamento not in FORMAS_PAGAMENTO:
+            raise ErroHTTP(
+                422, f"forma_pagamento deve ser uma de: {', '.join(FORMAS_PAGAMENTO)}")
+
+        hoje = datetime.now()
+
+        def registrar(db):
+            if db.verificar_acesso(atleta_id) is None:
+                raise ErroHTTP(404, f"Atleta {atleta_id} não encontrado")
+            try:
+                pagamento_id = db.registrar_pagamento(
+                    atleta_id=atleta_id,
+                    data_pagamento=corpo.get('data_pagamento') or hoje.date(),
+                    valor=valor,
+                    mes_referencia=corpo.get('mes_referencia') or hoje.strftime('%Y-%m'),
+                    forma_pagamento=forma_pagamento,
+                    observacoes=corpo.get('observacoes', ""),
+                    chave_idempotencia=corpo.get('chave_idempotencia')
+                )
+            except ValueError as e:
+                raise ErroHTTP(422, str(e))
+            return pagamento_id, db.verificar_acesso(atleta_id)
+
+        pagamento_id, acesso = await self._no_banco(consulta, registrar)
+        return 201, {'pagamento_id': pagamento_id,
+                     'data_vencimento': acesso['data_vencimento'],
+                     'status': acesso['status']}
+
+    async def kpis(self, consulta, corpo):
+        def calcular(db):
+            return db.get_estatisticas_avancadas(), db.get_meta_receita()
+
+        stats, meta = await self._no_banco(consulta, calcular)
+        stats['receita_12_meses'] = stats['receita_12_meses'].to_dict('records')
+        stats['meta_receita'] = meta
+        stats['percentual_meta'] = (
+            stats['receita_mes_atual'] / meta * 100) if meta > 0 else 0
+        return 200, stats
+
+
+def criar_app():
+    """Fábrica usada pelo uvicorn (--factory)"""
+    return ApiGymMaster()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API JSON local do GymMaster")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8502)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(criar_app(), host=args.host, port=args.porta, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
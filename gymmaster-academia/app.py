@@ -1,13 +1,21 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import time
-import hashlib
-import re
 import sys
+import uuid
+
+from database import AuthManager, FAIXAS_ATRASO, FORMAS_PAGAMENTO, intervalo_mes, memoria_dataframe
+from agendador import criar_agendador
+from cache_disco import CacheDisco
+from filiais import RoteadorFiliais
+from relatorios import MotorRelatorios
+from coortes import obter_coortes
+from previsao import prever_receita
 
 # Configuração da página
 st.set_page_config(
@@ -17,513 +25,92 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Classe para gerenciar autenticação
-
-
-class AuthManager:
-    def __init__(self, db_name='academia.db'):
-        self.db_name = db_name
-        self.init_auth_database()
-
-    def init_auth_database(self):
-        """Inicializa tabela de usuários"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                telefone TEXT,
-                senha_hash TEXT NOT NULL,
-                data_criacao DATE DEFAULT CURRENT_DATE,
-                data_atualizacao DATE DEFAULT CURRENT_DATE,
-                tipo TEXT DEFAULT 'admin'
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
-
-    def hash_password(self, password):
-        """Cria hash da senha"""
-        return hashlib.sha256(password.encode()).hexdigest()
-
-    def verificar_senha(self, password, hash_password):
-        """Verifica se a senha está correta"""
-        return self.hash_password(password) == hash_password
-
-    def criar_usuario(self, nome, email, telefone, senha):
-        """Cria um novo usuário"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        try:
-            senha_hash = self.hash_password(senha)
-            cursor.execute('''
-                INSERT INTO usuarios (nome, email, telefone, senha_hash)
-                VALUES (?, ?, ?, ?)
-            ''', (nome, email, telefone, senha_hash))
-
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False  # Email já existe
-        finally:
-            conn.close()
-
-    def verificar_login(self, email, senha):
-        """Verifica credenciais de login"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT id, nome, email, telefone, senha_hash, tipo 
-            FROM usuarios WHERE email = ?
-        ''', (email,))
-
-        usuario = cursor.fetchone()
-        conn.close()
-
-        if usuario and self.verificar_senha(senha, usuario[4]):
-            return {
-                'id': usuario[0],
-                'nome': usuario[1],
-                'email': usuario[2],
-                'telefone': usuario[3],
-                'tipo': usuario[5]
-            }
-        return None
-
-    def atualizar_usuario(self, usuario_id, nome, telefone, email, senha_atual=None, nova_senha=None):
-        """Atualiza dados do usuário"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        try:
-            if senha_atual and nova_senha:
-                # Verificar senha atual
-                cursor.execute(
-                    'SELECT senha_hash FROM usuarios WHERE id = ?', (usuario_id,))
-                resultado = cursor.fetchone()
-
-                if not resultado or not self.verificar_senha(senha_atual, resultado[0]):
-                    return False, "Senha atual incorreta"
-
-                # Atualizar com nova senha
-                nova_senha_hash = self.hash_password(nova_senha)
-                cursor.execute('''
-                    UPDATE usuarios 
-                    SET nome = ?, telefone = ?, email = ?, senha_hash = ?, data_atualizacao = CURRENT_DATE
-                    WHERE id = ?
-                ''', (nome, telefone, email, nova_senha_hash, usuario_id))
-            else:
-                # Atualizar sem mudar senha
-                cursor.execute('''
-                    UPDATE usuarios 
-                    SET nome = ?, telefone = ?, email = ?, data_atualizacao = CURRENT_DATE
-                    WHERE id = ?
-                ''', (nome, telefone, email, usuario_id))
-
-            conn.commit()
-            return True, "Dados atualizados com sucesso"
-
-        except sqlite3.IntegrityError:
-            return False, "Email já está em uso"
-        finally:
-            conn.close()
-
-# Classe para gerenciar o banco de dados principal
-
-
-class DatabaseManager:
-    def __init__(self, db_name='academia.db'):
-        self.db_name = db_name
-        self.init_database()
-        self.migrate_database()
-
-    def init_database(self):
-        """Inicializa o banco de dados com tabelas"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        # Tabela de atletas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS atletas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                telefone TEXT,
-                email TEXT,
-                data_cadastro DATE DEFAULT CURRENT_DATE,
-                data_vencimento DATE,
-                status TEXT DEFAULT 'ativo',
-                observacoes TEXT,
-                plano TEXT DEFAULT 'Mensal',
-                valor_plano REAL DEFAULT 10000.00
-            )
-        ''')
-
-        # Tabela de pagamentos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS pagamentos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                atleta_id INTEGER,
-                data_pagamento DATE DEFAULT CURRENT_DATE,
-                valor REAL,
-                mes_referencia TEXT,
-                forma_pagamento TEXT,
-                observacoes TEXT,
-                FOREIGN KEY(atleta_id) REFERENCES atletas(id)
-            )
-        ''')
-
-        # Tabela de configurações e metas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS configuracoes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chave TEXT UNIQUE,
-                valor TEXT,
-                data_atualizacao DATE DEFAULT CURRENT_DATE
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+# Inicializar managers
+auth_manager = AuthManager()
 
-    def migrate_database(self):
-        """Adiciona colunas faltantes nas tabelas existentes"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
 
-        try:
-            # Verificar se a coluna data_nascimento existe
-            cursor.execute("PRAGMA table_info(atletas)")
-            columns = [column[1] for column in cursor.fetchall()]
+@st.cache_resource
+def iniciar_roteador():
+    """Cria o roteador de filiais uma única vez por servidor
 
-            if 'data_nascimento' not in columns:
-                cursor.execute(
-                    'ALTER TABLE atletas ADD COLUMN data_nascimento DATE')
-                print("✅ Coluna data_nascimento adicionada")
+    Os resultados pesados ficam também num cache em disco, compartilhado com
+    os outros workers e com a API.
+    """
+    return RoteadorFiliais(cache_disco=CacheDisco())
 
-            # Inserir meta padrão se não existir
-            cursor.execute(
-                "SELECT * FROM configuracoes WHERE chave = 'meta_receita_mensal'")
-            if not cursor.fetchone():
-                cursor.execute(
-                    "INSERT INTO configuracoes (chave, valor) VALUES ('meta_receita_mensal', '500000')")
 
-            conn.commit()
+roteador = iniciar_roteador()
 
-        except Exception as e:
-            print(f"⚠️ Erro na migração: {e}")
-        finally:
-            conn.close()
 
-    def get_connection(self):
-        """Retorna conexão com o banco"""
-        return sqlite3.connect(self.db_name)
+def obter_db():
+    """Retorna o banco da filial do usuário logado"""
+    usuario = st.session_state.get('usuario') or {}
+    return roteador.obter(usuario.get('filial_id', 1))
 
-    def add_atleta(self, nome, telefone, email, data_nascimento, data_vencimento, plano, valor_plano, observacoes=""):
-        """Adiciona um novo atleta"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute('''
-            INSERT INTO atletas (nome, telefone, email, data_nascimento, data_vencimento, plano, valor_plano, observacoes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (nome, telefone, email, data_nascimento, data_vencimento, plano, valor_plano, observacoes))
+@st.cache_resource
+def iniciar_agendador():
+    """Inicia o agendador de manutenção uma única vez por servidor"""
+    agendador = criar_agendador(roteador)
+    agendador.iniciar()
+    agendador.executar_agora("atualizar_status")
+    return agendador
 
-        conn.commit()
-        atleta_id = cursor.lastrowid
-        conn.close()
 
-        return atleta_id
+agendador = iniciar_agendador()
 
-    def update_atleta(self, atleta_id, nome, telefone, email, data_nascimento, data_vencimento, plano, valor_plano, observacoes):
-        """Atualiza os dados de um atleta"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute('''
-            UPDATE atletas 
-            SET nome = ?, telefone = ?, email = ?, data_nascimento = ?, 
-                data_vencimento = ?, plano = ?, valor_plano = ?, observacoes = ?
-            WHERE id = ?
-        ''', (nome, telefone, email, data_nascimento, data_vencimento, plano, valor_plano, observacoes, atleta_id))
+@st.cache_resource
+def iniciar_motor_relatorios():
+    """Cria o motor de relatórios consolidados uma única vez por servidor"""
+    return MotorRelatorios(roteador)
 
-        conn.commit()
-        conn.close()
 
-        return True
+motor_relatorios = iniciar_motor_relatorios()
 
-    def excluir_atleta(self, atleta_id):
-        """Exclui um atleta e todos os seus pagamentos"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+# Intervalo (segundos) da verificação de mudanças no dashboard
+INTERVALO_DASHBOARD = 5
 
-        try:
-            # Primeiro excluir pagamentos (por causa da chave estrangeira)
-            cursor.execute(
-                "DELETE FROM pagamentos WHERE atleta_id = ?", (atleta_id,))
+# Cache de figuras
 
-            # Depois excluir o atleta
-            cursor.execute("DELETE FROM atletas WHERE id = ?", (atleta_id,))
 
-            conn.commit()
-            return True
+@st.cache_data(show_spinner=False, max_entries=64)
+def _figura_json(chave, versao, _construir):
+    """Constrói a figura uma vez por (chave, versão) e guarda só o JSON"""
+    return _construir().to_json()
 
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
-
-    def get_all_atletas(self):
-        """Retorna todos os atletas"""
-        conn = self.get_connection()
-        df = pd.read_sql("SELECT * FROM atletas ORDER BY nome", conn)
-        conn.close()
-        return df
-
-    def get_atleta_by_id(self, atleta_id):
-        """Retorna um atleta específico"""
-        conn = self.get_connection()
-        df = pd.read_sql("SELECT * FROM atletas WHERE id = ?",
-                         conn, params=(atleta_id,))
-        conn.close()
-        return df.iloc[0] if not df.empty else None
-
-    def update_atleta_status(self):
-        """Atualiza status dos atletas baseado na data de vencimento"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        hoje = datetime.now().date()
-
-        cursor.execute('''
-            UPDATE atletas SET status = 
-            CASE 
-                WHEN date(data_vencimento) < date(?) THEN 'vencido'
-                WHEN date(data_vencimento) <= date(?, '+7 days') THEN 'alerta'
-                ELSE 'ativo'
-            END
-        ''', (hoje, hoje))
-
-        conn.commit()
-        conn.close()
-
-    def registrar_pagamento(self, atleta_id, data_pagamento, valor, mes_referencia, forma_pagamento, observacoes):
-        """Registra um novo pagamento"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
 
-        try:
-            cursor.execute('''
-                INSERT INTO pagamentos (atleta_id, data_pagamento, valor, mes_referencia, forma_pagamento, observacoes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (atleta_id, data_pagamento, valor, mes_referencia, forma_pagamento, observacoes))
-
-            # Atualizar data de vencimento do atleta
-            atleta = self.get_atleta_by_id(atleta_id)
-            if atleta is not None:
-                plano = atleta['plano']
-
-                meses_adicional = 1
-                if plano == "Trimestral":
-                    meses_adicional = 3
-                elif plano == "Semestral":
-                    meses_adicional = 6
-                elif plano == "Anual":
-                    meses_adicional = 12
-
-                data_base = max(
-                    datetime.now().date(),
-                    datetime.strptime(
-                        atleta['data_vencimento'], '%Y-%m-%d').date()
-                )
+def figura_em_cache(chave, versao, construir):
+    """Retorna a figura reaproveitando o JSON enquanto a versão dos dados não mudar"""
+    return pio.from_json(_figura_json(chave, versao, construir))
 
-                nova_data_vencimento = data_base + \
-                    timedelta(days=30 * meses_adicional)
 
-                cursor.execute('''
-                    UPDATE atletas SET data_vencimento = ? WHERE id = ?
-                ''', (nova_data_vencimento.strftime('%Y-%m-%d'), atleta_id))
+@st.cache_data(show_spinner=False, ttl=60, max_entries=16)
+def receita_da_rede_no_mes(mes, versao_filial):
+    """Receita do mês por filial, pelo motor de relatórios consolidados
 
-            conn.commit()
-            pagamento_id = cursor.lastrowid
-            return pagamento_id
+    Ler a versão de cada filial exigiria abrir todos os bancos; o resultado
+    vale por um minuto e `versao_filial` (pagamentos da filial do usuário)
+    faz os pagamentos da própria filial aparecerem na hora.
+    """
+    inicio, fim = intervalo_mes(mes)
+    df_rede, _ = motor_relatorios.receita_consolidada(
+        inicio, date.fromisoformat(fim) - timedelta(days=1))
+    por_filial = df_rede.groupby('filial', as_index=False)[['receita', 'total_pagamentos']].sum()
+    # Filiais sem pagamento no mês aparecem com zero
+    filiais = roteador.listar_filiais().rename(columns={'nome': 'filial'})[['filial']]
+    return filiais.merge(por_filial, on='filial', how='left').fillna(
+        {'receita': 0.0, 'total_pagamentos': 0}).astype({'total_pagamentos': int})
 
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
-
-    def get_pagamentos(self, atleta_id=None):
-        """Retorna pagamentos, opcionalmente filtrado por atleta"""
-        conn = self.get_connection()
-
-        if atleta_id:
-            df = pd.read_sql('''
-                SELECT p.*, a.nome as atleta_nome 
-                FROM pagamentos p 
-                JOIN atletas a ON p.atleta_id = a.id 
-                WHERE p.atleta_id = ?
-                ORDER BY p.data_pagamento DESC
-            ''', conn, params=(atleta_id,))
-        else:
-            df = pd.read_sql('''
-                SELECT p.*, a.nome as atleta_nome 
-                FROM pagamentos p 
-                JOIN atletas a ON p.atleta_id = a.id 
-                ORDER BY p.data_pagamento DESC
-            ''', conn)
-
-        conn.close()
-        return df
-
-    def get_estatisticas_avancadas(self):
-        """Retorna estatísticas avançadas para dashboard"""
-        conn = self.get_connection()
-
-        # Receita do mês atual
-        mes_atual = datetime.now().strftime('%Y-%m')
-        df_receita_mes = pd.read_sql('''
-            SELECT SUM(valor) as receita_mes_atual
-            FROM pagamentos 
-            WHERE strftime('%Y-%m', data_pagamento) = ?
-        ''', conn, params=(mes_atual,))
-
-        # Receita mês anterior
-        mes_anterior = (datetime.now().replace(day=1) -
-                        timedelta(days=1)).strftime('%Y-%m')
-        df_receita_mes_anterior = pd.read_sql('''
-            SELECT SUM(valor) as receita_mes_anterior
-            FROM pagamentos 
-            WHERE strftime('%Y-%m', data_pagamento) = ?
-        ''', conn, params=(mes_anterior,))
-
-        # Receita últimos 12 meses
-        df_receita_12_meses = pd.read_sql('''
-            SELECT strftime('%Y-%m', data_pagamento) as mes,
-                   SUM(valor) as receita_mensal,
-                   COUNT(*) as total_pagamentos
-            FROM pagamentos
-            WHERE date(data_pagamento) >= date('now', '-12 months')
-            GROUP BY mes
-            ORDER BY mes
-        ''', conn)
-
-        # Estatísticas de atletas
-        df_atletas_stats = pd.read_sql('''
-            SELECT 
-                COUNT(*) as total_atletas,
-                SUM(CASE WHEN status = 'ativo' THEN 1 ELSE 0 END) as ativos,
-                SUM(CASE WHEN status = 'vencido' THEN 1 ELSE 0 END) as vencidos,
-                SUM(CASE WHEN status = 'alerta' THEN 1 ELSE 0 END) as alertas,
-                AVG(valor_plano) as ticket_medio
-            FROM atletas
-        ''', conn)
-
-        conn.close()
-
-        receita_mes_atual = df_receita_mes.iloc[0]['receita_mes_atual'] or 0
-        receita_mes_anterior = df_receita_mes_anterior.iloc[0]['receita_mes_anterior'] or 0
-
-        # Calcular crescimento
-        crescimento = 0
-        if receita_mes_anterior > 0:
-            crescimento = (
-                (receita_mes_atual - receita_mes_anterior) / receita_mes_anterior) * 100
-
-        return {
-            'receita_mes_atual': receita_mes_atual,
-            'receita_mes_anterior': receita_mes_anterior,
-            'crescimento': crescimento,
-            'receita_12_meses': df_receita_12_meses,
-            'total_atletas': df_atletas_stats.iloc[0]['total_atletas'] or 0,
-            'ativos': df_atletas_stats.iloc[0]['ativos'] or 0,
-            'vencidos': df_atletas_stats.iloc[0]['vencidos'] or 0,
-            'alertas': df_atletas_stats.iloc[0]['alertas'] or 0,
-            'ticket_medio': df_atletas_stats.iloc[0]['ticket_medio'] or 0
-        }
 
-    def get_meta_receita(self):
-        """Retorna a meta de receita mensal"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            "SELECT valor FROM configuracoes WHERE chave = 'meta_receita_mensal'")
-        result = cursor.fetchone()
-
-        conn.close()
-
-        return float(result[0]) if result else 500000.0
-
-    def set_meta_receita(self, valor):
-        """Define a meta de receita mensal"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT OR REPLACE INTO configuracoes (chave, valor, data_atualizacao)
-            VALUES ('meta_receita_mensal', ?, CURRENT_DATE)
-        ''', (str(valor),))
-
-        conn.commit()
-        conn.close()
-
-    def get_notificacoes(self):
-        """Retorna notificações do sistema"""
-        conn = self.get_connection()
-
-        hoje = datetime.now().date()
-
-        # Notificações de vencimento
-        df_alertas = pd.read_sql('''
-            SELECT nome, data_vencimento, status
-            FROM atletas 
-            WHERE date(data_vencimento) <= date(?, '+7 days')
-            AND status != 'vencido'
-            ORDER BY data_vencimento ASC
-        ''', conn, params=(hoje,))
-
-        notificacoes = []
-
-        # Notificações de vencimento
-        for _, atleta in df_alertas.iterrows():
-            dias_vencimento = (datetime.strptime(
-                atleta['data_vencimento'], '%Y-%m-%d').date() - hoje).days
-            if dias_vencimento < 0:
-                notificacoes.append(f"❌ {atleta['nome']} - Vencido")
-            elif dias_vencimento == 0:
-                notificacoes.append(f"⚠️ {atleta['nome']} - Vence hoje!")
-            else:
-                notificacoes.append(
-                    f"🔔 {atleta['nome']} - Vence em {dias_vencimento} dias")
+@st.cache_data(show_spinner=False, max_entries=32)
+def previsao_do_dia(versao_dados, dia, _db):
+    """Previsão de receita por dia e filial, recalculada quando pagamentos, atletas ou coortes mudam
 
-        # Notificação de meta (se houver dados)
-        stats = self.get_estatisticas_avancadas()
-        meta = self.get_meta_receita()
-        receita_atual = stats['receita_mes_atual']
-
-        if receita_atual > 0:
-            percentual_meta = (receita_atual / meta) * 100
-            if percentual_meta >= 100:
-                notificacoes.append(
-                    f"🎯 Meta mensal atingida! ({percentual_meta:.1f}%)")
-            elif percentual_meta >= 80:
-                notificacoes.append(f"📈 Meta mensal: {percentual_meta:.1f}%")
-
-        conn.close()
-        return notificacoes
-
-
-# Inicializar managers
-auth_manager = AuthManager()
-db = DatabaseManager()
+    `versao_dados` é o token de db.get_versao_dados('pagamentos', 'atletas',
+    'cache_coortes') (as coortes dão a taxa de renovação), que já identifica a filial.
+    """
+    return prever_receita(_db, date.fromisoformat(dia))
 
 # Funções de autenticação
 
@@ -615,6 +202,9 @@ def show_cadastro_usuario():
         confirmar_senha = st.text_input(
             "Confirmar Nova Senha*", type="password", placeholder="Digite a senha novamente")
 
+        df_filiais = roteador.listar_filiais()
+        filial_nome = st.selectbox("Filial*", df_filiais['nome'].tolist())
+
         if st.form_submit_button("📝 Cadastrar"):
             if not all([nome, email, senha, confirmar_senha]):
                 st.error("Preencha todos os campos obrigatórios!")
@@ -623,8 +213,10 @@ def show_cadastro_usuario():
             elif len(senha) < 6:
                 st.error("A senha deve ter pelo menos 6 caracteres!")
             else:
+                filial_id = int(df_filiais[df_filiais['nome']
+                                           == filial_nome].iloc[0]['id'])
                 sucesso = auth_manager.criar_usuario(
-                    nome, email, telefone, senha)
+                    nome, email, telefone, senha, filial_id)
                 if sucesso:
                     st.success(
                         "✅ Conta criada com sucesso! Faça login para continuar.")
@@ -634,6 +226,7 @@ def show_cadastro_usuario():
 
 def show_perfil():
     """Exibe e permite editar perfil do usuário"""
+    db = obter_db()
     st.header("👤 Meu Perfil")
 
     usuario = st.session_state['usuario']
@@ -707,10 +300,10 @@ def show_perfil():
         st.subheader("📊 Estatísticas")
 
         df_atletas = db.get_all_atletas()
-        df_pagamentos = db.get_pagamentos()
+        _, totais_pagamentos = db.buscar_pagamentos(limite=0)
 
         st.metric("Total de Atletas", len(df_atletas))
-        st.metric("Total de Pagamentos", len(df_pagamentos))
+        st.metric("Total de Pagamentos", totais_pagamentos['total_pagamentos'])
 
         # Botão de logout
         st.markdown("---")
@@ -735,21 +328,45 @@ def show_dashboard_interativo():
     """Exibe dashboard interativo simplificado"""
     st.header("📊 Dashboard Interativo")
 
-    # Carregar estatísticas
+    ao_vivo = st.toggle("🟢 Atualização automática", value=True,
+                        help=f"Verifica a cada {INTERVALO_DASHBOARD} s se os dados mudaram; "
+                             "só os blocos afetados são consultados de novo")
+    intervalo = INTERVALO_DASHBOARD if ao_vivo else None
+
+    # Cada bloco é um fragmento que roda de novo sozinho a cada `intervalo`.
+    # As consultas passam pelo cache do DatabaseManager (e as figuras pelo
+    # cache por versão), então um bloco cujas tabelas não mudaram só é
+    # redesenhado, sem ler o banco além do PRAGMA data_version. Cada rodada
+    # pede o banco ao roteador (obter_db), o que conta como uso da filial no
+    # LRU e reabre o banco se ele tiver sido fechado por ociosidade.
+    st.fragment(run_every=intervalo)(_dashboard_receita)()
+    st.fragment(run_every=intervalo)(_dashboard_status)()
+    st.fragment(run_every=intervalo)(_dashboard_frequencia)()
+    st.fragment(run_every=intervalo)(_dashboard_metricas)()
+
+
+def _dashboard_receita():
+    """KPIs principais e evolução da receita (atletas, pagamentos e configurações)"""
+    db = obter_db()
     stats = db.get_estatisticas_avancadas()
     meta_receita = db.get_meta_receita()
+    hoje = datetime.now().strftime('%Y-%m-%d')
+    previsao = previsao_do_dia(db.get_versao_dados('pagamentos', 'atletas', 'cache_coortes'), hoje, db)
 
     # KPIs principais
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
         receita_mes = stats['receita_mes_atual']
+        receita_prevista = receita_mes + previsao['mes_atual']['receita_prevista']
         percentual_meta = (receita_mes / meta_receita) * \
             100 if meta_receita > 0 else 0
+        percentual_previsto = (receita_prevista / meta_receita) * \
+            100 if meta_receita > 0 else 0
         st.metric(
             "💰 Receita Mensal",
             f"KZ {receita_mes:,.2f}",
-            f"{percentual_meta:.1f}% da meta",
+            f"{percentual_meta:.1f}% da meta ({percentual_previsto:.0f}% previsto)",
             delta_color="normal" if percentual_meta >= 70 else "inverse"
         )
 
@@ -774,85 +391,171 @@ def show_dashboard_interativo():
     st.subheader("📈 Evolução da Receita (12 meses)")
 
     if not stats['receita_12_meses'].empty:
-        fig_receita = px.line(
-            stats['receita_12_meses'],
-            x='mes',
-            y='receita_mensal',
-            markers=True,
-            title="Receita Mensal dos Últimos 12 Meses"
-        )
-        fig_receita.update_layout(
-            xaxis_title="Mês",
-            yaxis_title="Receita (KZ)",
-            showlegend=False,
-            height=400
-        )
+        def construir_receita():
+            fig_receita = px.line(
+                stats['receita_12_meses'],
+                x='mes',
+                y='receita_mensal',
+                markers=True,
+                title="Receita Mensal dos Últimos 12 Meses"
+            )
+            fig_receita.update_layout(
+                xaxis_title="Mês",
+                yaxis_title="Receita (KZ)",
+                showlegend=False,
+                height=400
+            )
 
-        # Adicionar linha da meta
-        fig_receita.add_hline(
-            y=meta_receita,
-            line_dash="dash",
-            line_color="red",
-            annotation_text=f"Meta: KZ {meta_receita:,.0f}"
-        )
+            # Previsão: do último mês fechado ao fim do próximo mês
+            fechados = stats['receita_12_meses'][
+                stats['receita_12_meses']['mes'] < previsao['mes_atual']['mes']]
+            x_previsao = [previsao['mes_atual']['mes'], previsao['proximo_mes']['mes']]
+            y_previsao = [receita_prevista, previsao['proximo_mes']['receita_prevista']]
+            if not fechados.empty:
+                x_previsao.insert(0, fechados['mes'].iloc[-1])
+                y_previsao.insert(0, fechados['receita_mensal'].iloc[-1])
+            fig_receita.add_scatter(
+                x=x_previsao,
+                y=y_previsao,
+                mode='lines+markers',
+                line=dict(dash='dot', color='gray'),
+                name='Previsão'
+            )
 
+            # Adicionar linha da meta
+            fig_receita.add_hline(
+                y=meta_receita,
+                line_dash="dash",
+                line_color="red",
+                annotation_text=f"Meta: KZ {meta_receita:,.0f}"
+            )
+            return fig_receita
+
+        fig_receita = figura_em_cache(
+            f"dashboard_receita_{hoje}",
+            db.get_versao_dados('pagamentos', 'configuracoes', 'atletas', 'cache_coortes'),
+            construir_receita
+        )
         st.plotly_chart(fig_receita, use_container_width=True)
     else:
         st.info("📊 Aguardando dados para mostrar evolução...")
 
+
+
+def _dashboard_status():
+    """Status dos atletas por faixa de vencimento (atletas)"""
+    db = obter_db()
+    stats = db.get_estatisticas_avancadas()
+    hoje = datetime.now().strftime('%Y-%m-%d')
+
     # Status dos atletas - mantido pois é útil
     st.subheader("📊 Status dos Atletas")
 
-    status_data = {
-        'Status': ['Ativos', 'Em Alerta', 'Vencidos'],
-        'Quantidade': [stats['ativos'], stats['alertas'], stats['vencidos']]
-    }
-    df_status = pd.DataFrame(status_data)
-
-    fig_status = px.bar(
-        df_status,
-        x='Status',
-        y='Quantidade',
-        color='Status',
-        color_discrete_map={
-            'Ativos': '#2ecc71',
-            'Em Alerta': '#f39c12',
-            'Vencidos': '#e74c3c'
-        },
-        height=300
-    )
+    def construir_status():
+        status_data = {
+            'Status': ['Ativos', 'Vence em 8-30 dias', 'Em Alerta', 'Vencidos'],
+            'Quantidade': [stats['ativos'] - stats['a_vencer_30'], stats['a_vencer_30'],
+                           stats['alertas'], stats['vencidos']]
+        }
+        df_status = pd.DataFrame(status_data)
+
+        return px.bar(
+            df_status,
+            x='Status',
+            y='Quantidade',
+            color='Status',
+            color_discrete_map={
+                'Ativos': '#2ecc71',
+                'Vence em 8-30 dias': '#3498db',
+                'Em Alerta': '#f39c12',
+                'Vencidos': '#e74c3c'
+            },
+            height=300
+        )
 
+    fig_status = figura_em_cache(
+        f"dashboard_status_{hoje}", db.get_versao_dados('atletas'), construir_status)
     st.plotly_chart(fig_status, use_container_width=True)
 
+
+
+def _dashboard_frequencia():
+    """Check-ins e horários de pico (frequencia)"""
+    db = obter_db()
+    hoje = datetime.now().strftime('%Y-%m-%d')
+
+    # Frequência e horários de pico (lidos do resumo por hora)
+    st.markdown("---")
+    st.subheader("🕐 Frequência e Horários de Pico")
+
+    versao_frequencia = db.get_versao_dados('frequencia')
+    frequencia_diaria = db.get_frequencia_diaria(30)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        checkins_hoje = frequencia_diaria.loc[frequencia_diaria['dia'] == hoje, 'total'].sum()
+        st.metric("✅ Check-ins Hoje", int(checkins_hoje))
+    with col2:
+        st.metric("📅 Média Diária (30 dias)",
+                  f"{frequencia_diaria['total'].sum() / 30:.1f}")
+
+    if frequencia_diaria.empty:
+        st.info("📊 Nenhum check-in registrado nos últimos 30 dias.")
+    else:
+        def construir_pico():
+            pico = db.get_horarios_pico(30)
+            dias_semana = ['Dom', 'Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb']
+            grade = pico.pivot_table(index='dia_semana', columns='hora', values='media',
+                                     fill_value=0).reindex(index=range(7), columns=range(24),
+                                                           fill_value=0)
+            fig = go.Figure(go.Heatmap(
+                z=grade.values, x=[f"{h:02d}h" for h in range(24)], y=dias_semana,
+                colorscale='YlOrRd', hovertemplate="%{y} %{x}: %{z:.1f} check-ins<extra></extra>"
+            ))
+            fig.update_layout(title="Média de Check-ins por Dia e Hora (30 dias)",
+                              height=350, yaxis_autorange='reversed')
+            return fig
+
+        fig_pico = figura_em_cache(
+            f"dashboard_pico_{hoje}", versao_frequencia, construir_pico)
+        st.plotly_chart(fig_pico, use_container_width=True)
+
+
+
+def _dashboard_metricas():
+    """Retenção, churn e receita estimada (coortes, atletas e pagamentos)"""
+    db = obter_db()
+    stats = db.get_estatisticas_avancadas()
+
     # Métricas avançadas
     st.markdown("---")
     st.subheader("📈 Métricas Avançadas")
 
-    col1, col2, col3, col4 = st.columns(4)
+    col1, col2, col3 = st.columns(3)
+
+    # Retenção e churn reais, da análise de coortes (cache mensal no banco)
+    coortes = obter_coortes(db)
+    curva, churn = coortes['curva'], coortes['churn'].dropna(subset=['churn'])
 
     with col1:
-        taxa_retencao = (stats['ativos'] / stats['total_atletas']
-                         * 100) if stats['total_atletas'] > 0 else 0
-        st.metric("🔄 Taxa de Retenção", f"{taxa_retencao:.1f}%")
+        taxa_retencao = curva['retencao'].iloc[1] * 100 if len(curva) > 1 else 0
+        st.metric("🔄 Retenção no 1º Mês", f"{taxa_retencao:.1f}%",
+                  help="Atletas ativos no mês seguinte ao cadastro (todas as coortes)")
 
     with col2:
-        churn_rate = (stats['vencidos'] / stats['total_atletas']
-                      * 100) if stats['total_atletas'] > 0 else 0
-        st.metric("📉 Churn Rate", f"{churn_rate:.1f}%")
+        churn_rate = churn['churn'].iloc[-1] * 100 if not churn.empty else 0
+        st.metric("📉 Churn Mensal", f"{churn_rate:.1f}%",
+                  help="Ativos no penúltimo mês fechado que não renovaram no último")
 
     with col3:
         receita_total_estimada = stats['ativos'] * stats['ticket_medio']
         st.metric("💰 Receita Mensal Estimada",
                   f"KZ {receita_total_estimada:,.2f}")
 
-    with col4:
-        # Auto-refresh
-        if st.button("🔄 Atualizar Dados"):
-            st.rerun()
-
 
 def show_cadastro_atleta():
     """Exibe formulário de cadastro de atletas"""
+    db = obter_db()
     st.header("➕ Cadastrar Novo Atleta")
 
     with st.form("cadastro_atleta", clear_on_submit=True):
@@ -908,6 +611,7 @@ def show_cadastro_atleta():
 
 def show_lista_editar_atletas():
     """Exibe lista de atletas para edição"""
+    db = obter_db()
     st.header("👥 Lista de Atletas")
 
     df_atletas = db.get_all_atletas()
@@ -938,9 +642,15 @@ def show_lista_editar_atletas():
         df_atletas[['id', 'nome', 'telefone', 'plano',
                     'valor_plano', 'data_vencimento', 'status']],
         use_container_width=True,
-        hide_index=True
+        hide_index=True,
+        column_config={
+            'data_vencimento': st.column_config.DateColumn(
+                'data_vencimento', format='YYYY-MM-DD')
+        }
     )
 
+    show_acoes_em_massa(db, df_atletas)
+
     # Edição de atleta
     st.subheader("✏️ Editar Atleta")
     atletas_ids = df_atletas['id'].tolist()
@@ -955,6 +665,11 @@ def show_lista_editar_atletas():
         atleta = db.get_atleta_by_id(atleta_id)
 
         if atleta is not None:
+            # Versão do atleta exibido na execução anterior: é a que o usuário editou
+            chave_versao = f"versao_atleta_{atleta_id}"
+            versao_lida = st.session_state.get(chave_versao, int(atleta['versao']))
+            st.session_state[chave_versao] = int(atleta['versao'])
+
             with st.form(f"editar_atleta_{atleta_id}"):
                 col1, col2 = st.columns(2)
 
@@ -970,11 +685,11 @@ def show_lista_editar_atletas():
                     valor_plano = st.number_input(
                         "Valor do Plano (KZ)*", min_value=0.0, value=float(atleta['valor_plano']), step=1000.0)
                     data_vencimento = st.date_input("Data de Vencimento*",
-                                                    value=datetime.strptime(atleta['data_vencimento'], '%Y-%m-%d').date())
+                                                    value=date.fromisoformat(atleta['data_vencimento']) if atleta['data_vencimento'] else None)
 
                 data_nascimento = st.date_input("Data de Nascimento",
-                                                value=datetime.strptime(
-                                                    atleta['data_nascimento'], '%Y-%m-%d').date() if atleta['data_nascimento'] else None,
+                                                value=date.fromisoformat(
+                                                    atleta['data_nascimento']) if atleta['data_nascimento'] else None,
                                                 max_value=datetime.now().date())
 
                 observacoes = st.text_area(
@@ -985,7 +700,7 @@ def show_lista_editar_atletas():
                     if st.form_submit_button("💾 Atualizar Atleta"):
                         if nome and data_vencimento and valor_plano > 0:
                             try:
-                                db.update_atleta(
+                                atualizado = db.update_atleta(
                                     atleta_id=atleta_id,
                                     nome=nome,
                                     telefone=telefone,
@@ -996,12 +711,19 @@ def show_lista_editar_atletas():
                                         '%Y-%m-%d'),
                                     plano=plano,
                                     valor_plano=valor_plano,
-                                    observacoes=observacoes
+                                    observacoes=observacoes,
+                                    versao=versao_lida
                                 )
-                                st.success(
-                                    f"✅ Atleta **{nome}** atualizado com sucesso!")
-                                time.sleep(2)
-                                st.rerun()
+                                if atualizado:
+                                    st.success(
+                                        f"✅ Atleta **{nome}** atualizado com sucesso!")
+                                    time.sleep(2)
+                                    st.rerun()
+                                else:
+                                    st.warning(
+                                        "⚠️ Este atleta foi alterado por outra pessoa (ou por um pagamento) "
+                                        "depois que você abriu o formulário. Os dados foram recarregados: "
+                                        "revise e salve de novo.")
                             except Exception as e:
                                 st.error(f"❌ Erro ao atualizar atleta: {e}")
                         else:
@@ -1019,9 +741,125 @@ def show_lista_editar_atletas():
                         except Exception as e:
                             st.error(f"❌ Erro ao excluir atleta: {e}")
 
+            show_historico_pagamentos_atleta(db, atleta_id)
+
+
+def show_acoes_em_massa(db, df_atletas):
+    """Aplica uma ação a vários atletas de uma vez (uma transação, com prévia)"""
+    st.subheader("📦 Ações em Massa")
+
+    # Resultado da última ação, exibido depois do rerun que recarrega a lista
+    resultado = st.session_state.pop('acao_em_massa_resultado', None)
+    if resultado:
+        st.success(resultado)
+
+    # Chave nova a cada ação aplicada: a seleção volta vazia
+    rodada = st.session_state.get('acao_em_massa_rodada', 0)
+    # Rótulo com o id: nomes repetidos continuam distinguíveis
+    rotulos = {f"{nome} (#{atleta_id})": atleta_id
+               for atleta_id, nome in zip(df_atletas['id'].tolist(), df_atletas['nome'].tolist())}
+
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        selecionados = [rotulos[rotulo] for rotulo in st.multiselect(
+            "Atletas", list(rotulos), key=f"acao_em_massa_atletas_{rodada}",
+            placeholder="Selecione os atletas (a lista segue os filtros acima)")]
+    with col2:
+        acao = st.selectbox("Ação", ["🔄 Trocar plano", "💲 Reajustar valor do plano",
+                                     "📦 Arquivar", "🗑️ Excluir"])
+
+    if acao == "🔄 Trocar plano":
+        plano = st.selectbox("Novo plano", ["Mensal", "Trimestral", "Semestral", "Anual"])
+        executar = lambda previa: db.alterar_plano_em_massa(selecionados, plano, previa)
+        descricao = f"passarão para o plano **{plano}**"
+        concluido = f"passaram para o plano {plano}"
+    elif acao == "💲 Reajustar valor do plano":
+        percentual = st.number_input(
+            "Reajuste (%)", min_value=-99.0, max_value=500.0, value=10.0, step=1.0)
+        executar = lambda previa: db.reajustar_valor_em_massa(selecionados, percentual, previa)
+        descricao = f"terão o valor do plano reajustado em **{percentual:+.1f}%**"
+        concluido = f"tiveram o valor do plano reajustado em {percentual:+.1f}%"
+    elif acao == "📦 Arquivar":
+        executar = lambda previa: db.arquivar_atletas(selecionados, previa)
+        descricao = "serão arquivados (saem da lista e da catraca; os pagamentos ficam)"
+        concluido = "foram arquivados"
+    else:
+        executar = lambda previa: db.excluir_atletas(selecionados, previa)
+        descricao = "serão excluídos **com seus pagamentos e check-ins**"
+        concluido = "foram excluídos"
+
+    if not selecionados:
+        return
+
+    try:
+        quantidade = executar(previa=True)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return
+
+    if quantidade == 0:
+        st.info("ℹ️ Nenhum dos atletas selecionados seria alterado por esta ação.")
+        return
+
+    st.warning(f"⚠️ {quantidade} atleta(s) {descricao}.")
+    if st.button(f"✅ Aplicar a {quantidade} atleta(s)", type="primary"):
+        try:
+            alterados = executar(previa=False)
+        except Exception as e:
+            st.error(f"❌ Erro ao aplicar a ação: {e}")
+            return
+        st.session_state['acao_em_massa_resultado'] = f"✅ {alterados} atleta(s) {concluido}."
+        st.session_state['acao_em_massa_rodada'] = rodada + 1
+        st.rerun()
+
+
+def show_historico_pagamentos_atleta(db, atleta_id, por_pagina=10):
+    """Exibe o histórico de pagamentos do atleta, paginado por chave"""
+    st.subheader("💳 Histórico de Pagamentos")
+
+    # Pilha de cursores: o topo é o início da página atual (None = primeira)
+    chave = f"historico_cursores_{atleta_id}"
+    if chave not in st.session_state:
+        st.session_state[chave] = [None]
+    cursores = st.session_state[chave]
+
+    df_historico, resumo, proximo = db.get_historico_pagamentos_atleta(
+        atleta_id, por_pagina, cursores[-1])
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("💰 Total Pago", f"KZ {resumo['valor_total']:,.2f}")
+    with col2:
+        st.metric("🧾 Pagamentos", int(resumo['total_pagamentos']))
+    with col3:
+        if resumo['ultimo_pagamento']:
+            st.metric("📅 Último Pagamento", resumo['ultimo_pagamento'],
+                      f"KZ {resumo['ultimo_valor']:,.2f}", delta_color="off")
+        else:
+            st.metric("📅 Último Pagamento", "—")
+
+    if df_historico.empty:
+        st.info("📝 Nenhum pagamento registrado para este atleta.")
+        return
+
+    st.dataframe(df_historico, use_container_width=True, hide_index=True)
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("⬅️ Anteriores", disabled=len(cursores) == 1,
+                  key=f"historico_anteriores_{atleta_id}", on_click=cursores.pop)
+    with col2:
+        st.caption(f"Página {len(cursores)} de "
+                   f"{max((int(resumo['total_pagamentos']) - 1) // por_pagina + 1, 1)}")
+    with col3:
+        st.button("Próximos ➡️", disabled=proximo is None,
+                  key=f"historico_proximos_{atleta_id}",
+                  on_click=cursores.append, args=(proximo,))
+
 
 def show_pagamentos():
     """Exibe interface de gerenciamento de pagamentos"""
+    db = obter_db()
     st.header("💰 Gerenciar Pagamentos")
 
     tab1, tab2, tab3 = st.tabs(
@@ -1034,6 +872,22 @@ def show_pagamentos():
         if df_atletas.empty:
             st.info("📝 Nenhum atleta cadastrado. Cadastre atletas primeiro.")
         else:
+            # Chave desta instância do formulário: vale para todos os envios dele
+            # (um clique duplo reenvia com a mesma chave) e só é trocada quando o
+            # usuário pede um novo registro. Trocá-la logo após gravar não
+            # adianta: o segundo clique já está na fila e chegaria com a chave nova.
+            chave = st.session_state.setdefault('chave_pagamento', uuid.uuid4().hex)
+            registrado = st.session_state.get('pagamento_registrado')
+
+            if registrado is not None:
+                st.success(f"✅ Pagamento registrado com sucesso! ID: {registrado}")
+                if st.session_state.pop('celebrar_pagamento', False):
+                    st.balloons()
+                if st.button("➕ Registrar outro pagamento"):
+                    st.session_state['chave_pagamento'] = uuid.uuid4().hex
+                    del st.session_state['pagamento_registrado']
+                    st.rerun()
+
             with st.form("registrar_pagamento"):
                 col1, col2 = st.columns(2)
 
@@ -1043,7 +897,7 @@ def show_pagamentos():
                     valor = st.number_input(
                         "Valor (KZ)*", min_value=0.0, step=1000.0, value=10000.0)
                     forma_pagamento = st.selectbox(
-                        "Forma de Pagamento*", ["Dinheiro", "Transferência", "Cartão", "Multicaixa"])
+                        "Forma de Pagamento*", FORMAS_PAGAMENTO)
 
                 with col2:
                     data_pagamento = st.date_input(
@@ -1054,11 +908,12 @@ def show_pagamentos():
                     observacoes = st.text_area(
                         "Observações", placeholder="Informações adicionais...")
 
-                if st.form_submit_button("💾 Registrar Pagamento"):
+                registrou = False
+                if st.form_submit_button("💾 Registrar Pagamento", disabled=registrado is not None):
                     if atleta_nome and valor > 0 and mes_referencia:
                         try:
-                            atleta_id = df_atletas[df_atletas['nome']
-                                                   == atleta_nome].iloc[0]['id']
+                            atleta_id = int(df_atletas[df_atletas['nome']
+                                                       == atleta_nome].iloc[0]['id'])
                             pagamento_id = db.registrar_pagamento(
                                 atleta_id=atleta_id,
                                 data_pagamento=data_pagamento.strftime(
@@ -1066,59 +921,92 @@ def show_pagamentos():
                                 valor=valor,
                                 mes_referencia=mes_referencia,
                                 forma_pagamento=forma_pagamento,
-                                observacoes=observacoes
+                                observacoes=observacoes,
+                                chave_idempotencia=chave
                             )
-                            st.success(
-                                f"✅ Pagamento registrado com sucesso! ID: {pagamento_id}")
-                            st.balloons()
+                            registrou = registrado is None
+                            st.session_state['pagamento_registrado'] = pagamento_id
                         except Exception as e:
                             st.error(f"❌ Erro ao registrar pagamento: {e}")
                     else:
                         st.error("⚠️ Preencha todos os campos obrigatórios (*)")
 
+            # Mostra o registro e trava o formulário até o usuário pedir um novo
+            if registrou:
+                st.session_state['celebrar_pagamento'] = True
+                st.rerun()
+
     with tab2:
         st.subheader("📋 Histórico de Pagamentos")
 
-        df_pagamentos = db.get_pagamentos()
-        if df_pagamentos.empty:
-            st.info("📝 Nenhum pagamento registrado ainda.")
+        # Filtros (aplicados no banco)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            termo_atleta = st.text_input(
+                "🔍 Buscar atleta", placeholder="Nome, telefone ou email")
+            atletas_encontrados = db.buscar_atletas(
+                termo_atleta) if termo_atleta else []
+            opcoes_atleta = {"Todos": None}
+            opcoes_atleta.update({f"{a['nome']} (ID {a['id']})": a['id']
+                                  for a in atletas_encontrados})
+            filtro_atleta = st.selectbox(
+                "Filtrar por atleta", list(opcoes_atleta))
+        with col2:
+            filtro_mes = st.text_input(
+                "Filtrar por mês (YYYY-MM)", placeholder="2024-01")
+        with col3:
+            filtro_forma = st.selectbox(
+                "Filtrar por forma de pagamento", ["Todas"] + list(FORMAS_PAGAMENTO))
+
+        filtros = {
+            'atleta_id': opcoes_atleta[filtro_atleta],
+            'mes_referencia': filtro_mes.strip() or None,
+            'forma_pagamento': None if filtro_forma == "Todas" else filtro_forma
+        }
+        por_pagina = 50
+        pagina = st.number_input(
+            "Página", min_value=1, step=1, key="historico_pagina")
+
+        try:
+            df_pagina, totais = db.buscar_pagamentos(
+                limite=por_pagina, offset=(pagina - 1) * por_pagina, **filtros)
+        except ValueError as e:
+            st.error(f"⚠️ {e}")
+            df_pagina, totais = None, None
+
+        if totais is None:
+            pass
+        elif totais['total_pagamentos'] == 0:
+            st.info("📝 Nenhum pagamento encontrado.")
         else:
-            # Filtros
-            col1, col2 = st.columns(2)
-            with col1:
-                filtro_atleta = st.selectbox("Filtrar por atleta", [
-                                             "Todos"] + df_pagamentos['atleta_nome'].unique().tolist())
-            with col2:
-                filtro_mes = st.text_input(
-                    "Filtrar por mês (YYYY-MM)", placeholder="2024-01")
-
-            # Aplicar filtros
-            df_filtrado = df_pagamentos.copy()
-            if filtro_atleta != "Todos":
-                df_filtrado = df_filtrado[df_filtrado['atleta_nome']
-                                          == filtro_atleta]
-            if filtro_mes:
-                df_filtrado = df_filtrado[df_filtrado['mes_referencia']
-                                          == filtro_mes]
+            total_paginas = max(
+                (totais['total_pagamentos'] - 1) // por_pagina + 1, 1)
+            if pagina > total_paginas:
+                # Página além do fim (ex.: o filtro mudou): mostra a última
+                pagina = total_paginas
+                df_pagina, totais = db.buscar_pagamentos(
+                    limite=por_pagina, offset=(pagina - 1) * por_pagina, **filtros)
 
             st.dataframe(
-                df_filtrado[['id', 'atleta_nome', 'data_pagamento',
-                             'valor', 'mes_referencia', 'forma_pagamento']],
+                df_pagina[['id', 'atleta_nome', 'data_pagamento',
+                           'valor', 'mes_referencia', 'forma_pagamento']],
                 use_container_width=True,
                 hide_index=True
             )
+            st.caption(
+                f"Página {pagina} de {total_paginas} ({totais['total_pagamentos']} pagamentos)")
 
-            # Estatísticas rápidas
+            # Estatísticas rápidas (de todo o filtro, não só da página)
             st.subheader("📊 Resumo")
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Total de Pagamentos", len(df_filtrado))
+                st.metric("Total de Pagamentos", totais['total_pagamentos'])
             with col2:
                 st.metric("Valor Total",
-                          f"KZ {df_filtrado['valor'].sum():,.2f}")
+                          f"KZ {totais['valor_total']:,.2f}")
             with col3:
                 st.metric("Valor Médio",
-                          f"KZ {df_filtrado['valor'].mean():,.2f}")
+                          f"KZ {totais['valor_medio']:,.2f}")
 
     with tab3:
         st.subheader("📊 Estatísticas de Pagamentos")
@@ -1139,13 +1027,40 @@ def show_pagamentos():
         with col4:
             st.metric("📊 Crescimento", f"{stats['crescimento']:+.1f}%")
 
+        # Previsão de receita (renovações + novos atletas)
+        previsao = previsao_do_dia(
+            db.get_versao_dados('pagamentos', 'atletas', 'cache_coortes'),
+            datetime.now().strftime('%Y-%m-%d'), db)
+        receita_prevista = stats['receita_mes_atual'] + \
+            previsao['mes_atual']['receita_prevista']
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("🔮 Previsão do Mês", f"KZ {receita_prevista:,.2f}",
+                      f"+KZ {previsao['mes_atual']['receita_prevista']:,.2f} até o fim do mês",
+                      delta_color="off")
+        with col2:
+            percentual_previsto = (receita_prevista / meta * 100) if meta > 0 else 0
+            st.metric("🎯 % da Meta (previsto)", f"{percentual_previsto:.1f}%")
+        with col3:
+            proximo = previsao['proximo_mes']
+            st.metric(f"📅 Previsão {proximo['mes']}",
+                      f"KZ {proximo['receita_prevista']:,.2f}",
+                      f"{proximo['renovacoes_previstas']:.0f} renovações previstas",
+                      delta_color="off")
+        with col4:
+            st.metric("🔄 Taxa de Renovação",
+                      f"{previsao['taxa_renovacao'] * 100:.1f}%")
+
 
 def show_relatorios_financeiros():
     """Exibe relatórios financeiros detalhados"""
+    db = obter_db()
     st.header("📊 Relatórios Financeiros")
 
-    tab1, tab2, tab3 = st.tabs(
-        ["📈 Receita Mensal", "👥 Performance por Atleta", "📋 Relatório Detalhado"])
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(
+        ["📈 Receita Mensal", "👥 Performance por Atleta", "📋 Relatório Detalhado",
+         "🏢 Consolidado da Rede", "🔁 Retenção por Coorte", "⏳ Inadimplência"])
 
     with tab1:
         st.subheader("📈 Evolução da Receita")
@@ -1153,14 +1068,22 @@ def show_relatorios_financeiros():
         stats = db.get_estatisticas_avancadas()
 
         if not stats['receita_12_meses'].empty:
-            fig = px.bar(
-                stats['receita_12_meses'],
-                x='mes',
-                y='receita_mensal',
-                title="Receita Mensal - Últimos 12 Meses",
-                labels={'mes': 'Mês', 'receita_mensal': 'Receita (KZ)'}
+            def construir_receita():
+                fig = px.bar(
+                    stats['receita_12_meses'],
+                    x='mes',
+                    y='receita_mensal',
+                    title="Receita Mensal - Últimos 12 Meses",
+                    labels={'mes': 'Mês', 'receita_mensal': 'Receita (KZ)'}
+                )
+                fig.update_layout(height=500)
+                return fig
+
+            fig = figura_em_cache(
+                f"relatorio_receita_{datetime.now().strftime('%Y-%m-%d')}",
+                db.get_versao_dados('pagamentos'),
+                construir_receita
             )
-            fig.update_layout(height=500)
             st.plotly_chart(fig, use_container_width=True)
 
             # Tabela de dados
@@ -1173,28 +1096,43 @@ def show_relatorios_financeiros():
     with tab2:
         st.subheader("👥 Performance por Atleta")
 
-        df_atletas = db.get_all_atletas()
-        df_pagamentos = db.get_pagamentos()
-
-        if not df_pagamentos.empty and not df_atletas.empty:
-            # Calcular receita por atleta
-            receita_por_atleta = df_pagamentos.groupby(
-                'atleta_nome')['valor'].sum().reset_index()
-            receita_por_atleta = receita_por_atleta.sort_values(
-                'valor', ascending=False)
-
-            fig = px.pie(
-                receita_por_atleta,
-                values='valor',
-                names='atleta_nome',
-                title="Distribuição de Receita por Atleta"
+        top_n = st.slider("Atletas no gráfico", min_value=5,
+                          max_value=20, value=10)
+        df_top = db.get_receita_top_atletas(top_n)
+
+        if not df_top.empty:
+            fig = figura_em_cache(
+                f"relatorio_receita_por_atleta_{top_n}",
+                db.get_versao_dados('pagamentos', 'atletas'),
+                lambda: px.pie(
+                    df_top,
+                    values='valor',
+                    names='rotulo',
+                    title=f"Distribuição de Receita por Atleta (Top {top_n})"
+                )
             )
             st.plotly_chart(fig, use_container_width=True)
 
-            # Top atletas
+            # Top atletas (paginado)
             st.subheader("🏆 Top Atletas por Receita")
-            st.dataframe(receita_por_atleta,
-                         use_container_width=True, hide_index=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                por_pagina = st.selectbox(
+                    "Atletas por página", [20, 50, 100], key="ranking_por_pagina")
+
+            df_ranking, total = db.get_ranking_receita(por_pagina, 0)
+            total_paginas = max((total - 1) // por_pagina + 1, 1)
+            with col2:
+                pagina = st.number_input(
+                    "Página", min_value=1, max_value=total_paginas, value=1, key="ranking_pagina")
+
+            if pagina > 1:
+                df_ranking, total = db.get_ranking_receita(
+                    por_pagina, (pagina - 1) * por_pagina)
+
+            st.dataframe(df_ranking, use_container_width=True, hide_index=True)
+            st.caption(
+                f"Página {pagina} de {total_paginas} ({total} atletas com pagamentos)")
         else:
             st.info("📊 Aguardando dados para gerar relatórios...")
 
@@ -1211,22 +1149,8 @@ def show_relatorios_financeiros():
 
         if st.button("🔄 Gerar Relatório"):
             try:
-                conn = db.get_connection()
-                df_relatorio = pd.read_sql('''
-                    SELECT 
-                        a.nome as atleta,
-                        p.data_pagamento,
-                        p.valor,
-                        p.mes_referencia,
-                        p.forma_pagamento,
-                        a.plano,
-                        a.status
-                    FROM pagamentos p
-                    JOIN atletas a ON p.atleta_id = a.id
-                    WHERE date(p.data_pagamento) BETWEEN ? AND ?
-                    ORDER BY p.data_pagamento DESC
-                ''', conn, params=(data_inicio.strftime('%Y-%m-%d'), data_fim.strftime('%Y-%m-%d')))
-                conn.close()
+                df_relatorio = db.get_relatorio_pagamentos(
+                    data_inicio.strftime('%Y-%m-%d'), data_fim.strftime('%Y-%m-%d'))
 
                 if not df_relatorio.empty:
                     st.dataframe(
@@ -1261,12 +1185,181 @@ def show_relatorios_financeiros():
             except Exception as e:
                 st.error(f"❌ Erro ao gerar relatório: {e}")
 
+    with tab4:
+        st.subheader("🏢 Receita Consolidada de Todas as Filiais")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            inicio_rede = st.date_input(
+                "Data inicial", value=datetime.now().replace(day=1), key="rede_inicio")
+        with col2:
+            fim_rede = st.date_input(
+                "Data final", value=datetime.now(), key="rede_fim")
+
+        if st.button("🔄 Gerar Relatório Consolidado"):
+            try:
+                with st.spinner("Consultando filiais..."):
+                    df_rede, modo = motor_relatorios.receita_consolidada(
+                        inicio_rede, fim_rede)
+
+                if not df_rede.empty:
+                    por_filial = df_rede.groupby('filial', as_index=False)[
+                        ['receita', 'total_pagamentos']].sum().sort_values('receita', ascending=False)
+
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Receita da Rede",
+                                  f"KZ {por_filial['receita'].sum():,.2f}")
+                    with col2:
+                        st.metric("Total Pagamentos",
+                                  int(por_filial['total_pagamentos'].sum()))
+                    with col3:
+                        st.metric("Filiais", len(por_filial))
+
+                    fig = px.bar(
+                        df_rede.groupby(['mes', 'filial'], as_index=False)[
+                            'receita'].sum(),
+                        x='mes', y='receita', color='filial',
+                        title="Receita Mensal por Filial",
+                        labels={'mes': 'Mês', 'receita': 'Receita (KZ)'}
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+
+                    st.dataframe(por_filial, use_container_width=True,
+                                 hide_index=True)
+                    st.caption(f"Consulta executada via {modo}")
+
+                    st.download_button(
+                        label="📥 Download CSV",
+                        data=df_rede.to_csv(index=False),
+                        file_name=f"relatorio_rede_{inicio_rede}_{fim_rede}.csv",
+                        mime="text/csv"
+                    )
+                else:
+                    st.info("📊 Nenhum dado encontrado para o período selecionado.")
+
+            except Exception as e:
+                st.error(f"❌ Erro ao gerar relatório: {e}")
+
+
+    with tab5:
+        st.subheader("🔁 Retenção por Coorte de Cadastro")
+        st.caption("Cada linha é o mês de cadastro; cada coluna, os meses seguintes. "
+                   "Só entram meses já fechados.")
+
+        coortes = obter_coortes(db)
+        retencao = coortes['retencao']
+
+        if retencao.empty:
+            st.info("📊 Ainda não há meses fechados com atletas cadastrados.")
+        else:
+            mes_atual = datetime.now().strftime('%Y-%m')
+            versao_coortes = db.get_versao_dados('cache_coortes')
+            max_coortes = len(retencao)
+            if len(retencao) > 1:
+                max_coortes = st.slider("Coortes exibidas", min_value=1,
+                                        max_value=len(retencao), value=min(12, len(retencao)))
+
+            def construir_heatmap():
+                recorte = retencao.tail(max_coortes)
+                recorte = recorte.loc[:, recorte.notna().any()]
+                fig = go.Figure(go.Heatmap(
+                    z=recorte.values * 100,
+                    x=[f"M{n}" for n in recorte.columns],
+                    y=[f"{coorte} ({coortes['tamanhos'].loc[coorte, 'atletas']})"
+                       for coorte in recorte.index],
+                    colorscale='Blues', zmin=0, zmax=100,
+                    hovertemplate="%{y} %{x}: %{z:.1f}%<extra></extra>"
+                ))
+                fig.update_layout(title="Retenção no Mês N (%)", height=450,
+                                  yaxis_autorange='reversed')
+                return fig
+
+            st.plotly_chart(figura_em_cache(
+                f"coortes_heatmap_{mes_atual}_{max_coortes}", versao_coortes, construir_heatmap),
+                use_container_width=True)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                def construir_sobrevivencia():
+                    curva = coortes['curva']
+                    fig = px.line(curva, x='mes_n', y=['retencao', 'sobrevivencia'],
+                                  title="Curva de Retenção e Sobrevivência",
+                                  labels={'mes_n': 'Meses após o cadastro', 'value': 'Atletas'})
+                    fig.update_yaxes(tickformat='.0%')
+                    return fig
+
+                st.plotly_chart(figura_em_cache(
+                    f"coortes_curva_{mes_atual}", versao_coortes, construir_sobrevivencia),
+                    use_container_width=True)
+
+            with col2:
+                def construir_churn():
+                    churn = coortes['churn'].tail(12)
+                    fig = px.bar(churn, x='mes', y='churn', title="Churn Mensal",
+                                 labels={'mes': 'Mês', 'churn': 'Churn'},
+                                 hover_data=['ativos_inicio', 'perdidos'])
+                    fig.update_yaxes(tickformat='.0%')
+                    return fig
+
+                st.plotly_chart(figura_em_cache(
+                    f"coortes_churn_{mes_atual}", versao_coortes, construir_churn),
+                    use_container_width=True)
+
+    with tab6:
+        st.subheader("⏳ Inadimplência por Faixa de Atraso")
+        st.caption("Atletas com plano vencido; o valor em aberto é o valor do plano.")
+
+        hoje = datetime.now().strftime('%Y-%m-%d')
+        aging = db.get_aging_recebiveis()
+
+        col1, col2, col3, col4 = st.columns(4)
+        for coluna, linha in zip((col1, col2, col3, col4), aging.itertuples()):
+            with coluna:
+                st.metric(f"{linha.faixa} dias", f"KZ {linha.valor_em_aberto:,.2f}",
+                          f"{linha.atletas} atletas", delta_color="off")
+
+        if aging['atletas'].sum() == 0:
+            st.success("✅ Nenhum atleta com plano vencido!")
+        else:
+            fig = figura_em_cache(
+                f"inadimplencia_{hoje}",
+                db.get_versao_dados('atletas'),
+                lambda: px.bar(
+                    aging, x='faixa', y='valor_em_aberto',
+                    title="Valor em Aberto por Faixa de Atraso",
+                    labels={'faixa': 'Dias de atraso', 'valor_em_aberto': 'Valor (KZ)'},
+                    hover_data=['atletas']
+                )
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+            faixa = st.selectbox("Faixa", ["Todas"] + list(FAIXAS_ATRASO),
+                                 key="inadimplencia_faixa")
+            df_atraso = db.get_recebiveis_em_atraso(
+                None if faixa == "Todas" else faixa)
+
+            st.dataframe(df_atraso.head(500), use_container_width=True,
+                         hide_index=True)
+            if len(df_atraso) > 500:
+                st.caption(
+                    f"Exibindo os 500 mais antigos de {len(df_atraso)} atletas; o CSV traz todos.")
+
+            st.download_button(
+                label="📥 Download CSV",
+                data=df_atraso.to_csv(index=False),
+                file_name=f"inadimplencia_{faixa.lower()}_{hoje}.csv",
+                mime="text/csv"
+            )
+
 
 def show_configuracoes():
     """Exibe configurações do sistema"""
+    db = obter_db()
     st.header("⚙️ Configurações do Sistema")
 
-    tab1, tab2, tab3 = st.tabs(["🎯 Metas", "💼 Planos", "🔧 Sistema"])
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["🎯 Metas", "💼 Planos", "🔧 Sistema", "🏢 Filiais"])
 
     with tab1:
         st.subheader("🎯 Metas de Receita")
@@ -1314,7 +1407,14 @@ def show_configuracoes():
         with col1:
             st.write("**Backup de Dados**")
             if st.button("📥 Exportar Backup"):
-                st.info("Funcionalidade de exportação em desenvolvimento")
+                with st.spinner("Gerando backup..."):
+                    status = agendador.executar_agora("backup").result()
+                if status == 'sucesso':
+                    st.success("✅ Backup gerado na pasta backups/")
+                elif status == 'erro':
+                    st.error("❌ Erro ao gerar backup. Veja o histórico de tarefas.")
+                else:
+                    st.info("⏳ Já existe um backup em andamento.")
 
             st.write("**Manutenção**")
             if st.button("🧹 Limpar Cache"):
@@ -1330,30 +1430,115 @@ def show_configuracoes():
             **Pandas:** {pd.__version__}
             """)
 
+            st.write("**Memória da Sessão**")
+            df_atletas = db.get_all_atletas()
+            st.metric("Tabela de atletas em memória",
+                      f"{memoria_dataframe(df_atletas) / 1024:,.1f} KB",
+                      f"{len(df_atletas)} atletas", delta_color="off")
+
         st.markdown("---")
-        st.subheader("📋 Logs do Sistema")
-        if st.button("📄 Visualizar Logs"):
-            st.info("Funcionalidade de logs em desenvolvimento")
+        st.subheader("⏱️ Tarefas Agendadas")
+
+        st.dataframe(
+            pd.DataFrame([
+                {'tarefa': tarefa.nome, 'agenda (cron)': tarefa.cron.expressao,
+                 'descrição': tarefa.descricao}
+                for tarefa in agendador.tarefas.values()
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            tarefa_manual = st.selectbox(
+                "Executar tarefa agora", list(agendador.tarefas))
+        with col2:
+            st.write("")
+            if st.button("▶️ Executar"):
+                with st.spinner(f"Executando {tarefa_manual}..."):
+                    status = agendador.executar_agora(tarefa_manual).result()
+                if status is None:
+                    st.info("⏳ A tarefa já está em execução.")
+                else:
+                    st.write(f"Resultado: **{status}**")
+
+        st.subheader("📋 Histórico de Execuções")
+        historico = agendador.get_historico()
+        if historico:
+            st.dataframe(pd.DataFrame(historico),
+                         use_container_width=True, hide_index=True)
+        else:
+            st.info("Nenhuma tarefa executada ainda.")
+
+        st.markdown("---")
+        st.subheader("🗄️ Arquivo de Pagamentos")
+        st.caption("Anos fechados saem da tabela de pagamentos e vão para arquivos Parquet; "
+                   "relatórios e rankings continuam incluindo esses pagamentos.")
+
+        arquivados = db.arquivo.anos_arquivados()
+        if not arquivados.empty:
+            st.dataframe(arquivados, use_container_width=True, hide_index=True)
+
+        anos = db.arquivo.anos_arquivaveis()
+        if anos:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                ano_arquivo = st.selectbox("Ano a arquivar", anos)
+            with col2:
+                st.write("")
+                if st.button("🗄️ Arquivar"):
+                    with st.spinner(f"Arquivando {ano_arquivo}..."):
+                        linhas = db.arquivo.arquivar_ano(ano_arquivo)
+                    st.success(f"✅ {linhas} pagamentos de {ano_arquivo} arquivados")
+        else:
+            st.info("Nenhum ano fechado para arquivar.")
+
+    with tab4:
+        st.subheader("🏢 Filiais")
+
+        st.dataframe(roteador.listar_filiais(),
+                     use_container_width=True, hide_index=True)
+
+        with st.form("nova_filial", clear_on_submit=True):
+            nome_filial = st.text_input(
+                "Nome da nova filial", placeholder="Ex: Talatona")
+            if st.form_submit_button("➕ Criar Filial"):
+                if not nome_filial:
+                    st.error("⚠️ Informe o nome da filial")
+                elif roteador.criar_filial(nome_filial):
+                    receita_da_rede_no_mes.clear()
+                    st.success(f"✅ Filial **{nome_filial}** criada!")
+                else:
+                    st.error("❌ Já existe uma filial com este nome!")
+
+        st.subheader("💰 Receita Consolidada do Mês")
+        df_consolidado = receita_da_rede_no_mes(
+            datetime.now().strftime('%Y-%m'), db.get_versao_dados('pagamentos'))
+        st.metric("Receita total da rede",
+                  f"KZ {df_consolidado['receita'].sum():,.2f}")
+        st.dataframe(df_consolidado[['filial', 'receita', 'total_pagamentos']],
+                     use_container_width=True, hide_index=True)
 
 # Interface principal (após login)
 
 
 def main_app():
     """Interface principal após login"""
+    db = obter_db()
     usuario = st.session_state['usuario']
 
     st.title(f"🏋️ GymMaster - Olá, {usuario['nome']}!")
     st.markdown("---")
 
-    # Atualizar status automaticamente
-    db.update_atleta_status()
-
     # Menu lateral com notificações
     with st.sidebar:
         st.title("📋 Menu")
 
         # Informações do usuário
-        st.info(f"👤 {usuario['nome']}")
+        filiais = roteador.listar_filiais().set_index('id')['nome']
+        st.info(
+            f"👤 {usuario['nome']}  \n🏢 {filiais.get(usuario.get('filial_id', 1), 'Principal')}")
 
         # Seção de notificações
         notificacoes = db.get_notificacoes()
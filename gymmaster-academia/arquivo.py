@@ -0,0 +1,429 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Arquivo frio de pagamentos: anos fechados saem da tabela e vão para Parquet
+
+COLUNAS_ARQUIVO = ['id', 'atleta_id', 'data_pagamento', 'valor_centavos',
+                   'mes_referencia', 'forma_pagamento', 'observacoes']
+
+ESQUEMA_ARQUIVO = pa.schema([
+    ('id', pa.int64()),
+    ('atleta_id', pa.int64()),
+    ('data_pagamento', pa.string()),
+    ('valor_centavos', pa.int64()),
+    ('mes_referencia', pa.string()),
+    ('forma_pagamento', pa.string()),
+    ('observacoes', pa.string()),
+])
+
+# Pagamentos por grupo de linhas; as estatísticas (mín/máx) de cada grupo
+# permitem pular grupos inteiros num filtro por data
+LINHAS_POR_GRUPO = 64 * 1024
+
+
+class ArquivoPagamentos:
+    """Move anos fechados de pagamentos para arquivos Parquet (um por ano)
+
+    O catálogo fica no próprio banco (arquivo_pagamentos), gravado na mesma
+    transação que apaga as linhas arquivadas: um arquivo só é lido depois
+    que as linhas dele saíram da tabela, então a união nunca duplica.
+    Resumos por atleta, por mês e por dia também são gravados no banco, para
+    que rankings, séries mensais e relatórios não precisem abrir os arquivos.
+
+    Só podem ser arquivados anos anteriores ao ano passado, para que o
+    gráfico de 12 meses e o mês anterior do dashboard fiquem sempre na tabela.
+    """
+
+    def __init__(self, db, pasta=None):
+        self.db = db
+        self.pasta = pasta or os.path.splitext(db.db_name)[0] + '_arquivo'
+
+    def anos_arquivados(self):
+        """Catálogo: ano, arquivo, linhas, soma em KZ e data do arquivamento"""
+        conn = self.db.get_connection()
+        df = pd.read_sql('''
+            SELECT ano, arquivo, linhas, soma_centavos / 100.0 AS valor_total, data_arquivamento
+            FROM arquivo_pagamentos
+            ORDER BY ano
+        ''', conn)
+        conn.close()
+        return df
+
+    def anos_arquivaveis(self, hoje=None):
+        """Anos com pagamentos na tabela que já podem ser arquivados"""
+        hoje = hoje or datetime.now().date()
+        conn = self.db.get_connection()
+        cursor = conn.execute('''
+            SELECT DISTINCT CAST(substr(data_pagamento, 1, 4) AS INTEGER) AS ano
+            FROM pagamentos
+            WHERE data_pagamento < ?
+            ORDER BY ano
+        ''', (f"{hoje.year - 1:04d}-01-01",))
+        anos = [ano for ano, in cursor.fetchall()]
+        conn.close()
+        return anos
+
+    def arquivar_ano(self, ano, hoje=None):
+        """Grava os pagamentos do ano em Parquet e os remove da tabela; retorna quantos"""
+        hoje = hoje or datetime.now().date()
+        if ano >= hoje.year - 1:
+            raise ValueError(f"Só anos anteriores a {hoje.year - 1} podem ser arquivados")
+
+        inicio, fim = f"{ano:04d}-01-01", f"{ano + 1:04d}-01-01"
+        os.makedirs(self.pasta, exist_ok=True)
+        self.limpar_arquivos_antigos()
+        arquivo = None
+        conn = self.db.get_connection()
+
+        try:
+            # Trava de escrita durante todo o processo: ninguém altera o ano no meio
+            conn.execute("BEGIN IMMEDIATE")
+            novos = pd.read_sql(f'''
+                SELECT {', '.join(COLUNAS_ARQUIVO)}
+                FROM pagamentos
+                WHERE data_pagamento >= ? AND data_pagamento < ?
+            ''', conn, params=(inicio, fim))
+            if novos.empty:
+                conn.rollback()
+                return 0
+
+            # Ano já arquivado (pagamento retroativo): junta com o arquivo atual
+            anterior = conn.execute(
+                "SELECT arquivo FROM arquivo_pagamentos WHERE ano = ?", (ano,)).fetchone()
+            tabela = pa.Table.from_pandas(novos, schema=ESQUEMA_ARQUIVO, preserve_index=False)
+            if anterior:
+                tabela = pa.concat_tables([pq.read_table(anterior[0], schema=ESQUEMA_ARQUIVO),
+                                           tabela])
+            tabela = tabela.sort_by([('data_pagamento', 'ascending'), ('id', 'ascending')])
+
+            # Nome novo a cada gravação: o arquivo do catálogo só muda no commit
+            arquivo = os.path.join(
+                self.pasta, f"pagamentos_{ano}_{datetime.now():%Y%m%d%H%M%S%f}.parquet")
+            pq.write_table(tabela, arquivo, compression='zstd',
+                           row_group_size=LINHAS_POR_GRUPO)
+
+            self._resumir(conn, inicio, fim)
+            conn.execute('''
+                INSERT INTO arquivo_pagamentos (ano, arquivo, linhas, soma_centavos, data_arquivamento)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(ano) DO UPDATE SET
+                    arquivo = excluded.arquivo, linhas = excluded.linhas,
+                    soma_centavos = excluded.soma_centavos,
+                    data_arquivamento = excluded.data_arquivamento
+            ''', (ano, arquivo, tabela.num_rows,
+                  pc.sum(tabela['valor_centavos']).as_py() or 0))
+            # Com particionamento, apaga direto na partição do ano
+            self._apagar_ano(conn, self.db.particoes.tabela_do_ano(conn, ano), inicio, fim)
+            if anterior:
+                # A carência da limpeza passa a contar de quando saiu do catálogo
+                os.utime(anterior[0])
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            if arquivo and os.path.exists(arquivo):
+                os.remove(arquivo)
+            raise
+        finally:
+            conn.close()
+
+        # O arquivo substituído pode estar sendo lido por quem consultou o
+        # catálogo antes do commit: fica para a próxima limpeza
+        return len(novos)
+
+    def _apagar_ano(self, conn, tabela, inicio, fim):
+        """Apaga o ano da tabela sem disparar os triggers de versão linha a linha
+
+        Os triggers AFTER DELETE (versão e cache de coortes) rodariam uma vez
+        por pagamento, com a trava de escrita tomada. Eles saem só dentro da
+        transação (um rollback os devolve) e as versões sobem uma vez só.
+        """
+        nomes = (f"trg_versao_{tabela}_delete", f"trg_cache_coortes_{tabela}_delete")
+        triggers = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN (?, ?)",
+            nomes).fetchall()
+        for nome, _ in triggers:
+            conn.execute(f"DROP TRIGGER {nome}")
+
+        conn.execute(f"DELETE FROM {tabela} WHERE data_pagamento >= ? AND data_pagamento < ?",
+                     (inicio, fim))
+
+        for _, sql in triggers:
+            conn.execute(sql)
+        # O que os triggers fariam: um ano arquivado só tem meses fechados
+        conn.execute("DELETE FROM cache_coortes")
+        conn.execute('''
+            UPDATE versao_dados SET versao = versao + 1
+            WHERE tabela IN ('pagamentos', 'cache_coortes')
+        ''')
+
+    def limpar_arquivos_antigos(self, carencia=3600):
+        """Apaga os Parquet que saíram do catálogo; retorna quantos
+
+        Só os sem alteração há mais de `carencia` segundos: um recém substituído
+        ainda pode estar sendo lido, e um recém gravado pode ser de um
+        arquivamento em andamento, que ainda não fez commit.
+        """
+        if not os.path.isdir(self.pasta):
+            return 0
+        conn = self.db.get_connection()
+        catalogo = {os.path.abspath(arquivo) for arquivo, in conn.execute(
+            "SELECT arquivo FROM arquivo_pagamentos").fetchall()}
+        conn.close()
+
+        limite = time.time() - carencia
+        removidos = 0
+        for nome in os.listdir(self.pasta):
+            caminho = os.path.abspath(os.path.join(self.pasta, nome))
+            if (nome.startswith('pagamentos_') and nome.endswith('.parquet')
+                    and caminho not in catalogo and os.path.getmtime(caminho) < limite):
+                os.remove(caminho)
+                removidos += 1
+        return removidos
+
+    def _resumir(self, conn, inicio, fim):
+        """Acumula os resumos por atleta, mês e dia dos pagamentos que vão sair da tabela"""
+        # "Novo" = primeiro pagamento do atleta, considerando também anos já arquivados
+        conn.execute('''
+            INSERT INTO pagamentos_arquivados_por_mes (mes, quantidade, total_centavos, novos_centavos)
+            SELECT substr(data_pagamento, 1, 7), COUNT(*), SUM(valor_centavos),
+                   SUM(CASE WHEN id IN (SELECT MIN(id) FROM pagamentos GROUP BY atleta_id)
+                             AND atleta_id NOT IN (SELECT atleta_id FROM pagamentos_arquivados_por_atleta)
+                            THEN valor_centavos ELSE 0 END)
+            FROM pagamentos
+            WHERE data_pagamento >= ? AND data_pagamento < ?
+            GROUP BY 1
+            ON CONFLICT(mes) DO UPDATE SET
+                quantidade = quantidade + excluded.quantidade,
+                total_centavos = total_centavos + excluded.total_centavos,
+                novos_centavos = novos_centavos + excluded.novos_centavos
+        ''', (inicio, fim))
+        conn.execute('''
+            INSERT INTO pagamentos_arquivados_por_atleta
+                (atleta_id, quantidade, soma_centavos, ultimo_pagamento)
+            SELECT atleta_id, COUNT(*), SUM(valor_centavos), MAX(data_pagamento)
+            FROM pagamentos
+            WHERE data_pagamento >= ? AND data_pagamento < ?
+            GROUP BY atleta_id
+            ON CONFLICT(atleta_id) DO UPDATE SET
+                quantidade = quantidade + excluded.quantidade,
+                soma_centavos = soma_centavos + excluded.soma_centavos,
+                ultimo_pagamento = MAX(ultimo_pagamento, excluded.ultimo_pagamento)
+        ''', (inicio, fim))
+        conn.execute('''
+            INSERT INTO pagamentos_arquivados_por_dia
+                (data_pagamento, forma_pagamento, quantidade, total_centavos)
+            SELECT data_pagamento, COALESCE(forma_pagamento, ''), COUNT(*), SUM(valor_centavos)
+            FROM pagamentos
+            WHERE data_pagamento >= ? AND data_pagamento < ?
+            GROUP BY 1, 2
+            ON CONFLICT(data_pagamento, forma_pagamento) DO UPDATE SET
+                quantidade = quantidade + excluded.quantidade,
+                total_centavos = total_centavos + excluded.total_centavos
+        ''', (inicio, fim))
+
+    def descontar_atletas(self, conn, atleta_ids):
+        """Tira dos resumos os pagamentos arquivados dos atletas que vão ser excluídos
+
+        Roda na transação da exclusão. Os arquivos Parquet não são reescritos
+        (as leituras já deixam de fora pagamentos de atletas excluídos); só os
+        pagamentos desses atletas são lidos deles. Retorna quantos descontou.
+        """
+        atleta_ids = [atleta_id for atleta_id, in conn.execute('''
+            SELECT atleta_id FROM pagamentos_arquivados_por_atleta
+            WHERE atleta_id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps([int(atleta_id) for atleta_id in atleta_ids]),))]
+        if not atleta_ids:
+            return 0
+
+        arquivos = [arquivo for arquivo, in conn.execute(
+            "SELECT arquivo FROM arquivo_pagamentos ORDER BY ano")]
+        pagamentos = ds.dataset(arquivos, format='parquet', schema=ESQUEMA_ARQUIVO).to_table(
+            columns=['id', 'atleta_id', 'data_pagamento', 'valor_centavos', 'forma_pagamento'],
+            filter=ds.field('atleta_id').isin(atleta_ids)).to_pandas()
+        pagamentos['mes'] = pagamentos['data_pagamento'].str[:7]
+        pagamentos['forma_pagamento'] = pagamentos['forma_pagamento'].fillna('')
+
+        # O primeiro pagamento de cada atleta foi contado como receita de novos
+        primeiros = pagamentos.loc[pagamentos.groupby('atleta_id')['id'].idxmin()]
+        por_mes = pagamentos.groupby('mes').agg(quantidade=('id', 'size'),
+                                                total_centavos=('valor_centavos', 'sum'))
+        por_mes['novos_centavos'] = primeiros.groupby('mes')['valor_centavos'].sum().reindex(
+            por_mes.index, fill_value=0)
+        conn.executemany('''
+            UPDATE pagamentos_arquivados_por_mes
+            SET quantidade = quantidade - ?, total_centavos = total_centavos - ?,
+                novos_centavos = MAX(novos_centavos - ?, 0)
+            WHERE mes = ?
+        ''', por_mes.reset_index()[['quantidade', 'total_centavos', 'novos_centavos', 'mes']]
+            .astype(object).itertuples(index=False, name=None))
+
+        por_dia = pagamentos.groupby(['data_pagamento', 'forma_pagamento'], as_index=False).agg(
+            quantidade=('id', 'size'), total_centavos=('valor_centavos', 'sum'))
+        conn.executemany('''
+            UPDATE pagamentos_arquivados_por_dia
+            SET quantidade = quantidade - ?, total_centavos = total_centavos - ?
+            WHERE data_pagamento = ? AND forma_pagamento = ?
+        ''', por_dia[['quantidade', 'total_centavos', 'data_pagamento', 'forma_pagamento']]
+            .astype(object).itertuples(index=False, name=None))
+
+        for tabela in ('pagamentos_arquivados_por_mes', 'pagamentos_arquivados_por_dia'):
+            conn.execute(f"DELETE FROM {tabela} WHERE quantidade <= 0")
+        conn.execute('''
+            DELETE FROM pagamentos_arquivados_por_atleta
+            WHERE atleta_id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(atleta_ids),))
+        return len(pagamentos)
+
+    def resumir_por_dia(self):
+        """Refaz pagamentos_arquivados_por_dia a partir dos arquivos (migração)
+
+        Como nos outros resumos, pagamentos de atletas já excluídos ficam de fora.
+        """
+        arquivados = self.ler(colunas=['atleta_id', 'data_pagamento', 'forma_pagamento',
+                                       'valor_centavos'])
+        conn = self.db.get_connection()
+        atletas = [atleta_id for atleta_id, in conn.execute("SELECT id FROM atletas")]
+        conn.close()
+        arquivados = arquivados[arquivados['atleta_id'].isin(atletas)].drop(columns='atleta_id')
+        resumo = (arquivados.fillna({'forma_pagamento': ''})
+                  .groupby(['data_pagamento', 'forma_pagamento'], as_index=False)
+                  .agg(quantidade=('valor_centavos', 'size'),
+                       total_centavos=('valor_centavos', 'sum')))
+        conn = self.db.get_connection()
+        try:
+            conn.execute("DELETE FROM pagamentos_arquivados_por_dia")
+            conn.executemany('''
+                INSERT INTO pagamentos_arquivados_por_dia
+                    (data_pagamento, forma_pagamento, quantidade, total_centavos)
+                VALUES (?, ?, ?, ?)
+            ''', resumo.astype(object).itertuples(index=False, name=None))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def ler(self, inicio=None, fim=None, colunas=None, atleta_id=None,
+            mes_referencia=None, forma_pagamento=None):
+        """Lê pagamentos arquivados com data em [inicio, fim] (datas ISO, inclusive)
+
+        Só abre os arquivos dos anos que o intervalo alcança; dentro deles os
+        filtros de data, atleta, mês de referência e forma de pagamento são
+        empurrados para a leitura, que pula grupos de linhas fora do intervalo.
+        """
+        colunas = colunas or COLUNAS_ARQUIVO
+        arquivos = self._arquivos(inicio, fim)
+        if not arquivos:
+            return ESQUEMA_ARQUIVO.empty_table().select(colunas).to_pandas()
+
+        expressao = _filtro(atleta_id, mes_referencia, forma_pagamento)
+        if inicio:
+            expressao = _e(expressao, ds.field('data_pagamento') >= inicio)
+        if fim:
+            expressao = _e(expressao, ds.field('data_pagamento') <= fim)
+
+        dataset = ds.dataset(arquivos, format='parquet', schema=ESQUEMA_ARQUIVO)
+        return dataset.to_table(columns=colunas, filter=expressao).to_pandas()
+
+    def ler_recentes(self, colunas=None, atleta_id=None, mes_referencia=None,
+                     forma_pagamento=None):
+        """Gera os pagamentos arquivados do mais recente para o mais antigo, em blocos
+
+        Cada bloco é um grupo de linhas de um arquivo, já filtrado e em ordem
+        decrescente de (data_pagamento, id). Anos e grupos são lidos do fim
+        para o começo e só quando pedidos: quem precisa das N primeiras linhas
+        para de iterar assim que as tiver.
+        """
+        colunas = colunas or COLUNAS_ARQUIVO
+        expressao = _filtro(atleta_id, mes_referencia, forma_pagamento)
+        for arquivo in reversed(self._arquivos()):
+            fragmento, = ds.dataset(arquivo, format='parquet',
+                                    schema=ESQUEMA_ARQUIVO).get_fragments()
+            # Os arquivos são gravados ordenados por (data_pagamento, id)
+            for grupo in reversed(fragmento.split_by_row_group(expressao)):
+                tabela = grupo.to_table(columns=colunas, filter=expressao)
+                if tabela.num_rows:
+                    yield tabela.to_pandas().iloc[::-1].reset_index(drop=True)
+
+    def totais(self, atleta_id=None, mes_referencia=None, forma_pagamento=None):
+        """Quantidade e soma em centavos dos pagamentos arquivados do filtro
+
+        Sem filtro, por forma de pagamento ou por atleta, saem dos resumos no
+        banco. O mês de referência não está nos resumos: com ele (ou com atleta
+        e forma juntos) lê do Parquet só as colunas de atleta e valor, deixando
+        de fora, como os resumos, os pagamentos de atletas excluídos.
+        """
+        conn = self.db.get_connection()
+        try:
+            if not mes_referencia and not (atleta_id and forma_pagamento):
+                if atleta_id:
+                    linha = conn.execute('''
+                        SELECT quantidade, soma_centavos FROM pagamentos_arquivados_por_atleta
+                        WHERE atleta_id = ?
+                    ''', (atleta_id,)).fetchone()
+                else:
+                    linha = conn.execute('''
+                        SELECT SUM(quantidade), SUM(total_centavos)
+                        FROM pagamentos_arquivados_por_dia
+                        WHERE ? IS NULL OR forma_pagamento = ?
+                    ''', (forma_pagamento or None, forma_pagamento)).fetchone()
+                return (int(linha[0] or 0), int(linha[1] or 0)) if linha else (0, 0)
+
+            arquivos = [arquivo for arquivo, in conn.execute(
+                "SELECT arquivo FROM arquivo_pagamentos ORDER BY ano")]
+            atletas = pa.array([atleta for atleta, in conn.execute("SELECT id FROM atletas")],
+                               pa.int64())
+        finally:
+            conn.close()
+
+        if not arquivos:
+            return 0, 0
+        expressao = _e(_filtro(atleta_id, mes_referencia, forma_pagamento),
+                       ds.field('atleta_id').isin(atletas))
+        tabela = ds.dataset(arquivos, format='parquet', schema=ESQUEMA_ARQUIVO).to_table(
+            columns=['valor_centavos'], filter=expressao)
+        return tabela.num_rows, pc.sum(tabela['valor_centavos']).as_py() or 0
+
+    def fronteira(self):
+        """Primeiro dia depois do último ano arquivado (None sem arquivo)
+
+        Todo pagamento da tabela com data a partir daí é mais recente que
+        qualquer pagamento arquivado.
+        """
+        conn = self.db.get_connection()
+        ano, = conn.execute("SELECT MAX(ano) FROM arquivo_pagamentos").fetchone()
+        conn.close()
+        return None if ano is None else f"{ano + 1:04d}-01-01"
+
+    def _arquivos(self, inicio=None, fim=None):
+        """Arquivos dos anos que [inicio, fim] alcança, em ordem de ano"""
+        conn = self.db.get_connection()
+        arquivos = [arquivo for arquivo, in conn.execute('''
+            SELECT arquivo FROM arquivo_pagamentos
+            WHERE ano >= CAST(substr(COALESCE(?, '0000'), 1, 4) AS INTEGER)
+              AND ano <= CAST(substr(COALESCE(?, '9999'), 1, 4) AS INTEGER)
+            ORDER BY ano
+        ''', (inicio, fim))]
+        conn.close()
+        return arquivos
+
+
+def _filtro(atleta_id=None, mes_referencia=None, forma_pagamento=None):
+    expressao = None
+    if atleta_id is not None:
+        expressao = ds.field('atleta_id') == atleta_id
+    if mes_referencia:
+        expressao = _e(expressao, ds.field('mes_referencia') == mes_referencia)
+    if forma_pagamento:
+        expressao = _e(expressao, ds.field('forma_pagamento') == forma_pagamento)
+    return expressao
+
+
+def _e(expressao, outra):
+    return outra if expressao is None else expressao & outra
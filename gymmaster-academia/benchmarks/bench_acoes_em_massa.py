@@ -0,0 +1,69 @@
+"""Compara o reajuste de planos atleta por atleta (update_atleta) x em massa
+
+Seleciona `--selecionados` atletas e aplica um reajuste de 10%: primeiro
+como a tela de edição fazia (um update_atleta por atleta, uma transação
+cada), depois com reajustar_valor_em_massa (um UPDATE numa transação).
+
+Uso: python benchmarks/bench_acoes_em_massa.py [--atletas 20000] [--selecionados 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+
+
+def popular(db, atletas):
+    conn = db.get_connection()
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO atletas (id, nome, data_vencimento, plano, valor_plano, valor_plano_centavos)
+        SELECT i, 'Atleta ' || i, date('now', '+' || (i % 60) || ' days'), 'Mensal', 10000, 1000000
+        FROM n
+    ''', (atletas,))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--atletas", type=int, default=20_000)
+    parser.add_argument("--selecionados", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db = DatabaseManager(db_name=os.path.join(pasta, "academia.db"))
+        popular(db, args.atletas)
+        ids = list(range(1, args.atletas + 1, args.atletas // args.selecionados))[:args.selecionados]
+
+        inicio = time.perf_counter()
+        for atleta_id in ids:
+            atleta = db.get_atleta_by_id(atleta_id)
+            db.update_atleta(atleta_id, atleta['nome'], atleta['telefone'], atleta['email'],
+                             atleta['data_nascimento'], atleta['data_vencimento'], atleta['plano'],
+                             atleta['valor_plano'] * 1.1, atleta['observacoes'],
+                             versao=int(atleta['versao']))
+        por_atleta = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        previstos = db.reajustar_valor_em_massa(ids, 10, previa=True)
+        previa = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        alterados = db.reajustar_valor_em_massa(ids, 10)
+        em_massa = time.perf_counter() - inicio
+        db.fechar()
+
+    print(f"Atletas: {args.atletas:,} | selecionados: {len(ids):,}")
+    print(f"Um update_atleta por atleta: {por_atleta * 1000:9.1f} ms")
+    print(f"Prévia em massa ({previstos:,}):   {previa * 1000:9.1f} ms")
+    print(f"Reajuste em massa ({alterados:,}): {em_massa * 1000:9.1f} ms "
+          f"({por_atleta / em_massa:,.0f}x mais rápido)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Teste de carga do endpoint de verificação de acesso da API (GET /acesso/{id})
+
+Sobe a API num banco temporário (ou usa --url de um servidor já em execução),
+abre conexões keep-alive concorrentes e mede requisições por segundo e latência.
+
+Uso: python benchmarks/bench_api_acesso.py [--atletas 10000] [--conexoes 50] [--duracao 10]
+     python benchmarks/bench_api_acesso.py --url http://127.0.0.1:8502 --atletas 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from urllib.parse import urlparse
+
+PASTA_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PASTA_APP)
+
+from database import DatabaseManager  # noqa: E402
+
+
+def popular(arquivo, total):
+    """Cria o banco com atletas sintéticos (vencidos, em alerta e ativos)"""
+    db = DatabaseManager(db_name=arquivo)
+    hoje = date.today()
+    linhas = []
+    for i in range(total):
+        vencimento = hoje + timedelta(days=random.randint(-60, 90))
+        linhas.append((f"Atleta {i}", f"9{random.randint(10000000, 99999999)}",
+                       f"atleta{i}@exemplo.ao", vencimento.isoformat(), "Mensal",
+                       10000.0, 1000000))
+
+    conn = db.get_connection()
+    conn.executemany('''
+        INSERT INTO atletas (nome, telefone, email, data_vencimento, plano,
+                             valor_plano, valor_plano_centavos)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', linhas)
+    conn.commit()
+    conn.close()
+    db.update_atleta_status()
+    db.fechar()
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def aguardar_servidor(host, porta, prazo=30):
+    limite = time.monotonic() + prazo
+    while time.monotonic() < limite:
+        try:
+            socket.create_connection((host, porta), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("A API não respondeu a tempo")
+
+
+async def cliente(host, porta, total_atletas, fim, latencias, erros):
+    """Uma conexão keep-alive fazendo requisições em sequência até o fim do teste"""
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    try:
+        while time.perf_counter() < fim:
+            atleta_id = random.randint(1, total_atletas)
+            inicio = time.perf_counter()
+            escritor.write(f"GET /acesso/{atleta_id} HTTP/1.1\r\n"
+                           f"Host: {host}\r\n\r\n".encode())
+            await escritor.drain()
+
+            cabecalho = await leitor.readuntil(b"\r\n\r\n")
+            status = int(cabecalho.split(b" ", 2)[1])
+            tamanho = 0
+            for linha in cabecalho.split(b"\r\n"):
+                if linha.lower().startswith(b"content-length:"):
+                    tamanho = int(linha.split(b":")[1])
+            await leitor.readexactly(tamanho)
+
+            latencias.append(time.perf_counter() - inicio)
+            if status != 200:
+                erros.append(status)
+    finally:
+        escritor.close()
+
+
+async def carga(host, porta, total_atletas, conexoes, duracao):
+    latencias, erros = [], []
+    fim = time.perf_counter() + duracao
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(host, porta, total_atletas, fim, latencias, erros)
+                           for _ in range(conexoes)))
+    return latencias, erros, time.perf_counter() - inicio
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="servidor já em execução (não cria banco)")
+    parser.add_argument("--atletas", type=int, default=10_000)
+    parser.add_argument("--conexoes", type=int, default=50)
+    parser.add_argument("--duracao", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        servidor = None
+        if args.url:
+            url = urlparse(args.url)
+            host, porta = url.hostname, url.port or 80
+        else:
+            host, porta = "127.0.0.1", porta_livre()
+            popular(os.path.join(pasta, "academia.db"), args.atletas)
+            servidor = subprocess.Popen(
+                [sys.executable, os.path.join(PASTA_APP, "api.py"), "--porta", str(porta)],
+                cwd=pasta)
+
+        try:
+            aguardar_servidor(host, porta)
+            latencias, erros, tempo = asyncio.run(
+                carga(host, porta, args.atletas, args.conexoes, args.duracao))
+        finally:
+            if servidor is not None:
+                servidor.terminate()
+                servidor.wait()
+
+    print(f"Requisições: {len(latencias):,} em {tempo:.1f}s "
+          f"({args.conexoes} conexões)")
+    print(f"Vazão:       {len(latencias) / tempo:,.0f} req/s")
+    print(f"Latência:    p50 {percentil(latencias, 50) * 1000:.1f} ms | "
+          f"p99 {percentil(latencias, 99) * 1000:.1f} ms | "
+          f"máx {max(latencias) * 1000:.1f} ms")
+    print(f"Erros:       {len(erros)}")
+
+
+if __name__ == "__main__":
+    main()
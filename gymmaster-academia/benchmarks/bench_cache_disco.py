@@ -0,0 +1,79 @@
+"""Mede o cache em disco compartilhado: estouro de recálculo entre workers e leitura
+
+Vários processos pedem as estatísticas do dashboard ao mesmo tempo, com o
+cache vazio; conta quantos recalcularam e compara a leitura do cache com o
+cálculo direto.
+
+Uso: python benchmarks/bench_cache_disco.py [--atletas 100000] [--meses 36] [--workers 8]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_disco import CacheDisco  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+from bench_coortes import popular  # noqa: E402
+
+
+def worker(arquivo_db, arquivo_cache, largada, fila):
+    db = DatabaseManager(db_name=arquivo_db, cache_disco=CacheDisco(arquivo_cache))
+    largada.wait()
+    inicio = time.perf_counter()
+    db.get_estatisticas_avancadas()
+    fila.put((db.cache_disco.falhas, time.perf_counter() - inicio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--atletas", type=int, default=100_000)
+    parser.add_argument("--meses", type=int, default=36)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo_db = os.path.join(pasta, "bench.db")
+        arquivo_cache = os.path.join(pasta, "cache.db")
+        db = DatabaseManager(db_name=arquivo_db)
+        total_pagamentos = popular(db, args.atletas, args.meses)
+
+        inicio = time.perf_counter()
+        db._calcular_estatisticas()
+        direto = time.perf_counter() - inicio
+
+        contexto = multiprocessing.get_context('spawn')
+        largada, fila = contexto.Event(), contexto.Queue()
+        processos = [contexto.Process(target=worker, args=(arquivo_db, arquivo_cache, largada, fila))
+                     for _ in range(args.workers)]
+        for processo in processos:
+            processo.start()
+        time.sleep(3)  # tempo para os workers abrirem o banco
+        largada.set()
+        resultados = [fila.get() for _ in processos]
+        for processo in processos:
+            processo.join()
+
+        # Leitura a partir do disco num processo sem cache em memória
+        cache = CacheDisco(arquivo_cache)
+        leitor = DatabaseManager(db_name=arquivo_db, cache_disco=cache)
+        inicio = time.perf_counter()
+        leitor.get_estatisticas_avancadas()
+        leitura = time.perf_counter() - inicio
+        estatisticas = cache.estatisticas()
+        db.fechar()
+        leitor.fechar()
+
+    print(f"Atletas: {args.atletas:,} | pagamentos: {total_pagamentos:,} | workers: {args.workers}")
+    print(f"Cálculo direto:           {direto * 1000:8.1f} ms")
+    print(f"Recálculos com estouro:   {sum(falhas for falhas, _ in resultados):8d}")
+    print(f"Maior espera de worker:   {max(tempo for _, tempo in resultados) * 1000:8.1f} ms")
+    print(f"Leitura do cache em disco:{leitura * 1000:8.1f} ms "
+          f"({estatisticas['entradas']} entradas, {estatisticas['bytes']:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Mede a análise de coortes: primeiro cálculo (vetorizado) x leitura do cache mensal
+
+Uso: python benchmarks/bench_coortes.py [--atletas 100000] [--meses 36]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from coortes import obter_coortes  # noqa: E402
+
+PLANOS = ["Mensal", "Mensal", "Mensal", "Trimestral", "Semestral", "Anual"]
+
+
+def popular(db, total, meses):
+    """Atletas cadastrados ao longo de `meses` meses, cada um renovando até desistir"""
+    hoje = date.today()
+    primeiro = hoje.year * 12 + hoje.month - 1 - meses
+    atletas, pagamentos = [], []
+    for atleta_id in range(1, total + 1):
+        cadastro = primeiro + random.randint(0, meses - 1)
+        plano = random.choice(PLANOS)
+        atletas.append((atleta_id, f"Atleta {atleta_id}",
+                        f"{cadastro // 12:04d}-{cadastro % 12 + 1:02d}-01", plano))
+        mes = cadastro
+        while mes < primeiro + meses and random.random() < 0.85:
+            rotulo = f"{mes // 12:04d}-{mes % 12 + 1:02d}"
+            pagamentos.append((atleta_id, f"{rotulo}-05", 1000000, rotulo))
+            mes += {"Mensal": 1, "Trimestral": 3, "Semestral": 6, "Anual": 12}[plano]
+
+    conn = db.get_connection()
+    conn.executemany('''
+        INSERT INTO atletas (id, nome, data_cadastro, plano) VALUES (?, ?, ?, ?)
+    ''', atletas)
+    conn.executemany('''
+        INSERT INTO pagamentos (atleta_id, data_pagamento, valor_centavos, mes_referencia)
+        VALUES (?, ?, ?, ?)
+    ''', pagamentos)
+    conn.commit()
+    conn.close()
+    return len(pagamentos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--atletas", type=int, default=100_000)
+    parser.add_argument("--meses", type=int, default=36)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db = DatabaseManager(db_name=os.path.join(pasta, "bench.db"))
+        total_pagamentos = popular(db, args.atletas, args.meses)
+
+        inicio = time.perf_counter()
+        resultado = obter_coortes(db)
+        primeiro = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        obter_coortes(db)
+        cache = time.perf_counter() - inicio
+        db.fechar()
+
+    print(f"Atletas: {args.atletas:,} | pagamentos: {total_pagamentos:,} | "
+          f"coortes: {len(resultado['retencao'])}")
+    print(f"Primeiro cálculo: {primeiro * 1000:8.0f} ms")
+    print(f"Cache mensal:     {cache * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Compara escritas direto pelo pool x pelo escritor único, sob disputa
+
+`--escritores` threads registram pagamentos ao mesmo tempo enquanto
+`--leitores` threads leem o relatório do mês; informa vazão de escrita,
+latência (p50/p99) de registrar_pagamento, erros, comandos por transação e
+quantas leituras terminaram no período.
+
+Uso: python benchmarks/bench_escritor.py [--escritores 16] [--leitores 2] [--duracao 10]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+
+
+def popular(db, atletas):
+    conn = db.get_connection()
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO atletas (id, nome, data_vencimento, plano, valor_plano_centavos)
+        SELECT i, 'Atleta ' || i, date('now', '+' || (i % 60) || ' days'), 'Mensal', 1000000
+        FROM n
+    ''', (atletas,))
+    conn.commit()
+    conn.close()
+
+
+def executar(db, escritores, leitores, duracao, atletas):
+    """Roda o cenário e retorna (pagamentos, latências em s, erros, leituras, tempo)"""
+    hoje = date.today()
+    fim = time.perf_counter() + duracao
+    latencias, erros, leituras = [], [], [0]
+    trava = threading.Lock()
+
+    def escrever(n):
+        proprias, atleta_id = [], n
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            try:
+                db.registrar_pagamento(atleta_id % atletas + 1, hoje.isoformat(), 10000,
+                                       hoje.strftime('%Y-%m'), 'Dinheiro', '')
+                proprias.append(time.perf_counter() - inicio)
+            except Exception as e:
+                with trava:
+                    erros.append(e)
+            atleta_id += escritores
+        with trava:
+            latencias.extend(proprias)
+
+    def ler():
+        while time.perf_counter() < fim:
+            db.get_relatorio_pagamentos(hoje.replace(day=1).isoformat(), hoje.isoformat())
+            with trava:
+                leituras[0] += 1
+
+    threads = [threading.Thread(target=escrever, args=(n,)) for n in range(escritores)]
+    threads += [threading.Thread(target=ler) for _ in range(leitores)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencias, erros, leituras[0], time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--escritores", type=int, default=16)
+    parser.add_argument("--leitores", type=int, default=2)
+    parser.add_argument("--duracao", type=float, default=10)
+    parser.add_argument("--atletas", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{args.escritores} threads escrevendo, {args.leitores} lendo, {args.duracao:.0f}s")
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, escritor_unico in (('Direto', False), ('Escritor único', True)):
+            arquivo = os.path.join(pasta, f"{nome}.db")
+            db = DatabaseManager(db_name=arquivo, tamanho_pool=args.escritores + args.leitores,
+                                 escritor_unico=escritor_unico)
+            popular(db, args.atletas)
+            latencias, erros, leituras, tempo = executar(
+                db, args.escritores, args.leitores, args.duracao, args.atletas)
+            db.fechar()
+
+            p50 = statistics.median(latencias) * 1000
+            p99 = statistics.quantiles(latencias, n=100)[98] * 1000
+            linha = (f"{nome:15s} {len(latencias) / tempo:8,.0f} pagamentos/s | "
+                     f"p50 {p50:7.1f} ms | p99 {p99:7.1f} ms | erros {len(erros)} | "
+                     f"leituras {leituras}")
+            if escritor_unico:
+                linha += f" | {db.escritor.comandos / max(db.escritor.transacoes, 1):.1f} comandos/transação"
+            print(linha)
+            if erros:
+                print(f"{'':15s} primeiro erro: {erros[0]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Mede a gravação de check-ins: lote pela fila em memória x um commit por entrada
+
+Gera check-ins a uma taxa fixa (padrão 1000/s) e informa a vazão sustentada,
+quanto a fila acumulou e o atraso entre registrar e estar gravado.
+
+Uso: python benchmarks/bench_frequencia.py [--taxa 1000] [--duracao 10]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from frequencia import RegistradorFrequencia  # noqa: E402
+
+
+def gerar(registrar, taxa, duracao):
+    """Chama registrar() `taxa` vezes por segundo durante `duracao` segundos"""
+    total = int(taxa * duracao)
+    inicio = time.perf_counter()
+    maior_fila = 0
+    for i in range(total):
+        alvo = inicio + i / taxa
+        espera = alvo - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        maior_fila = max(maior_fila, registrar(random.randint(1, 5000)) or 0)
+    return total, time.perf_counter() - inicio, maior_fila
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--taxa", type=int, default=1000, help="check-ins por segundo")
+    parser.add_argument("--duracao", type=float, default=10)
+    parser.add_argument("--intervalo-ms", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        # Um commit por check-in (como seria gravando direto a cada entrada)
+        arquivo = os.path.join(pasta, "direto.db")
+        DatabaseManager(db_name=arquivo).fechar()
+        conn = sqlite3.connect(arquivo)
+
+        def direto(atleta_id):
+            conn.execute("INSERT INTO frequencia (atleta_id, data_hora) VALUES (?, ?)",
+                         (atleta_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            conn.commit()
+
+        total, tempo, _ = gerar(direto, args.taxa, args.duracao)
+        conn.close()
+        print(f"Direto: {total:,} check-ins em {tempo:.2f}s = {total / tempo:,.0f}/s")
+
+        # Fila em memória gravada em lote
+        arquivo = os.path.join(pasta, "lote.db")
+        DatabaseManager(db_name=arquivo).fechar()
+        registrador = RegistradorFrequencia(arquivo, intervalo_ms=args.intervalo_ms)
+
+        def em_lote(atleta_id):
+            registrador.registrar(atleta_id)
+            return registrador.pendentes()
+
+        total, tempo, maior_fila = gerar(em_lote, args.taxa, args.duracao)
+        inicio = time.perf_counter()
+        registrador.descarregar()
+        atraso_final = time.perf_counter() - inicio
+        registrador.parar()
+
+        conn = sqlite3.connect(arquivo)
+        gravados = conn.execute("SELECT COUNT(*) FROM frequencia").fetchone()[0]
+        resumo = conn.execute("SELECT SUM(total) FROM frequencia_por_hora").fetchone()[0]
+        conn.close()
+
+        print(f"Lote:   {total:,} check-ins em {tempo:.2f}s = {total / tempo:,.0f}/s | "
+              f"fila máx {maior_fila} | esvaziou {atraso_final * 1000:.0f} ms após o fim")
+        print(f"        gravados {gravados:,} | resumo por hora {resumo:,} | "
+              f"descartados {registrador.descartados}")
+
+
+if __name__ == "__main__":
+    main()
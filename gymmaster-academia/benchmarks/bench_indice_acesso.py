@@ -0,0 +1,59 @@
+"""Compara a verificação de acesso pelo índice em memória com a consulta ao SQLite
+
+Uso: python benchmarks/bench_indice_acesso.py [--atletas 100000] [--consultas 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from bench_api_acesso import popular  # noqa: E402
+
+
+def medir(funcao, ids):
+    latencias = []
+    for atleta_id in ids:
+        inicio = time.perf_counter()
+        funcao(atleta_id)
+        latencias.append(time.perf_counter() - inicio)
+    latencias.sort()
+    return latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--atletas", type=int, default=100_000)
+    parser.add_argument("--consultas", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, "bench.db")
+        popular(arquivo, args.atletas)
+        db = DatabaseManager(db_name=arquivo)
+
+        inicio = time.perf_counter()
+        indice = db.get_indice_acesso()
+        carga = time.perf_counter() - inicio
+
+        ids = [random.randint(1, args.atletas) for _ in range(args.consultas)]
+        resultados = {
+            'SQLite': medir(db.verificar_acesso, ids),
+            'Índice': medir(indice.verificar, ids),
+        }
+        db.fechar()
+
+    print(f"Atletas: {args.atletas:,} | carga do índice: {carga * 1000:.0f} ms")
+    for nome, latencias in resultados.items():
+        p50 = latencias[len(latencias) // 2]
+        p99 = latencias[int(len(latencias) * 0.99)]
+        print(f"{nome:>7}: p50 {p50 * 1e6:7.1f} µs | p99 {p99 * 1e6:7.1f} µs | "
+              f"{len(latencias) / sum(latencias):,.0f} consultas/s")
+
+
+if __name__ == "__main__":
+    main()
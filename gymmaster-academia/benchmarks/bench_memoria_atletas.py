@@ -0,0 +1,75 @@
+"""Compara o consumo de memória da tabela de atletas compacta com a leitura bruta
+
+Uso: python benchmarks/bench_memoria_atletas.py [--atletas 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager, memoria_dataframe  # noqa: E402
+
+PLANOS = ["Mensal", "Trimestral", "Semestral", "Anual"]
+
+
+def popular(db, total):
+    """Insere atletas sintéticos em lote"""
+    hoje = date.today()
+    linhas = []
+    for i in range(total):
+        cadastro = hoje - timedelta(days=random.randint(0, 1500))
+        vencimento = hoje + timedelta(days=random.randint(-120, 365))
+        linhas.append((
+            f"Atleta {i}", f"9{random.randint(10000000, 99999999)}", f"atleta{i}@exemplo.ao",
+            cadastro.isoformat(), vencimento.isoformat(), None,
+            random.choice(PLANOS), 10000.0, "Observação de teste " * 3
+        ))
+
+    conn = db.get_connection()
+    conn.executemany('''
+        INSERT INTO atletas (nome, telefone, email, data_cadastro, data_vencimento,
+                             data_nascimento, plano, valor_plano, observacoes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', linhas)
+    conn.commit()
+    conn.close()
+    db.update_atleta_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--atletas", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db = DatabaseManager(db_name=os.path.join(pasta, "bench.db"))
+        popular(db, args.atletas)
+
+        inicio = time.perf_counter()
+        conn = db.get_connection()
+        df_bruto = pd.read_sql("SELECT * FROM atletas ORDER BY nome", conn)
+        conn.close()
+        tempo_bruto = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        df_compacto = db.get_all_atletas()
+        tempo_compacto = time.perf_counter() - inicio
+
+        bruto = memoria_dataframe(df_bruto)
+        compacto = memoria_dataframe(df_compacto)
+
+        print(f"Atletas:   {args.atletas:,}")
+        print(f"Bruto:     {bruto / 1024 ** 2:8.1f} MB  ({tempo_bruto:.2f}s)")
+        print(f"Compacto:  {compacto / 1024 ** 2:8.1f} MB  ({tempo_compacto:.2f}s)")
+        print(f"Redução:   {bruto / compacto:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
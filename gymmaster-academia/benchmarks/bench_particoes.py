@@ -0,0 +1,113 @@
+"""Compara pagamentos numa tabela única x particionados por ano
+
+Popula um banco com pagamentos distribuídos por `--anos` anos, copia o
+arquivo e migra a cópia para partições anuais; mede a migração e, nos dois
+layouts, as consultas do dashboard, o relatório detalhado (um mês recente e
+um mês antigo) e registrar_pagamento.
+
+Uso: python benchmarks/bench_particoes.py [--pagamentos 1000000] [--anos 5] [--atletas 50000]
+     (o cenário de referência é --pagamentos 10000000; leva alguns minutos)
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+
+
+def popular(db, pagamentos, anos, atletas):
+    """Atletas e pagamentos gerados no próprio SQLite (datas uniformes nos últimos `anos` anos)"""
+    hoje = date.today()
+    inicio = date(hoje.year - anos + 1, 1, 1)
+    dias = (hoje - inicio).days + 1
+    conn = db.get_connection()
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO atletas (id, nome, data_cadastro, data_vencimento, plano, valor_plano_centavos)
+        SELECT i, 'Atleta ' || i, ?, date(?, '+' || (i % 60) || ' days'), 'Mensal', 1000000
+        FROM n
+    ''', (atletas, inicio.isoformat(), hoje.isoformat()))
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO pagamentos (atleta_id, data_pagamento, valor_centavos, mes_referencia, forma_pagamento)
+        SELECT i % ? + 1, d, 1000000 + (i % 7) * 10000, substr(d, 1, 7),
+               CASE i % 4 WHEN 0 THEN 'Dinheiro' WHEN 1 THEN 'Transferência'
+                          WHEN 2 THEN 'Cartão' ELSE 'Multicaixa' END
+        FROM (SELECT i, date(?, '+' || (i * 7919 % ?) || ' days') AS d FROM n)
+    ''', (pagamentos, atletas, inicio.isoformat(), dias))
+    conn.commit()
+    conn.close()
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def cenarios(db, anos):
+    hoje = date.today()
+    mes_atual = hoje.replace(day=1).isoformat()
+    antigo = date(hoje.year - anos + 1, 3, 1)
+    fim_antigo = date(antigo.year, 3, 31)
+    return {
+        'Estatísticas do dashboard': (db._calcular_estatisticas, 5),
+        'Relatório do mês atual': (lambda: db.get_relatorio_pagamentos(mes_atual, hoje.isoformat()), 5),
+        f'Relatório de {antigo:%Y-%m}': (
+            lambda: db.get_relatorio_pagamentos(antigo.isoformat(), fim_antigo.isoformat()), 5),
+        'registrar_pagamento (x200)': (lambda: [
+            db.registrar_pagamento(i + 1, hoje.isoformat(), 100, hoje.strftime('%Y-%m'), 'Dinheiro', '')
+            for i in range(200)], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pagamentos", type=int, default=1_000_000)
+    parser.add_argument("--anos", type=int, default=5)
+    parser.add_argument("--atletas", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo_unica = os.path.join(pasta, "unica.db")
+        arquivo_particionado = os.path.join(pasta, "particionado.db")
+
+        db = DatabaseManager(db_name=arquivo_unica)
+        inicio = time.perf_counter()
+        popular(db, args.pagamentos, args.anos, args.atletas)
+        carga = time.perf_counter() - inicio
+        db.fechar()
+
+        shutil.copy(arquivo_unica, arquivo_particionado)
+        particionado = DatabaseManager(db_name=arquivo_particionado)
+        inicio = time.perf_counter()
+        anos = particionado.particoes.particionar()
+        migracao = time.perf_counter() - inicio
+
+        unica = DatabaseManager(db_name=arquivo_unica)
+        resultados = {}
+        for layout, banco in (('única', unica), ('particionada', particionado)):
+            for nome, (funcao, repeticoes) in cenarios(banco, args.anos).items():
+                resultados.setdefault(nome, {})[layout] = medir(funcao, repeticoes)
+        unica.fechar()
+        particionado.fechar()
+
+    print(f"Pagamentos: {args.pagamentos:,} | anos: {args.anos} | atletas: {args.atletas:,}")
+    print(f"Carga: {carga:.1f}s | migração para {len(anos)} partições: {migracao:.1f}s")
+    print(f"{'':32s}{'tabela única':>14s}{'particionada':>14s}")
+    for nome, tempos in resultados.items():
+        print(f"{nome:32s}{tempos['única'] * 1000:11.1f} ms{tempos['particionada'] * 1000:11.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
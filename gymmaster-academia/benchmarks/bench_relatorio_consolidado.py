@@ -0,0 +1,91 @@
+"""Compara ATTACH + UNION ALL com o pool de processos no relatório consolidado
+
+Uso: python benchmarks/bench_relatorio_consolidado.py [--pagamentos 20000] [--filiais 2 10 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from relatorios import MotorRelatorios  # noqa: E402
+
+FORMAS = ["Dinheiro", "Transferência", "Cartão", "Multicaixa"]
+
+
+def criar_filial(arquivo, pagamentos):
+    """Cria o banco de uma filial com pagamentos sintéticos do último ano"""
+    db = DatabaseManager(db_name=arquivo)
+    hoje = date.today()
+    linhas = []
+    for _ in range(pagamentos):
+        dia = hoje - timedelta(days=random.randint(0, 365))
+        valor_centavos = random.choice([500000, 1000000, 2500000])
+        linhas.append((random.randint(1, 500), dia.isoformat(), valor_centavos / 100,
+                       valor_centavos, dia.strftime('%Y-%m'), random.choice(FORMAS)))
+
+    conn = db.get_connection()
+    conn.executemany('''
+        INSERT INTO pagamentos (atleta_id, data_pagamento, valor, valor_centavos,
+                                mes_referencia, forma_pagamento)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', linhas)
+    conn.commit()
+    conn.close()
+    db.fechar()
+
+
+def medir(motor, filiais, modo, inicio, fim, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        motor.receita_consolidada(inicio, fim, modo=modo, filiais=filiais)
+        tempos.append(time.perf_counter() - t0)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pagamentos", type=int, default=20_000,
+                        help="pagamentos por filial")
+    parser.add_argument("--filiais", type=int, nargs="+", default=[2, 10, 50])
+    args = parser.parse_args()
+
+    hoje = date.today()
+    inicio, fim = hoje - timedelta(days=365), hoje
+
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivos = []
+        for i in range(max(args.filiais)):
+            arquivo = os.path.join(pasta, f"filial_{i}.db")
+            criar_filial(arquivo, args.pagamentos)
+            arquivos.append(arquivo)
+
+        motor = MotorRelatorios(roteador=None)
+        # Aquece o pool de processos para não medir a criação dos workers
+        motor.receita_consolidada(inicio, fim, modo='processos', filiais=pd.DataFrame(
+            {'id': [0], 'nome': ['aquecimento'], 'arquivo_db': [arquivos[0]]}))
+
+        print(f"{'filiais':>8} {'attach (s)':>12} {'processos (s)':>14} {'auto':>10}")
+        for total in args.filiais:
+            filiais = pd.DataFrame({
+                'id': range(1, total + 1),
+                'nome': [f"Filial {i}" for i in range(1, total + 1)],
+                'arquivo_db': arquivos[:total]
+            })
+            attach = medir(motor, filiais, 'attach', inicio, fim)
+            processos = medir(motor, filiais, 'processos', inicio, fim)
+            print(f"{total:>8} {attach:>12.3f} {processos:>14.3f} {motor.escolher_modo(total):>10}")
+
+        motor.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import io
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+
+# Cache de resultados em disco, compartilhado pelos processos do servidor
+
+ARQUIVO_CACHE = 'cache_resultados.db'
+
+
+def _dataframe_para_arrow(df):
+    """Serializa o DataFrame no formato de stream do Arrow (colunar, sem cópia na leitura)"""
+    tabela = pa.Table.from_pandas(df)
+    saida = pa.BufferOutputStream()
+    with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return saida.getvalue().to_pybytes()
+
+
+def _dataframe_de_arrow(dados, strings=None):
+    df = pa.ipc.open_stream(dados).read_all().to_pandas()
+    # O Arrow não guarda o armazenamento das colunas string (python ou pyarrow)
+    if strings:
+        df = df.astype({coluna: pd.StringDtype(armazenamento)
+                        for coluna, armazenamento in strings.items()})
+    return df
+
+
+class _Serializador(pickle.Pickler):
+    # DataFrames (inclusive dentro de dicionários e tuplas) vão em Arrow
+    def reducer_override(self, obj):
+        if isinstance(obj, pd.DataFrame):
+            strings = {coluna: tipo.storage for coluna, tipo in obj.dtypes.items()
+                       if isinstance(tipo, pd.StringDtype)}
+            return _dataframe_de_arrow, (_dataframe_para_arrow(obj), strings)
+        return NotImplemented
+
+
+def serializar(valor):
+    buffer = io.BytesIO()
+    _Serializador(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(valor)
+    return buffer.getvalue()
+
+
+def desserializar(dados):
+    return pickle.loads(dados)
+
+
+class CacheDisco:
+    """Cache de resultados num arquivo SQLite compartilhado por todos os workers
+
+    - LRU limitado em bytes: ao passar de `limite_bytes`, as entradas usadas
+      há mais tempo são removidas.
+    - TTL por entrada; uma entrada vencida continua no arquivo até ser
+      recalculada ou expulsa.
+    - Proteção contra estouro (stampede): só quem obtém a trava da chave
+      recalcula; os demais devolvem o valor vencido, se houver, ou esperam
+      o resultado.
+
+    O arquivo é escrito só por processos da própria aplicação (o conteúdo é
+    desserializado com pickle).
+    """
+
+    # Acessos mais próximos que isso não regravam ultimo_acesso (evita uma escrita por leitura)
+    RESOLUCAO_LRU = 30
+
+    def __init__(self, arquivo=ARQUIVO_CACHE, limite_bytes=256 * 1024 * 1024, ttl=3600,
+                 duracao_trava=60, espera=0.05):
+        self.arquivo = arquivo
+        self.limite_bytes = limite_bytes
+        self.ttl = ttl
+        self.duracao_trava = duracao_trava
+        self.espera = espera
+        self.acertos = 0
+        self.falhas = 0
+        self.vencidos_servidos = 0
+        self._local = threading.local()
+        self._criar_tabelas()
+
+    def _conexao(self):
+        """Uma conexão por thread (as transações de trava não podem se misturar)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.arquivo, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _criar_tabelas(self):
+        conn = self._conexao()
+        # WAL: leitores de um worker não bloqueiam a gravação de outro
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entradas (
+                chave TEXT PRIMARY KEY,
+                valor BLOB NOT NULL,
+                tamanho INTEGER NOT NULL,
+                expira_em REAL NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_entradas_ultimo_acesso
+            ON entradas (ultimo_acesso)
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS travas (
+                chave TEXT PRIMARY KEY,
+                dono TEXT NOT NULL,
+                expira_em REAL NOT NULL
+            )
+        ''')
+
+    def _ler(self, chave):
+        """Retorna (valor, vencido) ou None"""
+        conn = self._conexao()
+        linha = conn.execute(
+            "SELECT valor, expira_em, ultimo_acesso FROM entradas WHERE chave = ?",
+            (chave,)).fetchone()
+        if linha is None:
+            return None
+
+        valor, expira_em, ultimo_acesso = linha
+        agora = time.time()
+        if agora - ultimo_acesso > self.RESOLUCAO_LRU:
+            conn.execute("UPDATE entradas SET ultimo_acesso = ? WHERE chave = ?",
+                         (agora, chave))
+        return desserializar(valor), expira_em <= agora
+
+    def _travar(self, chave):
+        """Tenta obter a trava de recálculo da chave; retorna o dono ou None"""
+        conn = self._conexao()
+        dono = uuid.uuid4().hex
+        agora = time.time()
+        cursor = conn.execute('''
+            INSERT INTO travas (chave, dono, expira_em) VALUES (?, ?, ?)
+            ON CONFLICT(chave) DO UPDATE SET dono = excluded.dono, expira_em = excluded.expira_em
+            WHERE travas.expira_em <= ?
+        ''', (chave, dono, agora + self.duracao_trava, agora))
+        return dono if cursor.rowcount else None
+
+    def _destravar(self, chave, dono):
+        self._conexao().execute(
+            "DELETE FROM travas WHERE chave = ? AND dono = ?", (chave, dono))
+
+    def gravar(self, chave, valor, ttl=None):
+        """Grava o valor e expulsa as entradas menos usadas se o limite for ultrapassado"""
+        dados = serializar(valor)
+        agora = time.time()
+        conn = self._conexao()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO entradas (chave, valor, tamanho, expira_em, ultimo_acesso)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (chave, dados, len(dados), agora + (ttl or self.ttl), agora))
+
+            excesso = conn.execute(
+                "SELECT COALESCE(SUM(tamanho), 0) FROM entradas").fetchone()[0] - self.limite_bytes
+            if excesso > 0:
+                # Remove as menos usadas até cobrir o excesso (nunca a recém-gravada)
+                conn.execute('''
+                    DELETE FROM entradas WHERE chave IN (
+                        SELECT chave FROM (
+                            SELECT chave, SUM(tamanho) OVER (
+                                ORDER BY ultimo_acesso, chave) - tamanho AS acumulado
+                            FROM entradas
+                            WHERE chave <> ?
+                        )
+                        WHERE acumulado < ?
+                    )
+                ''', (chave, excesso))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def obter(self, chave, calcular, ttl=None, espera_maxima=30):
+        """Retorna o valor em cache ou o calcula (uma única vez entre todos os workers)"""
+        limite = time.monotonic() + espera_maxima
+        while True:
+            encontrado = self._ler(chave)
+            if encontrado is not None and not encontrado[1]:
+                self.acertos += 1
+                return encontrado[0]
+
+            dono = self._travar(chave)
+            if dono is not None:
+                self.falhas += 1
+                try:
+                    valor = calcular()
+                    self.gravar(chave, valor, ttl)
+                    return valor
+                finally:
+                    self._destravar(chave, dono)
+
+            # Outro worker está recalculando
+            if encontrado is not None:
+                self.vencidos_servidos += 1
+                return encontrado[0]
+            if time.monotonic() > limite:
+                self.falhas += 1
+                return calcular()
+            time.sleep(self.espera)
+
+    def limpar(self):
+        """Remove todas as entradas e travas"""
+        conn = self._conexao()
+        conn.execute("DELETE FROM entradas")
+        conn.execute("DELETE FROM travas")
+
+    def estatisticas(self):
+        """Entradas, bytes ocupados e contadores deste processo"""
+        entradas, tamanho = self._conexao().execute(
+            "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM entradas").fetchone()
+        return {'entradas': entradas, 'bytes': tamanho, 'acertos': self.acertos,
+                'falhas': self.falhas, 'vencidos_servidos': self.vencidos_servidos,
+                'arquivo': os.path.abspath(self.arquivo)}
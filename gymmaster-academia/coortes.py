@@ -0,0 +1,155 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from database import MESES_PLANO
+
+# Análise de coortes de retenção e churn
+#
+# Cada atleta pertence à coorte do mês de cadastro. Um pagamento cobre o mês
+# de referência e os seguintes, conforme o plano (Trimestral = 3 meses etc.);
+# o atleta está "ativo" num mês coberto por algum pagamento. Só entram meses
+# fechados (anteriores a mes_limite), para que o mês corrente, ainda parcial,
+# não puxe a retenção para baixo.
+
+
+def _indice_mes(mes):
+    """Converte 'AAAA-MM' em meses absolutos (ano * 12 + mês - 1)"""
+    ano, numero = mes.split('-')
+    return int(ano) * 12 + int(numero) - 1
+
+
+def _rotulo_mes(indices):
+    return [f"{indice // 12:04d}-{indice % 12 + 1:02d}" for indice in indices]
+
+
+def calcular_coortes(atletas, pagamentos, mes_limite):
+    """Calcula retenção, sobrevivência e churn mensal com operações vetorizadas
+
+    `atletas` tem id, mes_cadastro e plano; `pagamentos` tem atleta_id e mes,
+    com os meses em inteiros (ver DatabaseManager.get_historico_coortes). Retorna um dicionário de
+    DataFrames: tamanhos, retencao e sobrevivencia (coorte x mês N), curva
+    (médias ponderadas por N) e churn (por mês).
+    """
+    limite = _indice_mes(mes_limite)
+
+    coorte = atletas['mes_cadastro'].to_numpy(dtype=float)
+    validos = ~np.isnan(coorte)
+    ids = atletas['id'].to_numpy()[validos]
+    coorte = coorte[validos].astype(np.int64)
+    meses_plano = atletas['plano'].map(MESES_PLANO).fillna(1).to_numpy()[validos].astype(np.int64)
+
+    # Pagamentos -> posição do atleta; descarta os de atletas fora da análise
+    posicao = pd.Index(ids).get_indexer(pagamentos['atleta_id'].to_numpy())
+    referencia = pagamentos['mes'].to_numpy(dtype=float)
+    manter = (posicao >= 0) & ~np.isnan(referencia)
+    posicao, referencia = posicao[manter], referencia[manter].astype(np.int64)
+
+    # Expande cada pagamento nos meses que ele cobre
+    duracao = meses_plano[posicao]
+    inicio_grupo = np.repeat(np.cumsum(duracao) - duracao, duracao)
+    posicao = np.repeat(posicao, duracao)
+    mes_ativo = np.repeat(referencia, duracao) + np.arange(len(posicao)) - inicio_grupo
+
+    # Pares únicos (atleta, mês ativo) entre o cadastro e o último mês fechado
+    dentro = (mes_ativo >= coorte[posicao]) & (mes_ativo < limite)
+    posicao, mes_ativo = posicao[dentro], mes_ativo[dentro]
+    chave = np.unique(posicao * (limite + 1) + mes_ativo)
+    posicao, mes_ativo = chave // (limite + 1), chave % (limite + 1)
+    deslocamento = mes_ativo - coorte[posicao]
+
+    coortes_unicas, tamanhos = np.unique(coorte, return_counts=True)
+    maximo_n = int(limite - coortes_unicas.min()) if len(coortes_unicas) else 0
+    colunas = np.arange(maximo_n)
+    rotulos = _rotulo_mes(coortes_unicas)
+    serie_tamanhos = pd.Series(tamanhos, index=rotulos, name='atletas')
+
+    # Meses ainda não observados para cada coorte (coorte + N >= limite) ficam NaN
+    observado = (coortes_unicas[:, None] + colunas[None, :]) < limite
+    linha_coorte = np.searchsorted(coortes_unicas, coorte)
+
+    # Retenção no mês N: atletas ativos N meses após o cadastro
+    ativos = np.zeros((len(coortes_unicas), maximo_n))
+    np.add.at(ativos, (linha_coorte[posicao], deslocamento), 1)
+
+    # Sobrevivência: último mês ativo >= N (quem nunca pagou tem duração -1)
+    ultimo = np.full(len(coorte), -1)
+    np.maximum.at(ultimo, posicao, deslocamento)
+    vivos = np.zeros((len(coortes_unicas), maximo_n + 1))
+    np.add.at(vivos, (linha_coorte, ultimo + 1), 1)
+    vivos = np.cumsum(vivos[:, ::-1], axis=1)[:, ::-1][:, 1:]
+
+    def por_coorte(contagem):
+        taxa = np.where(observado, contagem / tamanhos[:, None], np.nan)
+        return pd.DataFrame(taxa, index=rotulos, columns=colunas)
+
+    tamanhos_observados = (observado * tamanhos[:, None]).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        curva = pd.DataFrame({
+            'mes_n': colunas,
+            'retencao': (ativos * observado).sum(axis=0) / tamanhos_observados,
+            'sobrevivencia': (vivos * observado).sum(axis=0) / tamanhos_observados,
+            'atletas_observados': tamanhos_observados
+        })
+
+    # Churn mensal: ativos no mês anterior que não estão ativos no mês
+    churn = pd.DataFrame(columns=['mes', 'ativos_inicio', 'perdidos', 'churn'])
+    if len(mes_ativo):
+        primeiro = int(mes_ativo.min())
+        meses = np.arange(primeiro + 1, limite)
+        ativos_mes = np.bincount(mes_ativo - primeiro, minlength=limite - primeiro)
+        saiu = ~np.isin(chave + 1, chave) & (mes_ativo + 1 < limite)
+        perdidos = np.bincount(mes_ativo[saiu] + 1 - primeiro,
+                               minlength=limite - primeiro)[meses - primeiro]
+        base = ativos_mes[meses - 1 - primeiro]
+        churn = pd.DataFrame({
+            'mes': _rotulo_mes(meses),
+            'ativos_inicio': base,
+            'perdidos': perdidos,
+            'churn': np.where(base > 0, perdidos / np.maximum(base, 1), np.nan)
+        })
+
+    return {
+        'tamanhos': serie_tamanhos.to_frame(),
+        'retencao': por_coorte(ativos),
+        'sobrevivencia': por_coorte(vivos),
+        'curva': curva,
+        'churn': churn
+    }
+
+
+def _serializar(resultado):
+    return json.dumps({nome: df.to_dict(orient='split')
+                       for nome, df in resultado.items()})
+
+
+def _desserializar(texto):
+    return {nome: pd.DataFrame(**partes) for nome, partes in json.loads(texto).items()}
+
+
+def obter_coortes(db, mes_limite=None):
+    """Retorna a análise de coortes até o mês anterior a mes_limite (padrão: mês atual)
+
+    O resultado fica em cache no banco, um por mês; os triggers de
+    cache_coortes o descartam quando uma escrita altera meses já fechados.
+    Em memória, o cache do DatabaseManager evita reler o JSON a cada chamada.
+    """
+    mes_limite = mes_limite or datetime.now().strftime('%Y-%m')
+    return db.cache.obter(('coortes', mes_limite), ['cache_coortes'],
+                          lambda: _obter_do_banco(db, mes_limite))
+
+
+def _obter_do_banco(db, mes_limite):
+    em_cache = db.get_cache_coortes(mes_limite)
+    if em_cache is not None:
+        return _desserializar(em_cache)
+
+    versao = db.cache.versoes().get('cache_coortes', 0)
+    atletas, pagamentos = db.get_historico_coortes(mes_limite)
+    resultado = calcular_coortes(atletas, pagamentos, mes_limite)
+
+    # Só grava se nenhuma escrita invalidou o cache durante o cálculo
+    db.set_cache_coortes(mes_limite, _serializar(resultado), versao)
+    return resultado
@@ -0,0 +1,2426 @@
+import sqlite3
+import os
+import queue
+import threading
+import pandas as pd
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+import hashlib
+import json
+
+from arquivo import ArquivoPagamentos
+from escritor import EscritorUnico
+from particoes import ParticoesPagamentos
+
+# Representação compacta da tabela de atletas
+
+# Colunas da listagem; observacoes é lida sob demanda por get_observacoes
+COLUNAS_ATLETAS = ('id', 'nome', 'telefone', 'email', 'data_cadastro',
+                   'data_vencimento', 'data_nascimento', 'status', 'plano',
+                   'valor_plano_centavos / 100.0 AS valor_plano')
+
+
+def compactar_atletas(df):
+    """Converte a tabela de atletas para tipos compactos (int32, category, datetime64)"""
+    df['id'] = df['id'].astype('int32')
+    for coluna in ('nome', 'telefone', 'email'):
+        df[coluna] = df[coluna].astype('string[pyarrow]')
+    for coluna in ('status', 'plano'):
+        df[coluna] = df[coluna].astype('category')
+    for coluna in ('data_cadastro', 'data_vencimento', 'data_nascimento'):
+        df[coluna] = pd.to_datetime(
+            df[coluna], format='%Y-%m-%d', errors='coerce')
+    return df
+
+
+def para_centavos(valor):
+    """Converte um valor em KZ para unidades inteiras (cêntimos)"""
+    return int((Decimal(str(valor)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def validar_data(valor, campo):
+    """Retorna a data em ISO (AAAA-MM-DD) ou None; rejeita formatos inválidos"""
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, date):
+        return valor.strftime('%Y-%m-%d')
+    try:
+        return date.fromisoformat(valor).strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"{campo} deve estar no formato AAAA-MM-DD")
+
+
+def validar_data_hora(valor):
+    """Retorna o momento em ISO (AAAA-MM-DD HH:MM:SS); None vira o momento atual"""
+    if valor is None:
+        valor = datetime.now()
+    elif not isinstance(valor, datetime):
+        try:
+            valor = datetime.fromisoformat(valor)
+        except (TypeError, ValueError):
+            raise ValueError("data_hora deve estar no formato AAAA-MM-DD HH:MM:SS")
+    return valor.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def validar_mes(valor):
+    """Retorna o mês de referência normalizado (AAAA-MM); rejeita formatos inválidos"""
+    try:
+        return datetime.strptime(valor.strip(), '%Y-%m').strftime('%Y-%m')
+    except (AttributeError, ValueError):
+        raise ValueError("Mês de referência deve estar no formato AAAA-MM")
+
+
+def status_por_vencimento(data_vencimento, hoje=None):
+    """Calcula o status do atleta (mesma regra de update_atleta_status)"""
+    hoje = hoje or datetime.now().date()
+    if not data_vencimento:
+        return 'ativo'
+    vencimento = date.fromisoformat(data_vencimento)
+    if vencimento < hoje:
+        return 'vencido'
+    if vencimento <= hoje + timedelta(days=7):
+        return 'alerta'
+    return 'ativo'
+
+
+# Meses cobertos por um pagamento, conforme o plano do atleta
+MESES_PLANO = {"Mensal": 1, "Trimestral": 3, "Semestral": 6, "Anual": 12}
+
+
+# Formas de pagamento aceitas nos formulários e na API
+FORMAS_PAGAMENTO = ("Dinheiro", "Transferência", "Cartão", "Multicaixa")
+
+
+# Faixas de vencimento mantidas incrementalmente (contagem e soma de planos)
+BUCKETS_VENCIMENTO = ('vencido', 'alerta', 'renovacao', 'ativo')
+
+
+def sql_bucket_vencimento(coluna, referencia):
+    """Expressão SQL que classifica um vencimento nas faixas de BUCKETS_VENCIMENTO"""
+    return f'''
+        CASE
+            WHEN {coluna} IS NULL OR {coluna} = '' THEN 'ativo'
+            WHEN {coluna} < {referencia} THEN 'vencido'
+            WHEN {coluna} <= date({referencia}, '+7 days') THEN 'alerta'
+            WHEN {coluna} <= date({referencia}, '+30 days') THEN 'renovacao'
+            ELSE 'ativo'
+        END
+    '''
+
+
+# Faixas de atraso do relatório de inadimplência: (menor, maior) dias vencidos
+FAIXAS_ATRASO = {'0-30': (1, 30), '31-60': (31, 60), '61-90': (61, 90), '90+': (91, None)}
+
+
+def sql_faixa_atraso(coluna, referencia):
+    """Expressão SQL que classifica um vencimento já passado nas FAIXAS_ATRASO"""
+    return f'''
+        CASE
+            WHEN {coluna} >= date({referencia}, '-30 days') THEN '0-30'
+            WHEN {coluna} >= date({referencia}, '-60 days') THEN '31-60'
+            WHEN {coluna} >= date({referencia}, '-90 days') THEN '61-90'
+            ELSE '90+'
+        END
+    '''
+
+
+# Invalidação do cache de coortes, disparada por escritas em meses já fechados
+MES_ATUAL_SQL = "strftime('%Y-%m', 'now', 'localtime')"
+INVALIDAR_COORTES_SQL = '''
+    DELETE FROM cache_coortes;
+    UPDATE versao_dados SET versao = versao + 1 WHERE tabela = 'cache_coortes';
+'''
+
+
+def intervalo_mes(mes):
+    """Retorna (primeiro dia, primeiro dia do mês seguinte) de um mês AAAA-MM"""
+    inicio = datetime.strptime(mes, '%Y-%m').date()
+    fim = (inicio + timedelta(days=32)).replace(day=1)
+    return inicio.isoformat(), fim.isoformat()
+
+
+def memoria_dataframe(df):
+    """Retorna o consumo de memória de um DataFrame em bytes"""
+    return int(df.memory_usage(deep=True).sum())
+
+# Pool de conexões
+
+
+class ConexaoPool(sqlite3.Connection):
+    """Conexão SQLite que volta para o pool em close() em vez de ser fechada"""
+    pool = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.devolver(self)
+
+    def fechar(self):
+        """Fecha a conexão de fato"""
+        super().close()
+
+
+class PoolConexoes:
+    """Mantém até `tamanho` conexões ociosas abertas para reaproveitamento"""
+
+    def __init__(self, db_name, tamanho=5, timeout=30):
+        self.db_name = db_name
+        self.timeout = timeout
+        self._ociosas = queue.LifoQueue(maxsize=tamanho)
+
+    def obter(self):
+        """Retorna uma conexão ociosa ou abre uma nova"""
+        try:
+            return self._ociosas.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(self.db_name, timeout=self.timeout,
+                                   check_same_thread=False, factory=ConexaoPool)
+            conn.pool = self
+            return conn
+
+    def devolver(self, conn):
+        """Desfaz transações pendentes e guarda a conexão (ou fecha, se o pool estiver cheio)"""
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._ociosas.put_nowait(conn)
+        except queue.Full:
+            conn.fechar()
+
+    def fechar(self):
+        """Fecha todas as conexões ociosas"""
+        while True:
+            try:
+                self._ociosas.get_nowait().fechar()
+            except queue.Empty:
+                return
+
+# Cache de consultas coerente entre processos
+
+
+class CacheCoerente:
+    """Guarda resultados de consultas e descarta só os que dependem de tabelas alteradas
+
+    Cada entrada registra as tabelas de que depende. Antes de servir, o cache
+    consulta PRAGMA data_version numa conexão própria: o valor só muda quando
+    outra conexão (deste ou de outro processo) confirma uma escrita, então
+    normalmente nenhuma tabela é lida. Quando muda, relê versao_dados (uma
+    linha por tabela, mantida por triggers) e descarta as entradas cujas
+    tabelas avançaram.
+    """
+
+    def __init__(self, db_name, timeout=30):
+        self.db_name = db_name
+        self.timeout = timeout
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+        self._conn = None
+        self._data_version = None
+        self._versoes = {}
+        self._entradas = {}
+        self._trava = threading.Lock()
+
+    def _sincronizar(self):
+        """Atualiza as versões das tabelas se houve commit desde a última consulta (com a trava)"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_name, timeout=self.timeout,
+                                         check_same_thread=False)
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+
+        versoes = dict(self._conn.execute("SELECT tabela, versao FROM versao_dados"))
+        alteradas = {tabela for tabela, versao in versoes.items()
+                     if self._versoes.get(tabela) != versao}
+        self._data_version, self._versoes = data_version, versoes
+
+        for chave in [chave for chave, (tabelas, _) in self._entradas.items()
+                      if tabelas & alteradas]:
+            del self._entradas[chave]
+            self.invalidacoes += 1
+
+    def versoes(self):
+        """Retorna {tabela: versão} atual, lendo versao_dados só se houve commit"""
+        with self._trava:
+            self._sincronizar()
+            return dict(self._versoes)
+
+    def obter(self, chave, tabelas, calcular):
+        """Retorna o resultado em cache para `chave` ou o calcula e guarda
+
+        O resultado só é guardado se nenhuma das `tabelas` mudou durante o
+        cálculo; senão é devolvido sem cache e a próxima chamada recalcula.
+        """
+        tabelas = frozenset(tabelas)
+        with self._trava:
+            self._sincronizar()
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self.acertos += 1
+                return entrada[1]
+            self.falhas += 1
+            antes = {tabela: self._versoes.get(tabela) for tabela in tabelas}
+
+        resultado = calcular()
+
+        with self._trava:
+            self._sincronizar()
+            if all(self._versoes.get(tabela) == versao for tabela, versao in antes.items()):
+                self._entradas[chave] = (tabelas, resultado)
+        return resultado
+
+    def fechar(self):
+        """Descarta as entradas e fecha a conexão de verificação (reaberta sob demanda)"""
+        with self._trava:
+            self._entradas.clear()
+            self._data_version = None
+            self._versoes = {}
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Índice de acesso em memória (catraca)
+
+_AUSENTE = object()
+
+
+class IndiceAcesso:
+    """Mapa atleta_id -> data de vencimento para liberar a catraca sem consultar o SQLite
+
+    Carregado uma vez e atualizado pelas escritas do próprio DatabaseManager;
+    alterações feitas por outros processos são detectadas em sincronizar(),
+    que compara a versão da tabela atletas e recarrega o mapa se preciso.
+    As escritas próprias informam quanto avançaram a versão (contar_escritas),
+    então só as de outros processos provocam a recarga.
+    """
+
+    # Decisões da catraca por status de vencimento
+    DECISOES = {'ativo': 'permitir', 'alerta': 'avisar', 'vencido': 'negar'}
+
+    def __init__(self, db):
+        self.db = db
+        self.versao = None
+        self._proprias = 0  # Avanço da versão pelas escritas deste processo desde a carga
+        self._trava = threading.Lock()
+        self._vencimentos = {}
+        self.recarregar()
+
+    def _versao_atual(self):
+        return self.db.cache.versoes().get('atletas', 0)
+
+    def recarregar(self):
+        """Lê todos os vencimentos do banco e troca o mapa de uma vez"""
+        # A versão é lida antes, para que uma escrita concorrente force nova carga
+        versao = self._versao_atual()
+        conn = self.db.get_connection()
+        cursor = conn.execute("SELECT id, data_vencimento FROM atletas WHERE arquivado = 0")
+        self._vencimentos = {
+            atleta_id: date.fromisoformat(data_vencimento) if data_vencimento else None
+            for atleta_id, data_vencimento in cursor
+        }
+        conn.close()
+        with self._trava:
+            self.versao, self._proprias = versao, 0
+
+    def sincronizar(self):
+        """Recarrega o mapa se outro processo alterou a tabela atletas desde a última carga"""
+        versao = self._versao_atual()
+        with self._trava:
+            if versao == self.versao + self._proprias:
+                self.versao, self._proprias = versao, 0
+                return False
+        self.recarregar()
+        return True
+
+    def contar_escritas(self, avanco):
+        """Registra quanto uma escrita deste processo (já aplicada ao mapa) avançou a versão"""
+        with self._trava:
+            self._proprias += avanco
+
+    def atualizar(self, atleta_id, data_vencimento):
+        """Registra o vencimento (ISO ou None) de um atleta criado ou alterado"""
+        self._vencimentos[atleta_id] = (
+            date.fromisoformat(data_vencimento) if data_vencimento else None)
+
+    def remover(self, atleta_id):
+        self._vencimentos.pop(atleta_id, None)
+
+    def __len__(self):
+        return len(self._vencimentos)
+
+    def verificar(self, atleta_id, hoje=None):
+        """Retorna a decisão (permitir, avisar, negar) ou None se o atleta não existir"""
+        vencimento = self._vencimentos.get(atleta_id, _AUSENTE)
+        if vencimento is _AUSENTE:
+            return None
+
+        hoje = hoje or date.today()
+        if vencimento is None:
+            status, dias_restantes = 'ativo', None
+        else:
+            dias_restantes = (vencimento - hoje).days
+            status = ('vencido' if dias_restantes < 0
+                      else 'alerta' if dias_restantes <= 7 else 'ativo')
+
+        return {
+            'atleta_id': atleta_id,
+            'decisao': self.DECISOES[status],
+            'status': status,
+            'data_vencimento': vencimento.isoformat() if vencimento else None,
+            'dias_restantes': dias_restantes
+        }
+
+# Classe para gerenciar autenticação
+
+
+class AuthManager:
+    def __init__(self, db_name='academia.db'):
+        self.db_name = db_name
+        self.init_auth_database()
+
+    def init_auth_database(self):
+        """Inicializa tabela de usuários"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS usuarios (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                telefone TEXT,
+                senha_hash TEXT NOT NULL,
+                data_criacao DATE DEFAULT CURRENT_DATE,
+                data_atualizacao DATE DEFAULT CURRENT_DATE,
+                tipo TEXT DEFAULT 'admin'
+            )
+        ''')
+
+        # Filial do usuário (ver filiais.RoteadorFiliais); 1 é a filial principal
+        cursor.execute("PRAGMA table_info(usuarios)")
+        if 'filial_id' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute(
+                'ALTER TABLE usuarios ADD COLUMN filial_id INTEGER DEFAULT 1')
+
+        conn.commit()
+        conn.close()
+
+    def hash_password(self, password):
+        """Cria hash da senha"""
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def verificar_senha(self, password, hash_password):
+        """Verifica se a senha está correta"""
+        return self.hash_password(password) == hash_password
+
+    def criar_usuario(self, nome, email, telefone, senha, filial_id=1):
+        """Cria um novo usuário"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        try:
+            senha_hash = self.hash_password(senha)
+            cursor.execute('''
+                INSERT INTO usuarios (nome, email, telefone, senha_hash, filial_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (nome, email, telefone, senha_hash, filial_id))
+
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False  # Email já existe
+        finally:
+            conn.close()
+
+    def verificar_login(self, email, senha):
+        """Verifica credenciais de login"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id, nome, email, telefone, senha_hash, tipo, filial_id 
+            FROM usuarios WHERE email = ?
+        ''', (email,))
+
+        usuario = cursor.fetchone()
+        conn.close()
+
+        if usuario and self.verificar_senha(senha, usuario[4]):
+            return {
+                'id': usuario[0],
+                'nome': usuario[1],
+                'email': usuario[2],
+                'telefone': usuario[3],
+                'tipo': usuario[5],
+                'filial_id': usuario[6] or 1
+            }
+        return None
+
+    def atualizar_usuario(self, usuario_id, nome, telefone, email, senha_atual=None, nova_senha=None):
+        """Atualiza dados do usuário"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        try:
+            if senha_atual and nova_senha:
+                # Verificar senha atual
+                cursor.execute(
+                    'SELECT senha_hash FROM usuarios WHERE id = ?', (usuario_id,))
+                resultado = cursor.fetchone()
+
+                if not resultado or not self.verificar_senha(senha_atual, resultado[0]):
+                    return False, "Senha atual incorreta"
+
+                # Atualizar com nova senha
+                nova_senha_hash = self.hash_password(nova_senha)
+                cursor.execute('''
+                    UPDATE usuarios 
+                    SET nome = ?, telefone = ?, email = ?, senha_hash = ?, data_atualizacao = CURRENT_DATE
+                    WHERE id = ?
+                ''', (nome, telefone, email, nova_senha_hash, usuario_id))
+            else:
+                # Atualizar sem mudar senha
+                cursor.execute('''
+                    UPDATE usuarios 
+                    SET nome = ?, telefone = ?, email = ?, data_atualizacao = CURRENT_DATE
+                    WHERE id = ?
+                ''', (nome, telefone, email, usuario_id))
+
+            conn.commit()
+            return True, "Dados atualizados com sucesso"
+
+        except sqlite3.IntegrityError:
+            return False, "Email já está em uso"
+        finally:
+            conn.close()
+
+# Classe para gerenciar o banco de dados principal
+
+
+class DatabaseManager:
+    # Tabelas cujas alterações invalidam figuras e resultados em cache
+    TABELAS_VERSIONADAS = ('atletas', 'pagamentos', 'configuracoes', 'frequencia')
+
+    # Colunas de data validadas (formato ISO) por triggers
+    COLUNAS_DATA = {
+        'atletas': ('data_cadastro', 'data_vencimento', 'data_nascimento'),
+        'pagamentos': ('data_pagamento',)
+    }
+
+    # Datas legadas convertidas para ISO na migração (GLOB -> expressão AAAA-MM-DD)
+    FORMATOS_DATA_LEGADOS = {
+        '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]':
+            "substr({coluna}, 7, 4) || '-' || substr({coluna}, 4, 2) || '-' || substr({coluna}, 1, 2)",
+        '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]':
+            "substr({coluna}, 7, 4) || '-' || substr({coluna}, 4, 2) || '-' || substr({coluna}, 1, 2)",
+        '[0-9][0-9][0-9][0-9]/[0-9][0-9]/[0-9][0-9]': "replace({coluna}, '/', '-')",
+    }
+
+    # Linhas convertidas por transação nas migrações de dados
+    TAMANHO_LOTE_MIGRACAO = 5000
+
+    def __init__(self, db_name='academia.db', tamanho_pool=5, cache_disco=None, escritor_unico=True):
+        self.db_name = db_name
+        self.pool = PoolConexoes(db_name, tamanho_pool)
+        self.cache_disco = cache_disco
+        self.indice_acesso = None
+        self._trava_indice = threading.Lock()
+        self.particoes = ParticoesPagamentos(self)
+        self.arquivo = ArquivoPagamentos(self)
+        self.init_database()
+        self.migrate_database()
+        self.cache = CacheCoerente(db_name)
+        # Escritas pela thread do escritor único (ou direto, com escritor_unico=False)
+        self.escritor = EscritorUnico(db_name) if escritor_unico else None
+
+    def init_database(self):
+        """Inicializa o banco de dados com tabelas"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        # WAL: as leituras do pool não esperam o commit do escritor (nem o bloqueiam)
+        cursor.execute("PRAGMA journal_mode = WAL")
+
+        # Tabela de atletas
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS atletas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL,
+                telefone TEXT,
+                email TEXT,
+                data_cadastro DATE DEFAULT CURRENT_DATE,
+                data_vencimento DATE,
+                status TEXT DEFAULT 'ativo',
+                observacoes TEXT,
+                plano TEXT DEFAULT 'Mensal',
+                valor_plano REAL DEFAULT 10000.00,
+                valor_plano_centavos INTEGER DEFAULT 1000000,
+                versao INTEGER NOT NULL DEFAULT 1,
+                arquivado INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+        # Tabela de pagamentos
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pagamentos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                atleta_id INTEGER,
+                data_pagamento DATE DEFAULT CURRENT_DATE,
+                valor REAL,
+                valor_centavos INTEGER,
+                mes_referencia TEXT,
+                forma_pagamento TEXT,
+                observacoes TEXT,
+                chave_idempotencia TEXT,
+                FOREIGN KEY(atleta_id) REFERENCES atletas(id)
+            )
+        ''')
+
+        # Tabela de configurações e metas
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS configuracoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chave TEXT UNIQUE,
+                valor TEXT,
+                data_atualizacao DATE DEFAULT CURRENT_DATE
+            )
+        ''')
+
+        # Check-ins (frequência) e o resumo por hora usado nos gráficos de pico
+        self._criar_frequencia(cursor)
+
+        # Contadores de versão por tabela, incrementados por triggers a cada escrita
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS versao_dados (
+                tabela TEXT PRIMARY KEY,
+                versao INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+        for tabela in self.TABELAS_VERSIONADAS:
+            cursor.execute(
+                "INSERT OR IGNORE INTO versao_dados (tabela, versao) VALUES (?, 0)", (tabela,))
+            # Os de pagamentos vão em cada tabela física (ver _criar_estrutura_pagamentos)
+            if tabela != 'pagamentos':
+                self._criar_triggers_versao(cursor, tabela)
+
+        conn.commit()
+        conn.close()
+
+    def migrate_database(self):
+        """Adiciona colunas faltantes nas tabelas existentes"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        try:
+            # Verificar se a coluna data_nascimento existe
+            cursor.execute("PRAGMA table_info(atletas)")
+            columns = [column[1] for column in cursor.fetchall()]
+
+            if 'data_nascimento' not in columns:
+                cursor.execute(
+                    'ALTER TABLE atletas ADD COLUMN data_nascimento DATE')
+                print("✅ Coluna data_nascimento adicionada")
+
+            # Valores monetários em cêntimos (inteiros); as datas em ISO vêm em seguida
+            if 'valor_plano_centavos' not in columns:
+                cursor.execute(
+                    'ALTER TABLE atletas ADD COLUMN valor_plano_centavos INTEGER DEFAULT 1000000')
+                conn.commit()
+                self._migrar_em_lotes(conn, 'atletas', '''
+                    UPDATE atletas SET valor_plano_centavos = CAST(ROUND(valor_plano * 100) AS INTEGER)
+                    WHERE id > ? AND id <= ? AND valor_plano IS NOT NULL
+                ''')
+                print("✅ Coluna valor_plano_centavos adicionada")
+
+            # Versão da linha para a edição concorrente (ver update_atleta)
+            if 'versao' not in columns:
+                cursor.execute(
+                    'ALTER TABLE atletas ADD COLUMN versao INTEGER NOT NULL DEFAULT 1')
+                print("✅ Coluna versao adicionada")
+
+            # Atletas arquivados saem da lista e da catraca (ver arquivar_atletas)
+            if 'arquivado' not in columns:
+                cursor.execute(
+                    'ALTER TABLE atletas ADD COLUMN arquivado INTEGER NOT NULL DEFAULT 0')
+                print("✅ Coluna arquivado adicionada")
+
+            cursor.execute("PRAGMA table_info(pagamentos)")
+            colunas_pagamentos = [column[1] for column in cursor.fetchall()]
+
+            if 'valor_centavos' not in colunas_pagamentos:
+                cursor.execute(
+                    'ALTER TABLE pagamentos ADD COLUMN valor_centavos INTEGER')
+                conn.commit()
+                self._migrar_em_lotes(conn, 'pagamentos', '''
+                    UPDATE pagamentos SET valor_centavos = CAST(ROUND(valor * 100) AS INTEGER)
+                    WHERE id > ? AND id <= ? AND valor IS NOT NULL
+                ''')
+                print("✅ Coluna valor_centavos adicionada")
+
+            cursor.execute(
+                'DROP INDEX IF EXISTS idx_pagamentos_atleta_valor')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_atletas_vencimento_valor
+                ON atletas (data_vencimento, valor_plano_centavos)
+            ''')
+
+            # Datas que a migração para ISO não conseguiu converter
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'datas_invalidas'")
+            revisar_datas = cursor.fetchone() is None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS datas_invalidas (
+                    tabela TEXT NOT NULL,
+                    linha_id INTEGER NOT NULL,
+                    coluna TEXT NOT NULL,
+                    valor TEXT,
+                    PRIMARY KEY (tabela, linha_id, coluna)
+                )
+            ''')
+
+            self._criar_triggers_validacao(cursor)
+            reconstruir_buckets = self._criar_buckets_vencimento(cursor)
+            self._criar_cache_coortes(cursor)
+            resumir_arquivo = self._criar_arquivo_pagamentos(cursor)
+
+            # Tabela única ou, com particionamento, cada partição anual
+            tabelas_pagamentos = self.particoes.tabelas_fisicas(conn)
+            if 'chave_idempotencia' not in colunas_pagamentos:
+                for tabela in tabelas_pagamentos:
+                    cursor.execute(f'ALTER TABLE {tabela} ADD COLUMN chave_idempotencia TEXT')
+                if self.particoes.ativo(conn):
+                    self.particoes._recriar_visao(conn)
+                print("✅ Coluna chave_idempotencia adicionada")
+            for tabela in tabelas_pagamentos:
+                self._criar_estrutura_pagamentos(cursor, tabela)
+
+            # Inserir meta padrão se não existir
+            cursor.execute(
+                "SELECT * FROM configuracoes WHERE chave = 'meta_receita_mensal'")
+            if not cursor.fetchone():
+                cursor.execute(
+                    "INSERT INTO configuracoes (chave, valor) VALUES ('meta_receita_mensal', '500000')")
+
+            conn.commit()
+
+            if reconstruir_buckets:
+                self.reconstruir_buckets_vencimento()
+            if resumir_arquivo:
+                self.arquivo.resumir_por_dia()
+            if revisar_datas:
+                self._normalizar_datas(conn, 'atletas')
+                for tabela in tabelas_pagamentos:
+                    self._normalizar_datas(conn, tabela, self.COLUNAS_DATA['pagamentos'])
+
+        except Exception as e:
+            print(f"⚠️ Erro na migração: {e}")
+        finally:
+            conn.close()
+
+    def _migrar_em_lotes(self, conn, tabela, sql):
+        """Executa um UPDATE por faixas de id, com um commit por lote"""
+        maior_id = conn.execute(
+            f"SELECT COALESCE(MAX(id), 0) FROM {tabela}").fetchone()[0]
+
+        for inicio in range(0, maior_id, self.TAMANHO_LOTE_MIGRACAO):
+            conn.execute(sql, (inicio, inicio + self.TAMANHO_LOTE_MIGRACAO))
+            conn.commit()
+
+    def _normalizar_datas(self, conn, tabela, colunas=None):
+        """Reescreve em ISO as datas reconhecíveis e registra as demais em datas_invalidas
+
+        Além do que o date() do SQLite interpreta, aceita DD/MM/AAAA, DD-MM-AAAA
+        e AAAA/MM/DD. O que sobra (inclusive dias inexistentes, como 2024-02-31,
+        que o date() deixa passar) não é alterado: fica listado em
+        datas_invalidas, com o valor original, para correção manual.
+        """
+        for coluna in colunas or self.COLUNAS_DATA[tabela]:
+            self._migrar_em_lotes(conn, tabela, f'''
+                UPDATE {tabela} SET {coluna} = date({coluna})
+                WHERE id > ? AND id <= ?
+                AND {coluna} IS NOT date({coluna}) AND date({coluna}) IS NOT NULL
+            ''')
+            for formato, iso in self.FORMATOS_DATA_LEGADOS.items():
+                iso = iso.format(coluna=coluna)
+                self._migrar_em_lotes(conn, tabela, f'''
+                    UPDATE {tabela} SET {coluna} = {iso}
+                    WHERE id > ? AND id <= ?
+                    AND {coluna} GLOB '{formato}' AND date({iso}, '+0 days') IS {iso}
+                ''')
+
+            cursor = conn.execute(f'''
+                INSERT OR REPLACE INTO datas_invalidas (tabela, linha_id, coluna, valor)
+                SELECT '{tabela}', id, '{coluna}', {coluna} FROM {tabela}
+                WHERE {coluna} IS NOT NULL AND date({coluna}, '+0 days') IS NOT {coluna}
+            ''')
+            conn.commit()
+            if cursor.rowcount:
+                print(f"⚠️ {cursor.rowcount} datas não reconhecidas em {tabela}.{coluna} "
+                      "(ver tabela datas_invalidas)")
+
+    def _criar_triggers_versao(self, cursor, tabela, versao=None):
+        """Cria os triggers que incrementam a versão da tabela (ou de `versao`) a cada escrita"""
+        versao = versao or tabela
+        for evento in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_versao_{tabela}_{evento.lower()}
+                AFTER {evento} ON {tabela}
+                BEGIN
+                    UPDATE versao_dados SET versao = versao + 1 WHERE tabela = '{versao}';
+                END
+            ''')
+
+    def _criar_triggers_validacao(self, cursor, tabela='atletas', colunas=None,
+                                  real='valor_plano', centavos='valor_plano_centavos',
+                                  centavos_padrao=1000000):
+        """Cria triggers que rejeitam datas fora do ISO e sincronizam REAL e cêntimos
+
+        Os cêntimos são a fonte da verdade: o REAL é recalculado a partir deles.
+        Só quando a escrita não trouxe os cêntimos (coluna nula ou com o valor
+        padrão, ou um UPDATE só do REAL) os cêntimos saem do REAL.
+        """
+        for coluna in colunas or self.COLUNAS_DATA[tabela]:
+            mensagem = f"{coluna} deve estar no formato AAAA-MM-DD"
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{tabela}_{coluna}_insert
+                BEFORE INSERT ON {tabela}
+                WHEN NEW.{coluna} IS NOT NULL AND date(NEW.{coluna}) IS NOT NEW.{coluna}
+                BEGIN
+                    SELECT RAISE(ABORT, '{mensagem}');
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{tabela}_{coluna}_update
+                BEFORE UPDATE OF {coluna} ON {tabela}
+                WHEN NEW.{coluna} IS NOT OLD.{coluna} AND NEW.{coluna} IS NOT NULL
+                AND date(NEW.{coluna}) IS NOT NEW.{coluna}
+                BEGIN
+                    SELECT RAISE(ABORT, '{mensagem}');
+                END
+            ''')
+
+        # Versão anterior: o REAL sobrescrevia os cêntimos (inclusive com o seu valor padrão)
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                       (f"trg_{tabela}_{real}_update",))
+        if cursor.fetchone() is None:
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{tabela}_{centavos}_insert")
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{tabela}_{centavos}_update")
+
+        # Integrações antigas que gravam só o REAL: os cêntimos ficaram nulos ou no padrão
+        sem_centavos = f"NEW.{centavos} IS NULL"
+        if centavos_padrao is not None:
+            sem_centavos = (f"({sem_centavos} OR (NEW.{centavos} = {centavos_padrao} "
+                            f"AND NEW.{real} IS NOT {centavos_padrao / 100!r}))")
+        real_dos_centavos = f"NEW.{centavos} / 100.0"
+        centavos_do_real = f"CAST(ROUND(NEW.{real} * 100) AS INTEGER)"
+
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_{centavos}_insert
+            AFTER INSERT ON {tabela}
+            BEGIN
+                UPDATE {tabela} SET {centavos} = {centavos_do_real}
+                WHERE id = NEW.id AND NEW.{real} IS NOT NULL AND {sem_centavos}
+                AND NEW.{centavos} IS NOT {centavos_do_real};
+                UPDATE {tabela} SET {real} = {real_dos_centavos}
+                WHERE id = NEW.id AND NEW.{centavos} IS NOT NULL
+                AND NOT (NEW.{real} IS NOT NULL AND {sem_centavos})
+                AND NEW.{real} IS NOT {real_dos_centavos};
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_{real}_update
+            AFTER UPDATE OF {centavos} ON {tabela}
+            WHEN NEW.{centavos} IS NOT NULL AND NEW.{real} IS NOT {real_dos_centavos}
+            BEGIN
+                UPDATE {tabela} SET {real} = {real_dos_centavos} WHERE id = NEW.id;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_{centavos}_update
+            AFTER UPDATE OF {real} ON {tabela}
+            WHEN NEW.{centavos} IS OLD.{centavos} AND NEW.{real} IS NOT NULL
+            AND NEW.{centavos} IS NOT {centavos_do_real}
+            BEGIN
+                UPDATE {tabela} SET {centavos} = {centavos_do_real} WHERE id = NEW.id;
+            END
+        ''')
+
+    def _criar_estrutura_pagamentos(self, cursor, tabela='pagamentos'):
+        """Cria índices e triggers de uma tabela física de pagamentos
+
+        Com o particionamento por ano (ver particoes.py) cada partição recebe a
+        mesma estrutura; os triggers continuam versionando 'pagamentos'.
+        """
+        # Índices sobre as colunas inteiras (cobrem as agregações de receita)
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{tabela}_atleta_centavos
+            ON {tabela} (atleta_id, valor_centavos)
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{tabela}_data_centavos
+            ON {tabela} (data_pagamento, valor_centavos)
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{tabela}_atleta_data
+            ON {tabela} (atleta_id, data_pagamento DESC, id DESC)
+        ''')
+        # Ordem da busca sem filtros (buscar_pagamentos): página lida do fim do índice
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{tabela}_data_id
+            ON {tabela} (data_pagamento, id)
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{tabela}_mes_forma
+            ON {tabela} (mes_referencia, forma_pagamento, valor_centavos)
+        ''')
+        # Cliques repetidos no formulário: a mesma chave não grava duas vezes
+        cursor.execute(f'''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_{tabela}_chave_idempotencia
+            ON {tabela} (chave_idempotencia)
+        ''')
+
+        self._criar_triggers_versao(cursor, tabela, 'pagamentos')
+        self._criar_triggers_validacao(cursor, tabela, self.COLUNAS_DATA['pagamentos'],
+                                       'valor', 'valor_centavos', centavos_padrao=None)
+
+        # Invalidação do cache de coortes (ver _criar_cache_coortes)
+        for evento, linhas in (('INSERT', ('NEW',)), ('UPDATE', ('NEW', 'OLD')),
+                               ('DELETE', ('OLD',))):
+            condicao = " OR ".join(
+                f"COALESCE({linha}.mes_referencia, substr({linha}.data_pagamento, 1, 7)) < {MES_ATUAL_SQL}"
+                for linha in linhas)
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_cache_coortes_{tabela}_{evento.lower()}
+                AFTER {evento} ON {tabela}
+                WHEN {condicao}
+                BEGIN
+                    {INVALIDAR_COORTES_SQL}
+                END
+            ''')
+
+    def _criar_frequencia(self, cursor):
+        """Cria a tabela de check-ins e o resumo por dia e hora mantido por triggers
+
+        Os índices começam pela data/hora, para que as consultas por período
+        (e a limpeza de dados antigos) leiam só o intervalo pedido.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS frequencia (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                atleta_id INTEGER NOT NULL,
+                data_hora TEXT NOT NULL,
+                origem TEXT DEFAULT 'catraca',
+                FOREIGN KEY(atleta_id) REFERENCES atletas(id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_frequencia_data_hora
+            ON frequencia (data_hora)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_frequencia_atleta_data_hora
+            ON frequencia (atleta_id, data_hora)
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS frequencia_por_hora (
+                dia TEXT NOT NULL,
+                hora INTEGER NOT NULL,
+                total INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dia, hora)
+            ) WITHOUT ROWID
+        ''')
+
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_frequencia_por_hora_insert
+            AFTER INSERT ON frequencia
+            BEGIN
+                INSERT INTO frequencia_por_hora (dia, hora, total)
+                VALUES (substr(NEW.data_hora, 1, 10), CAST(substr(NEW.data_hora, 12, 2) AS INTEGER), 1)
+                ON CONFLICT(dia, hora) DO UPDATE SET total = total + 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_frequencia_por_hora_delete
+            AFTER DELETE ON frequencia
+            BEGIN
+                UPDATE frequencia_por_hora SET total = total - 1
+                WHERE dia = substr(OLD.data_hora, 1, 10)
+                AND hora = CAST(substr(OLD.data_hora, 12, 2) AS INTEGER);
+            END
+        ''')
+
+    def _criar_cache_coortes(self, cursor):
+        """Cria o cache mensal da análise de coortes e os triggers que o invalidam
+
+        A análise usa só meses fechados, então pagamentos do mês corrente não
+        a alteram; o cache só é apagado quando uma escrita atinge meses
+        anteriores ou muda o cadastro/plano de um atleta. Cada invalidação
+        incrementa a versão 'cache_coortes', para que um cálculo concorrente
+        não grave um resultado já desatualizado.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_coortes (
+                mes TEXT PRIMARY KEY,
+                resultado TEXT NOT NULL,
+                data_calculo TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute(
+            "INSERT OR IGNORE INTO versao_dados (tabela, versao) VALUES ('cache_coortes', 0)")
+
+        # Os triggers de pagamentos ficam em _criar_estrutura_pagamentos
+        for evento, condicao in (
+                ('INSERT', f"substr(NEW.data_cadastro, 1, 7) < {MES_ATUAL_SQL}"),
+                ('UPDATE OF data_cadastro, plano',
+                 "NEW.data_cadastro IS NOT OLD.data_cadastro OR NEW.plano IS NOT OLD.plano"),
+                ('DELETE', "1")):
+            sufixo = evento.split()[0].lower()
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_cache_coortes_atletas_{sufixo}
+                AFTER {evento} ON atletas
+                WHEN {condicao}
+                BEGIN
+                    {INVALIDAR_COORTES_SQL}
+                END
+            ''')
+
+    def _criar_arquivo_pagamentos(self, cursor):
+        """Cria o catálogo do arquivo de pagamentos e os resumos dos anos arquivados"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS arquivo_pagamentos (
+                ano INTEGER PRIMARY KEY,
+                arquivo TEXT NOT NULL,
+                linhas INTEGER NOT NULL,
+                soma_centavos INTEGER NOT NULL,
+                data_arquivamento TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pagamentos_arquivados_por_mes (
+                mes TEXT PRIMARY KEY,
+                quantidade INTEGER NOT NULL,
+                total_centavos INTEGER NOT NULL,
+                novos_centavos INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pagamentos_arquivados_por_atleta (
+                atleta_id INTEGER PRIMARY KEY,
+                quantidade INTEGER NOT NULL,
+                soma_centavos INTEGER NOT NULL,
+                ultimo_pagamento TEXT
+            )
+        ''')
+
+        # Receita arquivada por dia e forma, para relatórios com período livre
+        # (forma NULL vira '' porque entra na chave)
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'pagamentos_arquivados_por_dia'")
+        criar_por_dia = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pagamentos_arquivados_por_dia (
+                data_pagamento TEXT NOT NULL,
+                forma_pagamento TEXT NOT NULL,
+                quantidade INTEGER NOT NULL,
+                total_centavos INTEGER NOT NULL,
+                PRIMARY KEY (data_pagamento, forma_pagamento)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("SELECT 1 FROM arquivo_pagamentos LIMIT 1")
+        # Anos arquivados antes desta tabela precisam ser resumidos dos arquivos
+        return criar_por_dia and cursor.fetchone() is not None
+
+    def _criar_buckets_vencimento(self, cursor):
+        """Cria as tabelas e triggers dos buckets de vencimento
+
+        vencimentos_por_dia é um histograma (dia -> atletas e soma dos planos) e
+        buckets_vencimento guarda os totais por faixa relativos à data de
+        referência. Ambos são atualizados por triggers a cada escrita em atletas;
+        na virada do dia as faixas são recalculadas só a partir do histograma.
+        Atletas arquivados não entram nas contagens. Retorna True quando as
+        tabelas ainda precisam ser populadas (ou recontadas).
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS vencimentos_por_dia (
+                data_vencimento TEXT PRIMARY KEY,
+                quantidade INTEGER NOT NULL DEFAULT 0,
+                soma_valor_plano_centavos INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS buckets_vencimento (
+                bucket TEXT PRIMARY KEY,
+                quantidade INTEGER NOT NULL DEFAULT 0,
+                soma_valor_plano_centavos INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS buckets_vencimento_referencia (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                data_referencia TEXT NOT NULL
+            )
+        ''')
+        for bucket in BUCKETS_VENCIMENTO:
+            cursor.execute(
+                "INSERT OR IGNORE INTO buckets_vencimento (bucket) VALUES (?)", (bucket,))
+
+        referencia = "(SELECT data_referencia FROM buckets_vencimento_referencia WHERE id = 1)"
+
+        # Triggers anteriores ao arquivamento contavam todos os atletas: recria e reconta
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_buckets_vencimento_update'")
+        recontar = cursor.fetchone() is not None
+        if recontar:
+            for evento in ('insert', 'delete', 'update'):
+                cursor.execute(f"DROP TRIGGER trg_buckets_vencimento_{evento}")
+
+        def somar(linha, sinal):
+            return f'''
+                INSERT INTO vencimentos_por_dia (data_vencimento, quantidade, soma_valor_plano_centavos)
+                VALUES (COALESCE({linha}.data_vencimento, ''), {sinal}1,
+                        {sinal}COALESCE({linha}.valor_plano_centavos, 0))
+                ON CONFLICT(data_vencimento) DO UPDATE SET
+                    quantidade = quantidade + excluded.quantidade,
+                    soma_valor_plano_centavos = soma_valor_plano_centavos + excluded.soma_valor_plano_centavos;
+                UPDATE buckets_vencimento SET
+                    quantidade = quantidade {sinal} 1,
+                    soma_valor_plano_centavos = soma_valor_plano_centavos
+                        {sinal} COALESCE({linha}.valor_plano_centavos, 0)
+                WHERE bucket = {sql_bucket_vencimento(f'{linha}.data_vencimento', referencia)};
+            '''
+
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_buckets_vencimento_insert
+            AFTER INSERT ON atletas
+            WHEN NEW.arquivado = 0
+            BEGIN
+                {somar('NEW', '+')}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_buckets_vencimento_delete
+            AFTER DELETE ON atletas
+            WHEN OLD.arquivado = 0
+            BEGIN
+                {somar('OLD', '-')}
+                DELETE FROM vencimentos_por_dia
+                WHERE data_vencimento = COALESCE(OLD.data_vencimento, '') AND quantidade = 0;
+            END
+        ''')
+        # Alteração: sai a linha antiga (se contava) e entra a nova (se conta)
+        mudou = '''(OLD.data_vencimento IS NOT NEW.data_vencimento
+                    OR OLD.valor_plano_centavos IS NOT NEW.valor_plano_centavos
+                    OR OLD.arquivado IS NOT NEW.arquivado)'''
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_buckets_vencimento_update_sai
+            AFTER UPDATE OF data_vencimento, valor_plano_centavos, arquivado ON atletas
+            WHEN OLD.arquivado = 0 AND {mudou}
+            BEGIN
+                {somar('OLD', '-')}
+                DELETE FROM vencimentos_por_dia
+                WHERE data_vencimento = COALESCE(OLD.data_vencimento, '') AND quantidade = 0;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_buckets_vencimento_update_entra
+            AFTER UPDATE OF data_vencimento, valor_plano_centavos, arquivado ON atletas
+            WHEN NEW.arquivado = 0 AND {mudou}
+            BEGIN
+                {somar('NEW', '+')}
+            END
+        ''')
+
+        cursor.execute("SELECT 1 FROM buckets_vencimento_referencia")
+        return cursor.fetchone() is None or recontar
+
+    def reconstruir_buckets_vencimento(self):
+        """Reconstrói histograma e buckets de vencimento a partir da tabela atletas"""
+        hoje = datetime.now().date().isoformat()
+        conn = self.get_connection()
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM vencimentos_por_dia")
+            conn.execute('''
+                INSERT INTO vencimentos_por_dia (data_vencimento, quantidade, soma_valor_plano_centavos)
+                SELECT COALESCE(data_vencimento, ''), COUNT(*), COALESCE(SUM(valor_plano_centavos), 0)
+                FROM atletas
+                WHERE arquivado = 0
+                GROUP BY 1
+            ''')
+            self._reclassificar_buckets(conn, hoje)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _reclassificar_buckets(self, conn, hoje):
+        """Recalcula as faixas para a data de referência usando só o histograma"""
+        conn.execute('''
+            INSERT INTO buckets_vencimento_referencia (id, data_referencia) VALUES (1, ?)
+            ON CONFLICT(id) DO UPDATE SET data_referencia = excluded.data_referencia
+        ''', (hoje,))
+
+        bucket = sql_bucket_vencimento('h.data_vencimento', ':hoje')
+        conn.execute(f'''
+            UPDATE buckets_vencimento SET
+                quantidade = (
+                    SELECT COALESCE(SUM(h.quantidade), 0) FROM vencimentos_por_dia h
+                    WHERE {bucket} = buckets_vencimento.bucket),
+                soma_valor_plano_centavos = (
+                    SELECT COALESCE(SUM(h.soma_valor_plano_centavos), 0) FROM vencimentos_por_dia h
+                    WHERE {bucket} = buckets_vencimento.bucket)
+        ''', {'hoje': hoje})
+
+    def virar_dia_buckets(self):
+        """Avança a data de referência dos buckets quando o dia muda"""
+        hoje = datetime.now().date().isoformat()
+        conn = self.get_connection()
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            atual = conn.execute(
+                "SELECT data_referencia FROM buckets_vencimento_referencia WHERE id = 1").fetchone()
+            if atual is None or atual[0] != hoje:
+                self._reclassificar_buckets(conn, hoje)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def get_buckets_vencimento(self):
+        """Retorna {bucket: (quantidade, soma dos planos em cêntimos)} sem varrer atletas"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT data_referencia FROM buckets_vencimento_referencia WHERE id = 1")
+        referencia = cursor.fetchone()
+        if referencia is None or referencia[0] != datetime.now().date().isoformat():
+            conn.close()
+            self.virar_dia_buckets()
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT bucket, quantidade, soma_valor_plano_centavos FROM buckets_vencimento")
+        buckets = {bucket: (quantidade, soma)
+                   for bucket, quantidade, soma in cursor.fetchall()}
+
+        conn.close()
+        return buckets
+
+    def verificar_buckets_vencimento(self, corrigir=True):
+        """Confere os buckets contra uma contagem direta em atletas
+
+        Retorna as divergências {bucket: (esperado, mantido)}; com corrigir=True
+        os buckets são reconstruídos quando há diferença.
+        """
+        self.virar_dia_buckets()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        # Uma única transação de leitura para comparar o mesmo estado
+        cursor.execute("BEGIN")
+        cursor.execute(f'''
+            SELECT {sql_bucket_vencimento('data_vencimento', ':hoje')} AS bucket,
+                   COUNT(*), COALESCE(SUM(valor_plano_centavos), 0)
+            FROM atletas
+            WHERE arquivado = 0
+            GROUP BY bucket
+        ''', {'hoje': datetime.now().date().isoformat()})
+        esperado = {bucket: (quantidade, soma)
+                    for bucket, quantidade, soma in cursor.fetchall()}
+        cursor.execute(
+            "SELECT bucket, quantidade, soma_valor_plano_centavos FROM buckets_vencimento")
+        mantido = {bucket: (quantidade, soma)
+                   for bucket, quantidade, soma in cursor.fetchall()}
+        conn.rollback()
+        conn.close()
+
+        divergencias = {
+            bucket: (esperado.get(bucket, (0, 0)), mantido.get(bucket, (0, 0)))
+            for bucket in BUCKETS_VENCIMENTO
+            if esperado.get(bucket, (0, 0)) != mantido.get(bucket, (0, 0))
+        }
+
+        if divergencias and corrigir:
+            self.reconstruir_buckets_vencimento()
+
+        return divergencias
+
+    def get_connection(self):
+        """Retorna conexão com o banco (do pool; close() a devolve)"""
+        return self.pool.obter()
+
+    def fechar(self):
+        """Grava as escritas pendentes, fecha as conexões ociosas e esvazia o cache de consultas"""
+        if self.escritor is not None:
+            self.escritor.parar()
+        self.pool.fechar()
+        self.cache.fechar()
+
+    def _escrever(self, comando, *args):
+        """Executa `comando(conn, *args)` numa transação e retorna o resultado
+
+        Com o escritor único, o comando vai para a fila dele e pode ser gravado
+        no mesmo commit que comandos de outras sessões.
+        """
+        if self.escritor is not None:
+            return self.escritor.executar(comando, *args).result()
+
+        conn = self.get_connection()
+        try:
+            resultado = comando(conn, *args)
+            conn.commit()
+            return resultado
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def get_versao_dados(self, *tabelas):
+        """Retorna um token que muda sempre que alguma das tabelas é alterada
+
+        O token inclui o arquivo do banco, para que caches de filiais diferentes
+        nunca se confundam.
+        """
+        tabelas = tabelas or self.TABELAS_VERSIONADAS
+        versoes = self.cache.versoes()
+
+        return self.db_name + "|" + "-".join(
+            f"{tabela}:{versoes.get(tabela, 0)}" for tabela in tabelas)
+
+    def _consultar(self, chave, tabelas, calcular):
+        """Resultado de `calcular` em cache: na memória do processo e, se houver, no disco
+
+        O cache em disco (CacheDisco) é compartilhado pelos workers; a chave
+        leva o token de versão das tabelas, então escritas geram chaves novas
+        e as antigas saem por TTL ou LRU.
+        """
+        def calcular_compartilhado():
+            if self.cache_disco is None:
+                return calcular()
+            chave_disco = f"{self.get_versao_dados(*tabelas)}|{chave!r}"
+            return self.cache_disco.obter(chave_disco, calcular)
+
+        return self.cache.obter(chave, tabelas, calcular_compartilhado)
+
+    def get_indice_acesso(self):
+        """Retorna o índice de acesso em memória, carregando-o na primeira chamada"""
+        with self._trava_indice:
+            if self.indice_acesso is None:
+                self.indice_acesso = IndiceAcesso(self)
+            return self.indice_acesso
+
+    def _escrever_atletas(self, comando, *args):
+        """_escrever para comandos que alteram atletas; o índice de acesso é avisado
+
+        O avanço da versão de atletas é medido na mesma transação do comando,
+        para que sincronizar() não recarregue o índice por causa dele.
+        """
+        resultado, avanco = self._escrever(self._medir_versao_atletas, comando, *args)
+        if self.indice_acesso is not None:
+            self.indice_acesso.contar_escritas(avanco)
+        return resultado
+
+    def _medir_versao_atletas(self, conn, comando, *args):
+        # Fora do escritor único a transação é aberta aqui, para a leitura já travar a escrita
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        sql = "SELECT versao FROM versao_dados WHERE tabela = 'atletas'"
+        antes = conn.execute(sql).fetchone()[0]
+        resultado = comando(conn, *args)
+        return resultado, conn.execute(sql).fetchone()[0] - antes
+
+    def _atualizar_indice(self, atleta_id, data_vencimento):
+        if self.indice_acesso is not None:
+            self.indice_acesso.atualizar(atleta_id, data_vencimento)
+
+    def add_atleta(self, nome, telefone, email, data_nascimento, data_vencimento, plano, valor_plano, observacoes=""):
+        """Adiciona um novo atleta"""
+        data_nascimento = validar_data(data_nascimento, "data_nascimento")
+        data_vencimento = validar_data(data_vencimento, "data_vencimento")
+        valor_plano_centavos = para_centavos(valor_plano)
+
+        atleta_id = self._escrever_atletas(
+            self._add_atleta, nome, telefone, email, data_nascimento, data_vencimento,
+            plano, valor_plano_centavos, observacoes)
+
+        self._atualizar_indice(atleta_id, data_vencimento)
+        return atleta_id
+
+    def _add_atleta(self, conn, nome, telefone, email, data_nascimento, data_vencimento,
+                    plano, valor_plano_centavos, observacoes):
+        cursor = conn.execute('''
+            INSERT INTO atletas (nome, telefone, email, data_nascimento, data_vencimento, status,
+                                 plano, valor_plano, valor_plano_centavos, observacoes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (nome, telefone, email, data_nascimento, data_vencimento,
+              status_por_vencimento(data_vencimento), plano,
+              valor_plano_centavos / 100, valor_plano_centavos, observacoes))
+        return cursor.lastrowid
+
+    def update_atleta(self, atleta_id, nome, telefone, email, data_nascimento, data_vencimento, plano, valor_plano, observacoes,
+                      versao=None):
+        """Atualiza os dados de um atleta
+
+        Com `versao` (a lida junto com os dados exibidos), só grava se o atleta
+        não mudou desde então; retorna False em caso de conflito (ou atleta excluído).
+        """
+        data_nascimento = validar_data(data_nascimento, "data_nascimento")
+        data_vencimento = validar_data(data_vencimento, "data_vencimento")
+        valor_plano_centavos = para_centavos(valor_plano)
+
+        atualizado = self._escrever_atletas(
+            self._update_atleta, atleta_id, nome, telefone, email, data_nascimento,
+            data_vencimento, plano, valor_plano_centavos, observacoes, versao)
+        if not atualizado:
+            return False
+
+        self._atualizar_indice(atleta_id, data_vencimento)
+        return True
+
+    def _update_atleta(self, conn, atleta_id, nome, telefone, email, data_nascimento,
+                       data_vencimento, plano, valor_plano_centavos, observacoes, versao=None):
+        # A versão é conferida no próprio UPDATE: sem trava nem leitura extra
+        cursor = conn.execute('''
+            UPDATE atletas 
+            SET nome = ?, telefone = ?, email = ?, data_nascimento = ?, 
+                data_vencimento = ?, status = ?, plano = ?, valor_plano = ?,
+                valor_plano_centavos = ?, observacoes = ?, versao = versao + 1
+            WHERE id = ? AND (? IS NULL OR versao = ?)
+        ''', (nome, telefone, email, data_nascimento, data_vencimento,
+              status_por_vencimento(data_vencimento), plano,
+              valor_plano_centavos / 100, valor_plano_centavos, observacoes, atleta_id,
+              versao, versao))
+        return cursor.rowcount > 0
+
+    def excluir_atleta(self, atleta_id):
+        """Exclui um atleta, seus pagamentos e seus check-ins"""
+        self._escrever_atletas(self._excluir_atleta, atleta_id)
+
+        if self.indice_acesso is not None:
+            self.indice_acesso.remover(atleta_id)
+        return True
+
+    def _excluir_atleta(self, conn, atleta_id):
+        # Primeiro excluir pagamentos e check-ins (por causa da chave estrangeira)
+        conn.execute(
+            "DELETE FROM pagamentos WHERE atleta_id = ?", (atleta_id,))
+        conn.execute(
+            "DELETE FROM frequencia WHERE atleta_id = ?", (atleta_id,))
+        self.arquivo.descontar_atletas(conn, [atleta_id])
+
+        # Depois excluir o atleta
+        conn.execute("DELETE FROM atletas WHERE id = ?", (atleta_id,))
+
+    # Ações em massa: cada uma é um único comando sobre a seleção inteira. Os
+    # ids vão num só parâmetro (lista JSON lida por json_each), qualquer que
+    # seja o tamanho da seleção. Ação -> (SET do UPDATE ou None para excluir, filtro)
+    ACOES_EM_MASSA = {
+        'plano': ("plano = :plano", "arquivado = 0 AND plano IS NOT :plano"),
+        'reajuste': ('''
+            valor_plano_centavos = CAST(ROUND(valor_plano_centavos * (100 + :percentual) / 100.0) AS INTEGER),
+            valor_plano = CAST(ROUND(valor_plano_centavos * (100 + :percentual) / 100.0) AS INTEGER) / 100.0
+        ''', "arquivado = 0 AND valor_plano_centavos IS NOT NULL AND :percentual <> 0"),
+        'arquivar': ("arquivado = 1", "arquivado = 0"),
+        'excluir': (None, "1"),
+    }
+
+    def alterar_plano_em_massa(self, atleta_ids, plano, previa=False):
+        """Troca o plano dos atletas selecionados; retorna quantos mudaram"""
+        if plano not in MESES_PLANO:
+            raise ValueError(f"Plano deve ser um de: {', '.join(MESES_PLANO)}")
+        return self._em_massa('plano', atleta_ids, {'plano': plano}, previa)
+
+    def reajustar_valor_em_massa(self, atleta_ids, percentual, previa=False):
+        """Reajusta o valor do plano dos atletas selecionados em `percentual` %"""
+        percentual = float(percentual)
+        if percentual <= -100:
+            raise ValueError("O reajuste deve ser maior que -100%")
+        return self._em_massa('reajuste', atleta_ids, {'percentual': percentual}, previa)
+
+    def arquivar_atletas(self, atleta_ids, previa=False):
+        """Arquiva os atletas: somem da lista e da catraca, mas o histórico financeiro fica"""
+        return self._em_massa('arquivar', atleta_ids, {}, previa)
+
+    def excluir_atletas(self, atleta_ids, previa=False):
+        """Exclui os atletas selecionados com seus pagamentos e check-ins"""
+        return self._em_massa('excluir', atleta_ids, {}, previa)
+
+    def _em_massa(self, acao, atleta_ids, parametros, previa):
+        """Conta (previa=True) ou aplica a ação numa transação; retorna o número de atletas"""
+        atleta_ids = [int(atleta_id) for atleta_id in atleta_ids]
+        parametros = dict(parametros, ids=json.dumps(atleta_ids))
+        onde = f"id IN (SELECT value FROM json_each(:ids)) AND {self.ACOES_EM_MASSA[acao][1]}"
+
+        if previa:
+            conn = self.get_connection()
+            quantidade = conn.execute(
+                f"SELECT COUNT(*) FROM atletas WHERE {onde}", parametros).fetchone()[0]
+            conn.close()
+            return quantidade
+
+        quantidade = self._escrever_atletas(self._aplicar_em_massa, acao, onde, parametros)
+
+        if acao in ('arquivar', 'excluir') and self.indice_acesso is not None:
+            for atleta_id in atleta_ids:
+                self.indice_acesso.remover(atleta_id)
+        return quantidade
+
+    def _aplicar_em_massa(self, conn, acao, onde, parametros):
+        atribuicao = self.ACOES_EM_MASSA[acao][0]
+        if atribuicao is not None:
+            # Nova versão: formulários de edição abertos nesses atletas acusam conflito
+            return conn.execute(f'''
+                UPDATE atletas SET {atribuicao}, versao = versao + 1
+                WHERE {onde}
+            ''', parametros).rowcount
+
+        # Exclusão: primeiro o que referencia os atletas, como em _excluir_atleta
+        selecionados = f"SELECT id FROM atletas WHERE {onde}"
+        self.arquivo.descontar_atletas(
+            conn, [atleta_id for atleta_id, in conn.execute(selecionados, parametros)])
+        for tabela in ('pagamentos', 'frequencia'):
+            conn.execute(
+                f"DELETE FROM {tabela} WHERE atleta_id IN ({selecionados})", parametros)
+        return conn.execute(f"DELETE FROM atletas WHERE {onde}", parametros).rowcount
+
+    def get_all_atletas(self, incluir_arquivados=False):
+        """Retorna todos os atletas em formato compacto (observações ficam de fora)
+
+        Os arquivados só vêm com incluir_arquivados=True (histórico financeiro).
+        """
+        # Cópia: quem chama pode alterar o DataFrame sem afetar o cache
+        chave = 'atletas_com_arquivados' if incluir_arquivados else 'atletas'
+        return self.cache.obter(
+            chave, ['atletas'], lambda: self._ler_atletas(incluir_arquivados)).copy()
+
+    def _ler_atletas(self, incluir_arquivados=False):
+        conn = self.get_connection()
+        filtro = "" if incluir_arquivados else "WHERE arquivado = 0"
+        df = pd.read_sql(
+            f"SELECT {', '.join(COLUNAS_ATLETAS)} FROM atletas {filtro} ORDER BY nome", conn)
+        conn.close()
+        return compactar_atletas(df)
+
+    def get_observacoes(self, atleta_id):
+        """Retorna as observações de um atleta (carregadas sob demanda)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT observacoes FROM atletas WHERE id = ?", (atleta_id,))
+        result = cursor.fetchone()
+
+        conn.close()
+        return result[0] if result else None
+
+    def get_atleta_by_id(self, atleta_id):
+        """Retorna um atleta específico"""
+        conn = self.get_connection()
+        df = pd.read_sql("SELECT * FROM atletas WHERE id = ?",
+                         conn, params=(atleta_id,))
+        conn.close()
+        df['valor_plano'] = df['valor_plano_centavos'] / 100
+        return df.iloc[0] if not df.empty else None
+
+    def buscar_atletas(self, termo, limite=20):
+        """Procura atletas por nome, telefone ou email (lista de dicionários)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        padrao = f"%{termo}%"
+        cursor.execute(f'''
+            SELECT {', '.join(COLUNAS_ATLETAS)}
+            FROM atletas
+            WHERE (nome LIKE ? OR telefone LIKE ? OR email LIKE ?) AND arquivado = 0
+            ORDER BY nome
+            LIMIT ?
+        ''', (padrao, padrao, padrao, limite))
+        colunas = [c[0] for c in cursor.description]
+        atletas = [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+        conn.close()
+        return atletas
+
+    def verificar_acesso(self, atleta_id, hoje=None):
+        """Indica se o atleta pode entrar, consultando o banco (ver IndiceAcesso)
+
+        Retorna None se o atleta não existir (ou estiver arquivado).
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT id, nome, data_vencimento FROM atletas WHERE id = ? AND arquivado = 0", (atleta_id,))
+        result = cursor.fetchone()
+
+        conn.close()
+        if result is None:
+            return None
+
+        hoje = hoje or datetime.now().date()
+        _, nome, data_vencimento = result
+        status = status_por_vencimento(data_vencimento, hoje)
+
+        return {
+            'atleta_id': atleta_id,
+            'nome': nome,
+            'data_vencimento': data_vencimento,
+            'decisao': IndiceAcesso.DECISOES[status],
+            'status': status,
+            'dias_restantes': (date.fromisoformat(data_vencimento) - hoje).days
+            if data_vencimento else None
+        }
+
+    def update_atleta_status(self):
+        """Atualiza status dos atletas baseado na data de vencimento"""
+        self._escrever_atletas(self._update_atleta_status, datetime.now().date())
+
+    def _update_atleta_status(self, conn, hoje):
+
+        # Só regrava as linhas cujo status mudou, para não invalidar caches à toa
+        novo_status = '''
+            CASE 
+                WHEN data_vencimento < :hoje THEN 'vencido'
+                WHEN data_vencimento <= :limite_alerta THEN 'alerta'
+                ELSE 'ativo'
+            END
+        '''
+        conn.execute(f'''
+            UPDATE atletas SET status = {novo_status}
+            WHERE status IS NOT {novo_status} AND arquivado = 0
+        ''', {'hoje': hoje.isoformat(),
+              'limite_alerta': (hoje + timedelta(days=7)).isoformat()})
+
+    def criar_backup(self, pasta='backups', manter=7):
+        """Copia o banco para a pasta de backups e remove as cópias mais antigas"""
+        os.makedirs(pasta, exist_ok=True)
+        nome_base = os.path.splitext(os.path.basename(self.db_name))[0]
+        destino = os.path.join(
+            pasta, f"{nome_base}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
+
+        conn = self.get_connection()
+        conn_destino = sqlite3.connect(destino)
+        try:
+            conn.backup(conn_destino)
+        finally:
+            conn_destino.close()
+            conn.close()
+
+        backups = sorted(f for f in os.listdir(pasta)
+                         if f.startswith(f"{nome_base}_") and f.endswith('.db'))
+        for antigo in backups[:-manter]:
+            os.remove(os.path.join(pasta, antigo))
+
+        return destino
+
+    def otimizar_banco(self):
+        """Atualiza as estatísticas usadas pelo planejador de consultas"""
+        conn = self.get_connection()
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        conn.close()
+
+    def vacuum(self):
+        """Compacta o arquivo do banco, devolvendo páginas livres ao disco"""
+        conn = self.get_connection()
+        conn.execute("VACUUM")
+        conn.close()
+
+    def registrar_pagamento(self, atleta_id, data_pagamento, valor, mes_referencia, forma_pagamento, observacoes,
+                            chave_idempotencia=None):
+        """Registra um novo pagamento
+
+        Com `chave_idempotencia`, repetir a chamada (clique duplo, reenvio da
+        API) retorna o id do pagamento já gravado sem estender o vencimento.
+        """
+        data_pagamento = validar_data(data_pagamento, "data_pagamento")
+        mes_referencia = validar_mes(mes_referencia)
+        valor_centavos = para_centavos(valor)
+
+        pagamento_id, nova_data_vencimento = self._escrever_atletas(
+            self._registrar_pagamento, atleta_id, data_pagamento, valor_centavos,
+            mes_referencia, forma_pagamento, observacoes, chave_idempotencia)
+
+        if nova_data_vencimento is not None:
+            self._atualizar_indice(atleta_id, nova_data_vencimento)
+        return pagamento_id
+
+    def _registrar_pagamento(self, conn, atleta_id, data_pagamento, valor_centavos,
+                             mes_referencia, forma_pagamento, observacoes, chave_idempotencia=None):
+        """Insere o pagamento e estende o vencimento; retorna (id, novo vencimento ou None)"""
+        cursor = conn.cursor()
+
+        # Com particionamento, grava direto na partição do ano
+        tabela, pagamento_id = self.particoes.rotear(conn, data_pagamento)
+        cursor.execute(f'''
+            INSERT INTO {tabela} (id, atleta_id, data_pagamento, valor, valor_centavos,
+                                  mes_referencia, forma_pagamento, observacoes, chave_idempotencia)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (chave_idempotencia) DO NOTHING
+        ''', (pagamento_id, atleta_id, data_pagamento, valor_centavos / 100, valor_centavos,
+              mes_referencia, forma_pagamento, observacoes, chave_idempotencia))
+
+        # Chave repetida: o índice único barrou a inserção; só busca o id original
+        if cursor.rowcount == 0:
+            cursor.execute(
+                f"SELECT id FROM {tabela} WHERE chave_idempotencia = ?", (chave_idempotencia,))
+            return cursor.fetchone()[0], None
+        pagamento_id = cursor.lastrowid
+
+        # Atualizar data de vencimento do atleta
+        cursor.execute(
+            "SELECT plano, data_vencimento FROM atletas WHERE id = ?", (atleta_id,))
+        atleta = cursor.fetchone()
+        if atleta is None:
+            return pagamento_id, None
+
+        plano, data_vencimento = atleta
+
+        meses_adicional = MESES_PLANO.get(plano, 1)
+
+        data_base = datetime.now().date()
+        if data_vencimento:
+            data_base = max(
+                data_base, date.fromisoformat(data_vencimento))
+
+        nova_data_vencimento = data_base + \
+            timedelta(days=30 * meses_adicional)
+
+        nova_data_vencimento = nova_data_vencimento.strftime('%Y-%m-%d')
+        cursor.execute('''
+            UPDATE atletas SET data_vencimento = ?, status = ?, versao = versao + 1 WHERE id = ?
+        ''', (nova_data_vencimento, status_por_vencimento(nova_data_vencimento), atleta_id))
+        return pagamento_id, nova_data_vencimento
+
+    def get_pagamentos(self, atleta_id=None):
+        """Retorna pagamentos (inclusive os arquivados), opcionalmente filtrado por atleta"""
+        conn = self.get_connection()
+
+        colunas = '''
+            p.id, p.atleta_id, p.data_pagamento, p.valor_centavos / 100.0 AS valor,
+            p.mes_referencia, p.forma_pagamento, p.observacoes, a.nome as atleta_nome
+        '''
+
+        if atleta_id:
+            df = pd.read_sql(f'''
+                SELECT {colunas}
+                FROM pagamentos p 
+                JOIN atletas a ON p.atleta_id = a.id 
+                WHERE p.atleta_id = ?
+                ORDER BY p.data_pagamento DESC
+            ''', conn, params=(atleta_id,))
+        else:
+            df = pd.read_sql(f'''
+                SELECT {colunas}
+                FROM pagamentos p 
+                JOIN atletas a ON p.atleta_id = a.id 
+                ORDER BY p.data_pagamento DESC
+            ''', conn)
+
+        conn.close()
+
+        arquivados = self.arquivo.ler(atleta_id=atleta_id or None)
+        if not arquivados.empty:
+            arquivados = self._com_atletas(arquivados, {'nome': 'atleta_nome'})
+            arquivados['valor'] = arquivados.pop('valor_centavos') / 100
+            df = (arquivados[df.columns] if df.empty
+                  else pd.concat([df, arquivados[df.columns]], ignore_index=True))
+            df = df.sort_values('data_pagamento', ascending=False, ignore_index=True)
+
+        df['forma_pagamento'] = df['forma_pagamento'].astype('category')
+        return df
+
+    def _com_atletas(self, pagamentos, colunas, atletas=None):
+        """Junta pagamentos arquivados aos dados atuais dos atletas ({coluna: novo nome})
+
+        Como no JOIN das consultas da tabela, pagamentos de atletas excluídos ficam
+        de fora; os de atletas arquivados continuam. `atletas` reaproveita um
+        get_all_atletas(incluir_arquivados=True) já lido.
+        """
+        if atletas is None:
+            atletas = self.get_all_atletas(incluir_arquivados=True)
+        atletas = atletas[['id', *colunas]].rename(columns={'id': 'atleta_id', **colunas})
+        return pagamentos.merge(atletas.astype(object), on='atleta_id')
+
+    def get_relatorio_pagamentos(self, inicio, fim):
+        """Pagamentos com data em [inicio, fim] com nome, plano e status do atleta
+
+        Com particionamento, lê só as partições do período; quando ele alcança
+        anos arquivados, une o resultado aos arquivos Parquet desses anos (ver
+        ArquivoPagamentos.ler).
+        """
+        conn = self.get_connection()
+
+        df = pd.read_sql(f'''
+            SELECT
+                a.nome as atleta,
+                p.data_pagamento,
+                p.valor_centavos / 100.0 as valor,
+                p.mes_referencia,
+                p.forma_pagamento,
+                a.plano,
+                a.status
+            FROM {self.particoes.fonte(conn, inicio, fim, colunas=self.COLUNAS_RELATORIO)} p
+            JOIN atletas a ON p.atleta_id = a.id
+            WHERE p.data_pagamento BETWEEN ? AND ?
+            ORDER BY p.data_pagamento DESC
+        ''', conn, params=(inicio, fim))
+
+        conn.close()
+
+        arquivados = self.arquivo.ler(inicio, fim, colunas=[
+            'atleta_id', 'data_pagamento', 'valor_centavos', 'mes_referencia', 'forma_pagamento'])
+        if not arquivados.empty:
+            arquivados = self._com_atletas(
+                arquivados, {'nome': 'atleta', 'plano': 'plano', 'status': 'status'})
+            arquivados['valor'] = arquivados.pop('valor_centavos') / 100
+            df = (arquivados[df.columns] if df.empty
+                  else pd.concat([df, arquivados[df.columns]], ignore_index=True))
+            df = df.sort_values('data_pagamento', ascending=False, ignore_index=True)
+
+        return df
+
+    def buscar_pagamentos(self, atleta_id=None, mes_referencia=None, forma_pagamento=None,
+                          limite=50, offset=0):
+        """Retorna uma página dos pagamentos filtrados e os totais do filtro
+
+        Os filtros são aplicados no SQL; página e totais (quantidade e valor)
+        saem da mesma consulta, então só a página trafega para o pandas.
+        Pagamentos de anos arquivados entram nos totais pelos resumos (ver
+        ArquivoPagamentos.totais) e só são lidos quando a página passa dos
+        pagamentos da tabela mais recentes que o arquivo; nesse caso lê apenas
+        os mais recentes necessários, do fim do arquivo para trás.
+        """
+        filtros, params = [], {'offset': offset, 'fim': offset + limite}
+        if atleta_id:
+            filtros.append("atleta_id = :atleta_id")
+            params['atleta_id'] = atleta_id
+        if mes_referencia:
+            filtros.append("mes_referencia = :mes_referencia")
+            params['mes_referencia'] = validar_mes(mes_referencia)
+        if forma_pagamento:
+            filtros.append("forma_pagamento = :forma_pagamento")
+            params['forma_pagamento'] = forma_pagamento
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+
+        # Pagamentos da tabela a partir da fronteira vêm antes de qualquer
+        # arquivado: os que ficam antes da página são pulados no próprio SQL
+        fronteira = self.arquivo.fronteira()
+        params['fronteira'] = fronteira or ''
+
+        conn = self.get_connection()
+
+        df = pd.read_sql(f'''
+            WITH totais AS (
+                SELECT COUNT(*) AS total_pagamentos,
+                       COALESCE(SUM(valor_centavos), 0) / 100.0 AS valor_total,
+                       COALESCE(SUM(data_pagamento >= :fronteira), 0) AS recentes
+                FROM pagamentos
+                {where}
+            ),
+            pulados AS (
+                SELECT MIN(:offset, recentes) AS pulados FROM totais
+            ),
+            pagina AS (
+                SELECT id, atleta_id, data_pagamento, valor_centavos / 100.0 AS valor,
+                       mes_referencia, forma_pagamento
+                FROM pagamentos
+                {where}
+                ORDER BY data_pagamento DESC, id DESC
+                LIMIT :fim - (SELECT pulados FROM pulados) OFFSET (SELECT pulados FROM pulados)
+            )
+            SELECT pagina.id, pagina.atleta_id, a.nome AS atleta_nome, pagina.data_pagamento,
+                   pagina.valor, pagina.mes_referencia, pagina.forma_pagamento,
+                   totais.*, pulados.pulados
+            FROM totais
+            JOIN pulados ON 1
+            LEFT JOIN pagina ON 1
+            LEFT JOIN atletas a ON a.id = pagina.atleta_id
+            ORDER BY pagina.data_pagamento DESC, pagina.id DESC
+        ''', conn, params=params)
+
+        conn.close()
+
+        totais = {
+            'total_pagamentos': int(df['total_pagamentos'].iloc[0]),
+            'valor_total': float(df['valor_total'].iloc[0])
+        }
+        recentes, pulados = int(df['recentes'].iloc[0]), int(df['pulados'].iloc[0])
+        pagina = df.drop(columns=['total_pagamentos', 'valor_total', 'recentes', 'pulados']
+                         ).dropna(subset=['id'])
+
+        if fronteira:
+            quantidade, centavos = self.arquivo.totais(
+                atleta_id or None, params.get('mes_referencia'), forma_pagamento or None)
+            totais['total_pagamentos'] += quantidade
+            totais['valor_total'] += centavos / 100
+            if recentes < params['fim'] and quantidade:
+                arquivados = self._arquivados_recentes(
+                    params['fim'] - recentes, atleta_id or None,
+                    params.get('mes_referencia'), forma_pagamento or None)
+                if not arquivados.empty:
+                    pagina = (arquivados[pagina.columns] if pagina.empty
+                              else pd.concat([pagina, arquivados[pagina.columns]],
+                                             ignore_index=True))
+                    pagina = pagina.sort_values(['data_pagamento', 'id'], ascending=False,
+                                                ignore_index=True)
+
+        pagina = pagina.iloc[offset - pulados:params['fim'] - pulados].reset_index(drop=True)
+        totais['valor_medio'] = (totais['valor_total'] / totais['total_pagamentos']
+                                 if totais['total_pagamentos'] else 0.0)
+        return pagina.astype({'id': int, 'atleta_id': int}), totais
+
+    def _arquivados_recentes(self, quantidade, atleta_id, mes_referencia, forma_pagamento):
+        """Os `quantidade` pagamentos arquivados mais recentes do filtro, com o nome do atleta"""
+        atletas = self.get_all_atletas(incluir_arquivados=True)
+        blocos, lidos = [], 0
+        for bloco in self.arquivo.ler_recentes(
+                ['id', 'atleta_id', 'data_pagamento', 'valor_centavos',
+                 'mes_referencia', 'forma_pagamento'],
+                atleta_id, mes_referencia, forma_pagamento):
+            bloco = self._com_atletas(bloco, {'nome': 'atleta_nome'}, atletas)
+            blocos.append(bloco)
+            lidos += len(bloco)
+            if lidos >= quantidade:
+                break
+        if not blocos:
+            return pd.DataFrame()
+        # O merge com os atletas não preserva a ordem dentro do bloco
+        arquivados = pd.concat(blocos, ignore_index=True).sort_values(
+            ['data_pagamento', 'id'], ascending=False, ignore_index=True).head(quantidade)
+        arquivados['valor'] = arquivados.pop('valor_centavos') / 100
+        return arquivados
+
+    def get_historico_pagamentos_atleta(self, atleta_id, limite=20, cursor=None):
+        """Retorna uma página do histórico do atleta, o resumo e o cursor da próxima página
+
+        Paginação por chave (keyset): `cursor` é o (data_pagamento, id) do último
+        pagamento da página anterior, e a página seguinte começa logo depois dele
+        no índice idx_pagamentos_atleta_data. O resumo (total pago, quantidade e
+        último pagamento) sai da mesma consulta; o custo depende só dos
+        pagamentos do atleta, não do tamanho da tabela. Se o atleta tem anos
+        arquivados, o resumo soma pagamentos_arquivados_por_atleta e o Parquet
+        só é lido quando a página (ou o último pagamento) alcança esses anos.
+        """
+        depois_do_cursor = "AND (data_pagamento, id) < (:data_cursor, :id_cursor)" if cursor else ""
+        data_cursor, id_cursor = cursor or (None, None)
+        conn = self.get_connection()
+
+        df = pd.read_sql(f'''
+            WITH resumo AS (
+                SELECT COUNT(*) AS total_pagamentos,
+                       COALESCE(SUM(valor_centavos), 0) / 100.0 AS valor_total
+                FROM pagamentos
+                WHERE atleta_id = :atleta_id
+            ),
+            ultimo AS (
+                SELECT data_pagamento AS ultimo_pagamento,
+                       valor_centavos / 100.0 AS ultimo_valor
+                FROM pagamentos
+                WHERE atleta_id = :atleta_id
+                ORDER BY data_pagamento DESC, id DESC
+                LIMIT 1
+            ),
+            pagina AS (
+                SELECT id, data_pagamento, valor_centavos / 100.0 AS valor,
+                       mes_referencia, forma_pagamento, observacoes
+                FROM pagamentos
+                WHERE atleta_id = :atleta_id {depois_do_cursor}
+                ORDER BY data_pagamento DESC, id DESC
+                LIMIT :limite
+            )
+            SELECT pagina.*, resumo.*, ultimo.*,
+                   arquivado.quantidade AS arquivados, arquivado.soma_centavos AS arquivados_centavos,
+                   arquivado.ultimo_pagamento AS ultimo_arquivado
+            FROM resumo
+            LEFT JOIN ultimo ON 1
+            LEFT JOIN pagamentos_arquivados_por_atleta arquivado ON arquivado.atleta_id = :atleta_id
+            LEFT JOIN pagina ON 1
+            ORDER BY pagina.data_pagamento DESC, pagina.id DESC
+        ''', conn, params={'atleta_id': atleta_id, 'limite': limite + 1,
+                            'data_cursor': data_cursor, 'id_cursor': id_cursor})
+
+        conn.close()
+
+        colunas_resumo = ['total_pagamentos', 'valor_total', 'ultimo_pagamento', 'ultimo_valor']
+        colunas_arquivo = ['arquivados', 'arquivados_centavos', 'ultimo_arquivado']
+        resumo = df.iloc[0][colunas_resumo].to_dict()
+        arquivado = df.iloc[0][colunas_arquivo]
+        pagina = df.drop(columns=colunas_resumo + colunas_arquivo).dropna(subset=['id'])
+        pagina = pagina.astype({'id': int})
+
+        if pd.notna(arquivado['arquivados']):
+            resumo['total_pagamentos'] = int(resumo['total_pagamentos'] + arquivado['arquivados'])
+            resumo['valor_total'] += arquivado['arquivados_centavos'] / 100
+            # Página cheia e toda mais nova que o arquivo: não precisa abrir o Parquet
+            pagina_alcanca = (len(pagina) <= limite
+                              or pagina['data_pagamento'].iloc[-1] <= arquivado['ultimo_arquivado'])
+            ultimo_no_arquivo = (pd.isna(resumo['ultimo_pagamento'])
+                                 or arquivado['ultimo_arquivado'] >= resumo['ultimo_pagamento'])
+            if pagina_alcanca or ultimo_no_arquivo:
+                pagina, resumo = self._historico_com_arquivo(
+                    atleta_id, pagina, resumo, limite, cursor)
+
+        # Uma linha a mais indica que existe próxima página
+        proximo_cursor = None
+        if len(pagina) > limite:
+            pagina = pagina.head(limite)
+            proximo_cursor = (pagina['data_pagamento'].iloc[-1], int(pagina['id'].iloc[-1]))
+
+        return pagina, resumo, proximo_cursor
+
+    def _historico_com_arquivo(self, atleta_id, pagina, resumo, limite, cursor):
+        """Une à página do histórico os pagamentos arquivados do atleta (limite + 1 linhas)"""
+        arquivados = self.arquivo.ler(atleta_id=atleta_id, colunas=[
+            'id', 'data_pagamento', 'valor_centavos', 'mes_referencia',
+            'forma_pagamento', 'observacoes'])
+        arquivados['valor'] = arquivados.pop('valor_centavos') / 100
+        arquivados = arquivados.sort_values(['data_pagamento', 'id'], ascending=False,
+                                            ignore_index=True)
+
+        mais_recente = arquivados.iloc[0] if not arquivados.empty else None
+        if mais_recente is not None and (pd.isna(resumo['ultimo_pagamento'])
+                                         or mais_recente['data_pagamento'] > resumo['ultimo_pagamento']):
+            resumo['ultimo_pagamento'] = mais_recente['data_pagamento']
+            resumo['ultimo_valor'] = mais_recente['valor']
+
+        if cursor:
+            data_cursor, id_cursor = cursor
+            arquivados = arquivados[(arquivados['data_pagamento'] < data_cursor)
+                                    | ((arquivados['data_pagamento'] == data_cursor)
+                                       & (arquivados['id'] < id_cursor))]
+        pagina = (arquivados[pagina.columns] if pagina.empty
+                  else pd.concat([pagina, arquivados[pagina.columns]], ignore_index=True))
+        pagina = pagina.sort_values(['data_pagamento', 'id'], ascending=False,
+                                    ignore_index=True).head(limite + 1)
+        return pagina, resumo
+
+    def get_receita_top_atletas(self, limite=10):
+        """Retorna os N atletas com maior receita e um grupo 'Outros' com o restante"""
+        return self._consultar(('receita_top_atletas', limite), ['atletas', 'pagamentos'],
+                               lambda: self._ler_receita_top_atletas(limite)).copy()
+
+    def _ler_receita_top_atletas(self, limite):
+        conn = self.get_connection()
+
+        df = pd.read_sql('''
+            WITH receita AS (
+                SELECT p.atleta_id, a.nome, SUM(p.centavos) / 100.0 AS valor
+                FROM (
+                    SELECT atleta_id, valor_centavos AS centavos FROM pagamentos
+                    UNION ALL
+                    SELECT atleta_id, soma_centavos FROM pagamentos_arquivados_por_atleta
+                ) p
+                JOIN atletas a ON a.id = p.atleta_id
+                GROUP BY p.atleta_id
+            ),
+            ranking AS (
+                SELECT atleta_id, nome, valor,
+                       ROW_NUMBER() OVER (ORDER BY valor DESC, atleta_id) AS posicao
+                FROM receita
+            )
+            SELECT posicao, atleta_id, nome || ' (#' || atleta_id || ')' AS rotulo, valor
+            FROM ranking
+            WHERE posicao <= :limite
+            UNION ALL
+            SELECT :limite + 1, NULL, 'Outros', outros.valor
+            FROM (
+                SELECT COUNT(*) AS atletas, SUM(valor) AS valor
+                FROM ranking
+                WHERE posicao > :limite
+            ) outros
+            WHERE outros.atletas > 0
+            ORDER BY posicao
+        ''', conn, params={'limite': limite})
+
+        conn.close()
+        return df
+
+    def get_ranking_receita(self, limite=20, offset=0):
+        """Retorna uma página do ranking de receita por atleta e o total de atletas"""
+        df, total = self._consultar(('ranking_receita', limite, offset), ['atletas', 'pagamentos'],
+                                    lambda: self._ler_ranking_receita(limite, offset))
+        return df.copy(), total
+
+    def _ler_ranking_receita(self, limite, offset):
+        conn = self.get_connection()
+
+        df = pd.read_sql('''
+            SELECT ROW_NUMBER() OVER (ORDER BY SUM(p.centavos) DESC, p.atleta_id) AS posicao,
+                   p.atleta_id,
+                   a.nome AS atleta_nome,
+                   SUM(p.centavos) / 100.0 AS valor,
+                   SUM(p.quantidade) AS total_pagamentos,
+                   COUNT(*) OVER () AS total_atletas
+            FROM (
+                SELECT atleta_id, valor_centavos AS centavos, 1 AS quantidade FROM pagamentos
+                UNION ALL
+                SELECT atleta_id, soma_centavos, quantidade FROM pagamentos_arquivados_por_atleta
+            ) p
+            JOIN atletas a ON a.id = p.atleta_id
+            GROUP BY p.atleta_id
+            ORDER BY posicao
+            LIMIT ? OFFSET ?
+        ''', conn, params=(limite, offset))
+
+        conn.close()
+
+        total = int(df['total_atletas'].iloc[0]) if not df.empty else 0
+        return df.drop(columns='total_atletas'), total
+
+    def get_estatisticas_avancadas(self):
+        """Retorna estatísticas avançadas para dashboard"""
+        # Os meses e as faixas de vencimento dependem do dia
+        estatisticas = self._consultar(
+            ('estatisticas', datetime.now().date().isoformat()),
+            ['atletas', 'pagamentos'], self._calcular_estatisticas)
+        return {**estatisticas, 'receita_12_meses': estatisticas['receita_12_meses'].copy()}
+
+    # Colunas lidas das partições pelas consultas por período
+    COLUNAS_RECEITA = ('data_pagamento', 'valor_centavos')
+    COLUNAS_RELATORIO = ('atleta_id', 'data_pagamento', 'valor_centavos',
+                         'mes_referencia', 'forma_pagamento')
+
+    def _calcular_estatisticas(self):
+        conn = self.get_connection()
+
+        # Receita do mês atual (somada em cêntimos sobre o índice de data)
+        mes_atual = datetime.now().strftime('%Y-%m')
+        periodo = intervalo_mes(mes_atual)
+        df_receita_mes = pd.read_sql(f'''
+            SELECT SUM(valor_centavos) as receita_mes_atual
+            FROM {self.particoes.fonte(conn, *periodo, colunas=self.COLUNAS_RECEITA)}
+            WHERE data_pagamento >= ? AND data_pagamento < ?
+        ''', conn, params=periodo)
+
+        # Receita mês anterior
+        mes_anterior = (datetime.now().replace(day=1) -
+                        timedelta(days=1)).strftime('%Y-%m')
+        periodo = intervalo_mes(mes_anterior)
+        df_receita_mes_anterior = pd.read_sql(f'''
+            SELECT SUM(valor_centavos) as receita_mes_anterior
+            FROM {self.particoes.fonte(conn, *periodo, colunas=self.COLUNAS_RECEITA)}
+            WHERE data_pagamento >= ? AND data_pagamento < ?
+        ''', conn, params=periodo)
+
+        # Receita últimos 12 meses (agregada em cada partição, do ano passado em diante)
+        df_receita_12_meses = pd.read_sql(self.particoes.por_particao(conn, '''
+            SELECT substr(data_pagamento, 1, 7) as mes,
+                   SUM(valor_centavos) / 100.0 as receita_mensal,
+                   COUNT(*) as total_pagamentos
+            FROM {tabela}
+            WHERE data_pagamento >= date('now', '-12 months')
+            GROUP BY mes
+        ''', f"{datetime.now().year - 1}-01-01") + " ORDER BY mes", conn)
+
+        conn.close()
+
+        # Estatísticas de atletas (lidas dos buckets de vencimento, sem varrer atletas)
+        buckets = self.get_buckets_vencimento()
+        total_atletas = sum(quantidade for quantidade, _ in buckets.values())
+        soma_planos = sum(soma for _, soma in buckets.values())
+
+        receita_mes_atual = (
+            df_receita_mes.iloc[0]['receita_mes_atual'] or 0) / 100
+        receita_mes_anterior = (
+            df_receita_mes_anterior.iloc[0]['receita_mes_anterior'] or 0) / 100
+
+        # Calcular crescimento
+        crescimento = 0
+        if receita_mes_anterior > 0:
+            crescimento = (
+                (receita_mes_atual - receita_mes_anterior) / receita_mes_anterior) * 100
+
+        return {
+            'receita_mes_atual': receita_mes_atual,
+            'receita_mes_anterior': receita_mes_anterior,
+            'crescimento': crescimento,
+            'receita_12_meses': df_receita_12_meses,
+            'total_atletas': total_atletas,
+            'ativos': buckets['ativo'][0] + buckets['renovacao'][0],
+            'vencidos': buckets['vencido'][0],
+            'alertas': buckets['alerta'][0],
+            'a_vencer_30': buckets['renovacao'][0],
+            'ticket_medio': soma_planos / total_atletas / 100 if total_atletas else 0
+        }
+
+    def get_frequencia_diaria(self, dias=30):
+        """Retorna o total de check-ins por dia nos últimos `dias` dias"""
+        inicio = (datetime.now().date() - timedelta(days=dias - 1)).isoformat()
+        return self.cache.obter(('frequencia_diaria', inicio), ['frequencia'],
+                                lambda: self._ler_frequencia_diaria(inicio)).copy()
+
+    def _ler_frequencia_diaria(self, inicio):
+        conn = self.get_connection()
+
+        df = pd.read_sql('''
+            SELECT dia, SUM(total) AS total
+            FROM frequencia_por_hora
+            WHERE dia >= ?
+            GROUP BY dia
+            ORDER BY dia
+        ''', conn, params=(inicio,))
+
+        conn.close()
+        return df
+
+    def get_horarios_pico(self, dias=30):
+        """Retorna a média de check-ins por dia da semana (0 = domingo) e hora"""
+        inicio = datetime.now().date() - timedelta(days=dias - 1)
+        conn = self.get_connection()
+
+        df = pd.read_sql('''
+            SELECT CAST(strftime('%w', dia) AS INTEGER) AS dia_semana, hora,
+                   SUM(total) AS total
+            FROM frequencia_por_hora
+            WHERE dia >= ?
+            GROUP BY dia_semana, hora
+        ''', conn, params=(inicio.isoformat(),))
+
+        conn.close()
+
+        # Quantas vezes cada dia da semana aparece no período
+        ocorrencias = ((pd.date_range(inicio, periods=dias).dayofweek + 1) % 7).value_counts()
+        df['media'] = df['total'] / df['dia_semana'].map(ocorrencias)
+        return df
+
+    def get_historico_coortes(self, mes_limite):
+        """Retorna atletas (id, mês de cadastro, plano) e pagamentos (atleta, mês) anteriores a mes_limite
+
+        Os meses vêm como inteiros (ano * 12 + mês - 1), já convertidos no SQLite.
+        """
+        conn = self.get_connection()
+
+        indice = "CAST(substr({0}, 1, 4) AS INTEGER) * 12 + CAST(substr({0}, 6, 2) AS INTEGER) - 1"
+        mes_pagamento = "COALESCE(mes_referencia, substr(data_pagamento, 1, 7))"
+
+        atletas = pd.read_sql(f'''
+            SELECT id, {indice.format('data_cadastro')} AS mes_cadastro, plano
+            FROM atletas
+            WHERE data_cadastro < ?
+        ''', conn, params=(f"{mes_limite}-01",))
+
+        pagamentos = pd.read_sql(f'''
+            SELECT atleta_id, {indice.format(mes_pagamento)} AS mes
+            FROM pagamentos
+            WHERE {mes_pagamento} < ?
+        ''', conn, params=(mes_limite,))
+
+        conn.close()
+
+        arquivados = self.arquivo.ler(colunas=['atleta_id', 'data_pagamento', 'mes_referencia'])
+        if not arquivados.empty:
+            mes = arquivados['mes_referencia'].fillna(arquivados['data_pagamento'].str[:7])
+            arquivados = arquivados[mes < mes_limite]
+            mes = mes[mes < mes_limite]
+            pagamentos = pd.concat([pagamentos, pd.DataFrame({
+                'atleta_id': arquivados['atleta_id'],
+                'mes': mes.str[:4].astype(int) * 12 + mes.str[5:7].astype(int) - 1
+            })], ignore_index=True)
+
+        return atletas, pagamentos
+
+    def get_receita_mensal_historica(self, ate):
+        """Receita por mês antes da data `ate`, em cêntimos: total e de primeiros pagamentos
+
+        Os meses arquivados vêm do resumo gravado no arquivamento; atletas com
+        pagamentos arquivados não contam mais como novos na tabela.
+        """
+        conn = self.get_connection()
+
+        df = pd.read_sql('''
+            SELECT mes, SUM(total_centavos) AS total_centavos, SUM(novos_centavos) AS novos_centavos
+            FROM (
+                SELECT substr(data_pagamento, 1, 7) AS mes,
+                       SUM(valor_centavos) AS total_centavos,
+                       SUM(CASE WHEN id IN (SELECT MIN(id) FROM pagamentos GROUP BY atleta_id)
+                                 AND atleta_id NOT IN (
+                                     SELECT atleta_id FROM pagamentos_arquivados_por_atleta)
+                                THEN valor_centavos ELSE 0 END) AS novos_centavos
+                FROM pagamentos
+                WHERE data_pagamento < :ate
+                GROUP BY 1
+                UNION ALL
+                SELECT mes, total_centavos, novos_centavos
+                FROM pagamentos_arquivados_por_mes
+                WHERE mes < substr(:ate, 1, 7)
+            )
+            GROUP BY mes
+            ORDER BY mes
+        ''', conn, params={'ate': ate})
+
+        conn.close()
+        return df
+
+    def get_vencimentos_previstos(self, inicio, fim):
+        """Atletas com vencimento em [inicio, fim): data, plano e valor do plano em cêntimos"""
+        conn = self.get_connection()
+
+        df = pd.read_sql('''
+            SELECT data_vencimento, plano, valor_plano_centavos
+            FROM atletas
+            WHERE data_vencimento >= ? AND data_vencimento < ? AND arquivado = 0
+        ''', conn, params=(inicio, fim))
+
+        conn.close()
+        return df
+
+    def get_aging_recebiveis(self, hoje=None):
+        """Resumo da inadimplência por faixa de atraso: atletas e valor em aberto (KZ)
+
+        Lê o histograma vencimentos_por_dia (uma linha por dia de vencimento),
+        então o custo não depende do número de atletas.
+        """
+        hoje = (hoje or datetime.now().date()).isoformat()
+        conn = self.get_connection()
+
+        df = pd.read_sql(f'''
+            SELECT {sql_faixa_atraso('data_vencimento', ':hoje')} AS faixa,
+                   SUM(quantidade) AS atletas,
+                   SUM(soma_valor_plano_centavos) / 100.0 AS valor_em_aberto
+            FROM vencimentos_por_dia
+            WHERE data_vencimento <> '' AND data_vencimento < :hoje AND quantidade > 0
+            GROUP BY faixa
+        ''', conn, params={'hoje': hoje})
+
+        conn.close()
+        return (df.set_index('faixa')
+                .reindex(list(FAIXAS_ATRASO), fill_value=0)
+                .rename_axis('faixa').reset_index())
+
+    def get_recebiveis_em_atraso(self, faixa=None, hoje=None):
+        """Atletas com plano vencido (todas as faixas ou só `faixa`), mais antigos primeiro"""
+        hoje = hoje or datetime.now().date()
+        menor, maior = FAIXAS_ATRASO[faixa] if faixa else (1, None)
+        ate = (hoje - timedelta(days=menor - 1)).isoformat()
+        desde = (hoje - timedelta(days=maior + 1)).isoformat() if maior else ''
+        conn = self.get_connection()
+
+        # Intervalo em data_vencimento: percorre só o trecho do índice em atraso
+        df = pd.read_sql(f'''
+            SELECT id, nome, telefone, email, plano, data_vencimento,
+                   CAST(julianday(:hoje) - julianday(data_vencimento) AS INTEGER) AS dias_atraso,
+                   {sql_faixa_atraso('data_vencimento', ':hoje')} AS faixa,
+                   valor_plano_centavos / 100.0 AS valor_em_aberto
+            FROM atletas
+            WHERE data_vencimento > :desde AND data_vencimento < :ate AND arquivado = 0
+            ORDER BY data_vencimento, id
+        ''', conn, params={'hoje': hoje.isoformat(), 'desde': desde, 'ate': ate})
+
+        conn.close()
+        return df
+
+    def get_cache_coortes(self, mes):
+        """Retorna o resultado em cache (JSON) da análise de coortes do mês, ou None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT resultado FROM cache_coortes WHERE mes = ?", (mes,))
+        result = cursor.fetchone()
+
+        conn.close()
+        return result[0] if result else None
+
+    def set_cache_coortes(self, mes, resultado, versao=None):
+        """Guarda o resultado (JSON) da análise de coortes do mês; retorna se gravou
+
+        Com `versao` (a de 'cache_coortes' lida antes do cálculo), é um
+        compare-and-set: não grava se alguma invalidação aconteceu desde então.
+        """
+        return self._escrever(self._set_cache_coortes, mes, resultado, versao)
+
+    def _set_cache_coortes(self, conn, mes, resultado, versao):
+        # Comparação e gravação num só comando: nenhuma invalidação passa no meio
+        gravou = conn.execute('''
+            INSERT OR REPLACE INTO cache_coortes (mes, resultado)
+            SELECT :mes, :resultado
+            WHERE :versao IS NULL
+               OR :versao = (SELECT versao FROM versao_dados WHERE tabela = 'cache_coortes')
+        ''', {'mes': mes, 'resultado': resultado, 'versao': versao}).rowcount > 0
+        if gravou:
+            conn.execute("DELETE FROM cache_coortes WHERE mes <> ?", (mes,))
+        return gravou
+
+    def get_meta_receita(self):
+        """Retorna a meta de receita mensal"""
+        return self.cache.obter('meta_receita', ['configuracoes'], self._ler_meta_receita)
+
+    def _ler_meta_receita(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT valor FROM configuracoes WHERE chave = 'meta_receita_mensal'")
+        result = cursor.fetchone()
+
+        conn.close()
+
+        return float(result[0]) if result else 500000.0
+
+    def set_meta_receita(self, valor):
+        """Define a meta de receita mensal"""
+        self._escrever(self._set_meta_receita, str(valor))
+
+    def _set_meta_receita(self, conn, valor):
+        conn.execute('''
+            INSERT OR REPLACE INTO configuracoes (chave, valor, data_atualizacao)
+            VALUES ('meta_receita_mensal', ?, CURRENT_DATE)
+        ''', (valor,))
+
+    def get_notificacoes(self):
+        """Retorna notificações do sistema"""
+        conn = self.get_connection()
+
+        hoje = datetime.now().date()
+
+        # Notificações de vencimento
+        df_alertas = pd.read_sql('''
+            SELECT nome, data_vencimento, status
+            FROM atletas 
+            WHERE data_vencimento <= ?
+            AND status != 'vencido'
+            AND arquivado = 0
+            ORDER BY data_vencimento ASC
+        ''', conn, params=((hoje + timedelta(days=7)).isoformat(),))
+
+        notificacoes = []
+
+        # Notificações de vencimento
+        for _, atleta in df_alertas.iterrows():
+            dias_vencimento = (date.fromisoformat(
+                atleta['data_vencimento']) - hoje).days
+            if dias_vencimento < 0:
+                notificacoes.append(f"❌ {atleta['nome']} - Vencido")
+            elif dias_vencimento == 0:
+                notificacoes.append(f"⚠️ {atleta['nome']} - Vence hoje!")
+            else:
+                notificacoes.append(
+                    f"🔔 {atleta['nome']} - Vence em {dias_vencimento} dias")
+
+        # Notificação de meta (se houver dados)
+        stats = self.get_estatisticas_avancadas()
+        meta = self.get_meta_receita()
+        receita_atual = stats['receita_mes_atual']
+
+        if receita_atual > 0:
+            percentual_meta = (receita_atual / meta) * 100
+            if percentual_meta >= 100:
+                notificacoes.append(
+                    f"🎯 Meta mensal atingida! ({percentual_meta:.1f}%)")
+            elif percentual_meta >= 80:
+                notificacoes.append(f"📈 Meta mensal: {percentual_meta:.1f}%")
+
+        conn.close()
+        return notificacoes
@@ -0,0 +1,129 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+# Escritor único: todas as escritas do processo passam por uma thread
+
+
+class EscritorUnico:
+    """Executa comandos de escrita numa thread dedicada, com commit em grupo
+
+    executar() enfileira `comando(conn, *args)` e devolve um Future. A thread
+    pega o primeiro comando da fila e junta os que chegaram enquanto a
+    transação anterior era gravada (até `tamanho_lote`), executando todos numa
+    única transação; cada comando roda num SAVEPOINT próprio, então o erro de
+    um não desfaz os outros. Os Futures só recebem o resultado depois do
+    COMMIT. Como só esta thread escreve, as sessões do Streamlit não disputam
+    a trava de escrita do SQLite entre si, e as leituras seguem pelo pool.
+
+    Os comandos não devem chamar commit/rollback. A thread é iniciada sob
+    demanda e parar() a encerra (um novo executar() a inicia de novo).
+    """
+
+    def __init__(self, db_name, tamanho_lote=64, timeout=30):
+        self.db_name = db_name
+        self.tamanho_lote = tamanho_lote
+        self.timeout = timeout
+        self.transacoes = 0
+        self.comandos = 0
+        self._fila = None
+        self._trava = threading.Lock()
+        self._thread = None
+        self._local = threading.local()
+
+    def executar(self, comando, *args):
+        """Enfileira o comando e retorna um Future com o resultado (ou a exceção)"""
+        futuro = Future()
+        # Comando chamado de dentro de outro comando: roda na transação atual
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                futuro.set_result(comando(conn, *args))
+            except Exception as e:
+                futuro.set_exception(e)
+            return futuro
+
+        with self._trava:
+            if self._thread is None:
+                # Fila própria por thread: uma thread sendo encerrada não pega comandos da nova
+                self._fila = queue.Queue()
+                self._thread = threading.Thread(
+                    target=self._loop, args=(self._fila,), name="escritor", daemon=True)
+                self._thread.start()
+            self._fila.put((comando, args, futuro))
+        return futuro
+
+    def pendentes(self):
+        """Comandos na fila ainda não executados"""
+        return self._fila.qsize() if self._fila is not None else 0
+
+    def parar(self):
+        """Executa o que estiver na fila e encerra a thread"""
+        with self._trava:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._fila.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _coletar(self, fila):
+        """Espera o primeiro comando e junta os que já estão na fila; None encerra"""
+        lote = [fila.get()]
+        while lote[-1] is not None and len(lote) < self.tamanho_lote:
+            try:
+                lote.append(fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _gravar(self, conn, lote):
+        resultados = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for comando, args, futuro in lote:
+                if not futuro.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT comando")
+                try:
+                    resultados.append((futuro, comando(conn, *args), None))
+                    conn.execute("RELEASE comando")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO comando")
+                    conn.execute("RELEASE comando")
+                    resultados.append((futuro, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Falha da transação (banco ocupado por outro processo etc.): todos recebem o erro
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        self.transacoes += 1
+        self.comandos += len(resultados)
+        for futuro, resultado, erro in resultados:
+            if erro is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(erro)
+
+    def _loop(self, fila):
+        # Autocommit: as transações e savepoints são controlados explicitamente
+        conn = sqlite3.connect(self.db_name, timeout=self.timeout, isolation_level=None)
+        self._local.conn = conn
+        try:
+            while True:
+                lote = self._coletar(fila)
+                encerrar = lote[-1] is None
+                if encerrar:
+                    lote.pop()
+                if lote:
+                    self._gravar(conn, lote)
+                if encerrar:
+                    return
+        finally:
+            self._local.conn = None
+            conn.close()
@@ -0,0 +1,231 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import pandas as pd
+
+from database import DatabaseManager
+from frequencia import RegistradorFrequencia
+
+# Roteamento de filiais: cada academia da rede tem o seu arquivo SQLite
+
+
+def _slug(nome):
+    """Converte o nome da filial num nome de arquivo seguro"""
+    texto = unicodedata.normalize('NFKD', nome).encode(
+        'ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '_', texto.lower()).strip('_') or 'filial'
+
+
+class RoteadorFiliais:
+    """Mapeia cada filial para o seu DatabaseManager
+
+    Os bancos das filiais são abertos sob demanda e ficam num cache LRU; quando
+    há mais de `max_abertas` filiais abertas, ou uma filial fica ociosa por
+    mais de `ociosidade_maxima` segundos, o pool de conexões dela é fechado.
+    O cadastro das filiais fica no banco principal, junto com os usuários.
+    O índice de acesso de uma filial é descartado junto com o seu banco.
+    """
+
+    def __init__(self, db_name='academia.db', pasta='filiais', max_abertas=8,
+                 ociosidade_maxima=900, tamanho_pool=5, cache_disco=None):
+        self.db_name = db_name
+        self.pasta = pasta
+        self.max_abertas = max_abertas
+        self.ociosidade_maxima = ociosidade_maxima
+        self.tamanho_pool = tamanho_pool
+        self.cache_disco = cache_disco  # CacheDisco compartilhado por todas as filiais
+        self._abertas = OrderedDict()  # filial_id -> (DatabaseManager, último uso)
+        self._indices = {}  # filial_id -> IndiceAcesso das filiais abertas
+        self._registradores = {}  # filial_id -> RegistradorFrequencia (conexão própria)
+        self._trava = threading.Lock()
+        # Aberturas uma de cada vez: migrações simultâneas do mesmo banco se atrapalham
+        self._trava_abertura = threading.Lock()
+        self.init_filiais()
+
+    def init_filiais(self):
+        """Cria a tabela de filiais e garante a filial principal"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS filiais (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT UNIQUE NOT NULL,
+                arquivo_db TEXT UNIQUE NOT NULL,
+                data_criacao DATE DEFAULT CURRENT_DATE
+            )
+        ''')
+
+        # A filial principal usa o banco original, preservando os dados existentes
+        cursor.execute('''
+            INSERT OR IGNORE INTO filiais (id, nome, arquivo_db)
+            VALUES (1, 'Principal', ?)
+        ''', (self.db_name,))
+
+        conn.commit()
+        conn.close()
+
+    def listar_filiais(self):
+        """Retorna as filiais cadastradas"""
+        conn = sqlite3.connect(self.db_name)
+        df = pd.read_sql(
+            "SELECT id, nome, arquivo_db, data_criacao FROM filiais ORDER BY id", conn)
+        conn.close()
+        return df
+
+    def criar_filial(self, nome):
+        """Cadastra uma nova filial com o seu próprio arquivo de banco"""
+        os.makedirs(self.pasta, exist_ok=True)
+        arquivo_db = os.path.join(self.pasta, f"{_slug(nome)}.db")
+
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(
+                "INSERT INTO filiais (nome, arquivo_db) VALUES (?, ?)", (nome, arquivo_db))
+            conn.commit()
+            filial_id = cursor.lastrowid
+        except sqlite3.IntegrityError:
+            return None  # Nome ou arquivo já existe
+        finally:
+            conn.close()
+
+        # Abre uma vez para criar as tabelas
+        self.obter(filial_id)
+        return filial_id
+
+    def _arquivo_filial(self, filial_id):
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT arquivo_db FROM filiais WHERE id = ?", (filial_id,))
+        resultado = cursor.fetchone()
+        conn.close()
+
+        if resultado is None:
+            raise KeyError(f"Filial {filial_id} não encontrada")
+        return resultado[0]
+
+    def obter(self, filial_id):
+        """Retorna o DatabaseManager da filial, abrindo o banco se necessário"""
+        with self._trava:
+            if filial_id in self._abertas:
+                db, _ = self._abertas.pop(filial_id)
+                self._abertas[filial_id] = (db, time.monotonic())
+                return db
+
+        # A abertura (criação de tabelas e migrações) acontece fora da trava do LRU
+        with self._trava_abertura:
+            db = DatabaseManager(self._arquivo_filial(filial_id),
+                                 tamanho_pool=self.tamanho_pool, cache_disco=self.cache_disco)
+
+        with self._trava:
+            if filial_id in self._abertas:
+                db.fechar()
+                db, _ = self._abertas.pop(filial_id)
+            self._abertas[filial_id] = (db, time.monotonic())
+
+            while len(self._abertas) > self.max_abertas:
+                antigo_id, (antigo, _) = self._abertas.popitem(last=False)
+                self._indices.pop(antigo_id, None)
+                antigo.fechar()
+        return db
+
+    def fechar_ociosas(self):
+        """Fecha os pools das filiais sem uso há mais de ociosidade_maxima segundos"""
+        limite = time.monotonic() - self.ociosidade_maxima
+        with self._trava:
+            ociosas = [filial_id for filial_id, (_, uso) in self._abertas.items()
+                       if uso < limite]
+            for filial_id in ociosas:
+                db, _ = self._abertas.pop(filial_id)
+                self._indices.pop(filial_id, None)
+                db.fechar()
+        return len(ociosas)
+
+    def indice_carregado(self, filial_id):
+        """Retorna o índice de acesso da filial se já estiver em memória, ou None"""
+        with self._trava:
+            indice = self._indices.get(filial_id)
+            if indice is not None:
+                # Consultas de acesso contam como uso da filial no LRU
+                db, _ = self._abertas.pop(filial_id)
+                self._abertas[filial_id] = (db, time.monotonic())
+            return indice
+
+    def indice_acesso(self, filial_id):
+        """Retorna o índice de acesso em memória da filial (carrega na primeira vez)"""
+        indice = self.indice_carregado(filial_id)
+        if indice is not None:
+            return indice
+
+        indice = self.obter(filial_id).get_indice_acesso()
+        with self._trava:
+            if filial_id not in self._abertas:
+                return indice  # Banco fechado nesse meio tempo; não guarda o índice
+            return self._indices.setdefault(filial_id, indice)
+
+    def sincronizar_indices(self):
+        """Recarrega os índices de acesso alterados por outros processos"""
+        with self._trava:
+            indices = list(self._indices.values())
+        return sum(indice.sincronizar() for indice in indices)
+
+    def registrador_frequencia(self, filial_id):
+        """Retorna o gravador de check-ins em lote da filial, criando-o na primeira vez"""
+        with self._trava:
+            registrador = self._registradores.get(filial_id)
+        if registrador is not None:
+            return registrador
+
+        # Garante que as tabelas da filial existem antes de gravar
+        db_name = self.obter(filial_id).db_name
+        with self._trava:
+            if filial_id not in self._registradores:
+                self._registradores[filial_id] = RegistradorFrequencia(db_name)
+            return self._registradores[filial_id]
+
+    def parar_registradores(self):
+        """Grava os check-ins pendentes e encerra os gravadores de todas as filiais"""
+        with self._trava:
+            registradores = list(self._registradores.values())
+            self._registradores.clear()
+        for registrador in registradores:
+            registrador.parar()
+
+    def filiais_abertas(self):
+        """Retorna os ids das filiais com banco aberto, da menos para a mais recente"""
+        with self._trava:
+            return list(self._abertas)
+
+    def para_cada_filial(self, funcao):
+        """Executa funcao(db) em todas as filiais, em sequência
+
+        Feito para as tarefas de manutenção do agendador, não passa pelo LRU:
+        uma filial já aberta é usada sem contar como uso, e uma fechada é
+        aberta só para a tarefa (uma conexão, sem escritor único) e fechada em
+        seguida. Assim a manutenção não desloca do cache as filiais em uso
+        pelas sessões.
+        """
+        resultados = {}
+        for filial in self.listar_filiais().to_dict('records'):
+            with self._trava:
+                aberta = self._abertas.get(filial['id'])
+            if aberta is not None:
+                resultados[filial['id']] = funcao(aberta[0])
+                continue
+
+            with self._trava_abertura:
+                db = DatabaseManager(filial['arquivo_db'], tamanho_pool=1,
+                                     cache_disco=self.cache_disco, escritor_unico=False)
+            try:
+                resultados[filial['id']] = funcao(db)
+            finally:
+                db.fechar()
+        return resultados
@@ -0,0 +1,107 @@
+import queue
+import sqlite3
+import threading
+import time
+
+from database import validar_data_hora
+
+# Gravação de check-ins (frequência) em lote
+
+
+class RegistradorFrequencia:
+    """Grava check-ins em lote a partir de uma fila em memória
+
+    registrar() só enfileira o check-in; uma thread de fundo junta o que chegou
+    e grava tudo numa única transação a cada `intervalo_ms` milissegundos ou
+    `tamanho_lote` check-ins, o que vier primeiro. Assim os picos da catraca
+    custam um commit por lote em vez de um por entrada.
+    """
+
+    def __init__(self, db_name='academia.db', intervalo_ms=200, tamanho_lote=500,
+                 capacidade=100_000, tentativas=3):
+        self.db_name = db_name
+        self.intervalo = intervalo_ms / 1000
+        self.tamanho_lote = tamanho_lote
+        self.tentativas = tentativas
+        self.gravados = 0
+        self.descartados = 0
+        self.ultimo_erro = None
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._parar = threading.Event()
+        self._thread = threading.Thread(
+            target=self._loop, name="frequencia", daemon=True)
+        self._thread.start()
+
+    def registrar(self, atleta_id, data_hora=None, origem='catraca', timeout=5):
+        """Enfileira um check-in (levanta queue.Full se a fila não esvaziar a tempo)"""
+        if self._parar.is_set():
+            raise RuntimeError("Registrador de frequência encerrado")
+        self._fila.put((int(atleta_id), validar_data_hora(data_hora), origem),
+                       timeout=timeout)
+
+    def pendentes(self):
+        """Check-ins na fila ainda não gravados"""
+        return self._fila.qsize()
+
+    def descarregar(self):
+        """Aguarda até que todos os check-ins enfileirados tenham sido gravados"""
+        self._fila.join()
+
+    def parar(self):
+        """Grava o que estiver na fila e encerra a thread"""
+        self._parar.set()
+        self._thread.join()
+
+    def _coletar(self):
+        """Espera o primeiro check-in e junta os seguintes até o prazo ou o lote encher"""
+        try:
+            lote = [self._fila.get(timeout=self.intervalo)]
+        except queue.Empty:
+            return []
+
+        prazo = time.monotonic() + self.intervalo
+        while len(lote) < self.tamanho_lote:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _gravar(self, conn, lote):
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                with conn:
+                    conn.executemany('''
+                        INSERT INTO frequencia (atleta_id, data_hora, origem)
+                        VALUES (?, ?, ?)
+                    ''', lote)
+                self.gravados += len(lote)
+                return
+            except sqlite3.OperationalError as e:
+                # Banco ocupado por outro escritor: tenta de novo em seguida
+                self.ultimo_erro = str(e)
+                if tentativa < self.tentativas:
+                    time.sleep(0.1 * tentativa)
+            except sqlite3.Error as e:
+                self.ultimo_erro = str(e)
+                break
+
+        self.descartados += len(lote)
+
+    def _loop(self):
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        try:
+            while not (self._parar.is_set() and self._fila.empty()):
+                lote = self._coletar()
+                if not lote:
+                    continue
+                try:
+                    self._gravar(conn, lote)
+                finally:
+                    for _ in lote:
+                        self._fila.task_done()
+        finally:
+            conn.close()
@@ -0,0 +1,267 @@
+import argparse
+from datetime import datetime
+
+# Particionamento anual de pagamentos
+#
+# Com o particionamento ativo, `pagamentos` deixa de ser uma tabela e vira
+# uma view (UNION ALL) sobre uma tabela por ano, pagamentos_AAAA, cada uma
+# com os mesmos índices e triggers da tabela única. As leituras existentes
+# continuam funcionando; registrar_pagamento grava direto na partição do
+# ano, e as consultas por período podem usar só as partições que o período
+# alcança (ver ParticoesPagamentos.fonte).
+
+COLUNAS_PAGAMENTOS = ('id', 'atleta_id', 'data_pagamento', 'valor', 'valor_centavos',
+                      'mes_referencia', 'forma_pagamento', 'observacoes', 'chave_idempotencia')
+
+PADRAO_PARTICAO = 'pagamentos_[0-9][0-9][0-9][0-9]'
+
+
+def tabela_particao(ano):
+    return f"pagamentos_{int(ano):04d}"
+
+
+class ParticoesPagamentos:
+    """Partições anuais da tabela de pagamentos atrás da view `pagamentos`
+
+    Os ids continuam únicos entre partições: saem de pagamentos_sequencia
+    (AUTOINCREMENT), que também recebe os ids já existentes na migração.
+    Inserções na view (integrações, scripts) são roteadas por um trigger
+    INSTEAD OF; UPDATE e DELETE na view são repassados à partição da linha.
+    Mudar um pagamento de ano exige excluí-lo e registrá-lo de novo (o CHECK
+    da partição rejeita a data).
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def ativo(self, conn):
+        """True se `pagamentos` já é a view sobre as partições"""
+        tipo = conn.execute(
+            "SELECT type FROM sqlite_master WHERE name = 'pagamentos'").fetchone()
+        return tipo is not None and tipo[0] == 'view'
+
+    def anos(self, conn):
+        """Anos com partição criada, em ordem"""
+        return sorted(int(nome[-4:]) for nome, in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+            (PADRAO_PARTICAO,)))
+
+    def tabelas_fisicas(self, conn):
+        """Tabelas que guardam os pagamentos: a tabela única ou as partições"""
+        if not self.ativo(conn):
+            return ['pagamentos']
+        return [tabela_particao(ano) for ano in self.anos(conn)]
+
+    def tabela_do_ano(self, conn, ano):
+        """Tabela onde ficam os pagamentos do ano (para escritas por período)"""
+        return tabela_particao(ano) if self.ativo(conn) else 'pagamentos'
+
+    def fonte(self, conn, inicio=None, fim=None, colunas=COLUNAS_PAGAMENTOS):
+        """Origem para o FROM de uma consulta por período (datas ISO, inclusive)
+
+        Sem particionamento é a própria tabela; com ele, um UNION ALL só das
+        partições que o período alcança. O WHERE da consulta continua
+        necessário: as partições escolhidas podem ter datas fora do período.
+        Passar só as `colunas` usadas deixa cada partição ser lida pelo
+        índice de cobertura, como a tabela única.
+        """
+        if not self.ativo(conn):
+            return 'pagamentos'
+
+        anos = self._anos_no_periodo(conn, inicio, fim)
+        if not anos:
+            return f"(SELECT {', '.join(colunas)} FROM pagamentos WHERE 0)"
+        return "(" + " UNION ALL ".join(
+            f"SELECT {', '.join(colunas)} FROM {tabela_particao(ano)}"
+            for ano in anos) + ")"
+
+    def por_particao(self, conn, consulta, inicio=None, fim=None):
+        """Repete `consulta` (com {tabela} no FROM) em cada partição do período, com UNION ALL
+
+        Para agregações por mês ou dia: os grupos não cruzam anos, então cada
+        partição agrega pelo próprio índice e os resultados só são
+        concatenados. Use parâmetros nomeados, que valem para todas as cópias.
+        """
+        if not self.ativo(conn):
+            return consulta.format(tabela='pagamentos')
+
+        anos = self._anos_no_periodo(conn, inicio, fim)
+        if not anos:
+            return consulta.format(tabela=self.fonte(conn, inicio, fim))
+        return " UNION ALL ".join(consulta.format(tabela=tabela_particao(ano)) for ano in anos)
+
+    def _anos_no_periodo(self, conn, inicio, fim):
+        primeiro = int(inicio[:4]) if inicio else 0
+        ultimo = int(fim[:4]) if fim else 9999
+        return [ano for ano in self.anos(conn) if primeiro <= ano <= ultimo]
+
+    def rotear(self, conn, data_pagamento):
+        """Retorna (tabela, id) para inserir um pagamento com a data informada
+
+        Sem particionamento o id é None (o AUTOINCREMENT da tabela o gera).
+        Com ele, cria a partição do ano se ainda não existir e reserva o id
+        na sequência. Deve ser chamado dentro da transação da inserção.
+        """
+        if not self.ativo(conn):
+            return 'pagamentos', None
+
+        ano = int(data_pagamento[:4])
+        if ano not in self.anos(conn):
+            self._criar_particao(conn, ano)
+            self._recriar_visao(conn)
+        pagamento_id = conn.execute("INSERT INTO pagamentos_sequencia DEFAULT VALUES").lastrowid
+        return tabela_particao(ano), pagamento_id
+
+    def _criar_particao(self, conn, ano, estrutura=True):
+        tabela = tabela_particao(ano)
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {tabela} (
+                id INTEGER PRIMARY KEY,
+                atleta_id INTEGER,
+                data_pagamento DATE NOT NULL
+                    CHECK (data_pagamento >= '{ano:04d}-01-01' AND data_pagamento < '{ano + 1:04d}-01-01'),
+                valor REAL,
+                valor_centavos INTEGER,
+                mes_referencia TEXT,
+                forma_pagamento TEXT,
+                observacoes TEXT,
+                chave_idempotencia TEXT,
+                FOREIGN KEY(atleta_id) REFERENCES atletas(id)
+            )
+        ''')
+        if estrutura:
+            self.db._criar_estrutura_pagamentos(conn.cursor(), tabela)
+
+    def _recriar_visao(self, conn):
+        """Recria a view e os triggers INSTEAD OF com a lista atual de partições"""
+        anos = self.anos(conn)
+        colunas = ', '.join(COLUNAS_PAGAMENTOS)
+        conn.execute("DROP VIEW IF EXISTS pagamentos")
+        conn.execute("CREATE VIEW pagamentos AS " + " UNION ALL ".join(
+            f"SELECT {colunas} FROM {tabela_particao(ano)}" for ano in anos))
+
+        # Inserção: reserva o id (ou registra o informado) e grava na partição do ano
+        novos = ', '.join(f"NEW.{coluna}" for coluna in COLUNAS_PAGAMENTOS[1:])
+        roteamento = "\n".join(f'''
+                INSERT INTO {tabela_particao(ano)} ({colunas})
+                SELECT last_insert_rowid(), {novos}
+                WHERE NEW.data_pagamento >= '{ano:04d}-01-01'
+                  AND NEW.data_pagamento < '{ano + 1:04d}-01-01';''' for ano in anos)
+        conn.execute(f'''
+            CREATE TRIGGER trg_pagamentos_particionados_insert
+            INSTEAD OF INSERT ON pagamentos
+            BEGIN
+                SELECT RAISE(ABORT, 'Sem partição para a data do pagamento')
+                WHERE NEW.data_pagamento IS NULL
+                   OR substr(NEW.data_pagamento, 1, 4) NOT IN ({', '.join(f"'{ano:04d}'" for ano in anos)});
+                INSERT INTO pagamentos_sequencia (id) VALUES (NEW.id);
+                {roteamento}
+            END
+        ''')
+
+        atribuicoes = ', '.join(f"{coluna} = NEW.{coluna}" for coluna in COLUNAS_PAGAMENTOS[1:])
+        conn.execute(f'''
+            CREATE TRIGGER trg_pagamentos_particionados_update
+            INSTEAD OF UPDATE ON pagamentos
+            BEGIN
+                {"".join(f"UPDATE {tabela_particao(ano)} SET {atribuicoes} WHERE id = OLD.id;"
+                         for ano in anos)}
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER trg_pagamentos_particionados_delete
+            INSTEAD OF DELETE ON pagamentos
+            BEGIN
+                {"".join(f"DELETE FROM {tabela_particao(ano)} WHERE id = OLD.id;" for ano in anos)}
+            END
+        ''')
+
+    def particionar(self, hoje=None):
+        """Migra a tabela única para partições anuais; retorna os anos criados
+
+        Tudo numa transação: cópia por ano (índices e triggers criados depois
+        da cópia), sequência de ids, remoção da tabela e criação da view.
+        Também cria as partições do ano atual e do próximo.
+        """
+        hoje = hoje or datetime.now().date()
+        conn = self.db.get_connection()
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if self.ativo(conn):
+                conn.rollback()
+                return []
+
+            sem_data = conn.execute(
+                "SELECT COUNT(*) FROM pagamentos WHERE data_pagamento IS NULL").fetchone()[0]
+            if sem_data:
+                raise ValueError(f"{sem_data} pagamentos sem data_pagamento; corrija antes de particionar")
+
+            anos = {int(ano) for ano, in conn.execute(
+                "SELECT DISTINCT substr(data_pagamento, 1, 4) FROM pagamentos")}
+            anos |= {hoje.year, hoje.year + 1}
+
+            colunas = ', '.join(COLUNAS_PAGAMENTOS)
+            for ano in sorted(anos):
+                self._criar_particao(conn, ano, estrutura=False)
+                conn.execute(f'''
+                    INSERT INTO {tabela_particao(ano)} ({colunas})
+                    SELECT {colunas} FROM pagamentos
+                    WHERE data_pagamento >= ? AND data_pagamento < ?
+                ''', (f"{ano:04d}-01-01", f"{ano + 1:04d}-01-01"))
+
+            # A sequência parte do maior id já usado (inclusive de pagamentos excluídos)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pagamentos_sequencia (id INTEGER PRIMARY KEY AUTOINCREMENT)")
+            conn.execute("INSERT INTO pagamentos_sequencia (id) SELECT id FROM pagamentos")
+            conn.execute('''
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT 'pagamentos_sequencia', 0
+                WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'pagamentos_sequencia')
+            ''')
+            conn.execute('''
+                UPDATE sqlite_sequence
+                SET seq = MAX(seq, COALESCE(
+                    (SELECT seq FROM sqlite_sequence WHERE name = 'pagamentos'), 0))
+                WHERE name = 'pagamentos_sequencia'
+            ''')
+
+            conn.execute("DROP TABLE pagamentos")
+            cursor = conn.cursor()
+            for ano in sorted(anos):
+                self.db._criar_estrutura_pagamentos(cursor, tabela_particao(ano))
+            self._recriar_visao(conn)
+
+            # A cópia não passou pelos triggers: invalida o que depende de pagamentos
+            conn.execute(
+                "UPDATE versao_dados SET versao = versao + 1 WHERE tabela IN ('pagamentos', 'cache_coortes')")
+            conn.commit()
+            return sorted(anos)
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Migra os pagamentos de um banco para partições anuais")
+    parser.add_argument("--banco", default="academia.db", help="Arquivo do banco (padrão: academia.db)")
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+
+    db = DatabaseManager(db_name=args.banco)
+    inicio = datetime.now()
+    anos = db.particoes.particionar()
+    db.fechar()
+    if anos:
+        print(f"✅ Partições criadas: {', '.join(map(str, anos))} "
+              f"({(datetime.now() - inicio).total_seconds():.1f}s)")
+    else:
+        print("ℹ️ O banco já está particionado")
+
+
+if __name__ == "__main__":
+    main()
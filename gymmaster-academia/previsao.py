@@ -0,0 +1,124 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from coortes import obter_coortes
+from database import MESES_PLANO, intervalo_mes
+
+# Previsão de receita
+#
+# receita prevista = renovações esperadas + receita de novos atletas
+#   renovações: planos que vencem no período (data_vencimento, valor_plano) x
+#               taxa de renovação (1 - churn médio dos últimos meses, das
+#               coortes); quem renovar antes pode vencer de novo no período
+#   novos:      média dessazonalizada dos primeiros pagamentos dos últimos
+#               meses x índice sazonal do mês previsto
+
+TAXA_RENOVACAO_PADRAO = 0.8
+LIMITES_FATOR_SAZONAL = (0.5, 1.5)
+MESES_MINIMOS_SAZONALIDADE = 24
+
+
+def fatores_sazonais(meses, totais):
+    """Índice sazonal por mês do calendário (array de 12, janeiro primeiro, média 1)
+
+    Razão entre a receita de cada mês e a média móvel centrada de 12 meses
+    (2x12), média por mês do calendário. Com menos de 24 meses de histórico
+    todos os fatores são 1.
+    """
+    if len(meses) == 0:
+        return np.ones(12)
+
+    # Série contínua de meses (meses sem pagamento valem 0)
+    indices = np.array([int(m[:4]) * 12 + int(m[5:7]) - 1 for m in meses])
+    serie = np.zeros(indices.max() - indices.min() + 1)
+    serie[indices - indices.min()] = totais
+    if len(serie) < MESES_MINIMOS_SAZONALIDADE:
+        return np.ones(12)
+
+    pesos = np.r_[0.5, np.ones(11), 0.5] / 12
+    media_movel = np.full(len(serie), np.nan)
+    media_movel[6:-6] = np.convolve(serie, pesos, mode='valid')
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        razao = np.where(media_movel > 0, serie / media_movel, np.nan)
+    mes_calendario = (np.arange(len(serie)) + indices.min()) % 12
+
+    soma = np.bincount(mes_calendario, weights=np.nan_to_num(razao), minlength=12)
+    contagem = np.bincount(mes_calendario, weights=~np.isnan(razao), minlength=12)
+    fatores = np.where(contagem > 0, soma / np.maximum(contagem, 1), 1.0)
+    fatores = fatores / fatores.mean()
+    return np.clip(fatores, *LIMITES_FATOR_SAZONAL)
+
+
+def _taxa_renovacao(db, meses=3):
+    churn = obter_coortes(db)['churn'].dropna(subset=['churn']).tail(meses)
+    if churn.empty or churn['ativos_inicio'].sum() == 0:
+        return TAXA_RENOVACAO_PADRAO
+    return 1 - churn['perdidos'].sum() / churn['ativos_inicio'].sum()
+
+
+def prever_receita(db, hoje=None):
+    """Projeta a receita que falta no mês atual e a do próximo mês
+
+    Retorna um dicionário com a taxa de renovação usada e, para 'mes_atual'
+    (de amanhã ao fim do mês) e 'proximo_mes', as renovações previstas
+    (esperadas, já ponderadas pela taxa), a receita de renovações, a de
+    novos atletas e o total, em KZ.
+    """
+    hoje = hoje or datetime.now().date()
+    mes_atual = hoje.strftime('%Y-%m')
+    inicio_mes, inicio_proximo = (date.fromisoformat(d) for d in intervalo_mes(mes_atual))
+    proximo_mes = inicio_proximo.strftime('%Y-%m')
+    _, fim_proximo = intervalo_mes(proximo_mes)
+
+    historico = db.get_receita_mensal_historica(inicio_mes.isoformat())
+    fatores = fatores_sazonais(historico['mes'].tolist(),
+                               historico['total_centavos'].to_numpy(dtype=float))
+
+    # Novos atletas: média dos últimos 6 meses fechados, sem o efeito sazonal
+    recentes = historico.tail(6)
+    if recentes.empty:
+        base_novos = 0.0
+    else:
+        sazonal_recentes = fatores[recentes['mes'].str[5:7].astype(int).to_numpy() - 1]
+        base_novos = float(np.mean(recentes['novos_centavos'].to_numpy() / sazonal_recentes))
+
+    taxa = _taxa_renovacao(db)
+
+    # Renovações: cada vencimento no período, e o seguinte (mesma regra de
+    # registrar_pagamento, 30 dias por mês do plano) se também cair nele
+    amanha = hoje + timedelta(days=1)
+    vencimentos = db.get_vencimentos_previstos(amanha.isoformat(), fim_proximo)
+    datas = pd.to_datetime(vencimentos['data_vencimento'], format='%Y-%m-%d', errors='coerce')
+    dias_plano = vencimentos['plano'].map(MESES_PLANO).fillna(1).to_numpy() * 30
+    seguintes = datas + pd.to_timedelta(dias_plano, unit='D')
+    valores = vencimentos['valor_plano_centavos'].fillna(0).to_numpy(dtype=float)
+
+    renovacoes = pd.DataFrame({
+        'mes': np.concatenate([datas.dt.strftime('%Y-%m'), seguintes.dt.strftime('%Y-%m')]),
+        'quantidade': np.concatenate([np.full(len(valores), taxa), np.full(len(valores), taxa ** 2)]),
+        'centavos': np.concatenate([valores * taxa, valores * taxa ** 2])
+    }).groupby('mes').sum()
+
+    def projetar(mes, fracao_mes):
+        fator = float(fatores[int(mes[5:7]) - 1])
+        linha = renovacoes.reindex([mes], fill_value=0).iloc[0]
+        receita_renovacoes = linha['centavos'] / 100
+        receita_novos = base_novos * fator * fracao_mes / 100
+        return {
+            'mes': mes,
+            'renovacoes_previstas': float(linha['quantidade']),
+            'receita_renovacoes': float(receita_renovacoes),
+            'receita_novos': float(receita_novos),
+            'receita_prevista': float(receita_renovacoes + receita_novos),
+            'fator_sazonal': fator
+        }
+
+    dias_mes = (inicio_proximo - inicio_mes).days
+    return {
+        'taxa_renovacao': float(taxa),
+        'mes_atual': projetar(mes_atual, ((inicio_proximo - hoje).days - 1) / dias_mes),
+        'proximo_mes': projetar(proximo_mes, 1.0)
+    }
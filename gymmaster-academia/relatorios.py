@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Relatórios consolidados entre filiais
+
+COLUNAS_RECEITA = ['filial_id', 'mes', 'forma_pagamento',
+                   'receita_centavos', 'total_pagamentos']
+
+SQL_RECEITA_FILIAL = '''
+    SELECT {filial_id} AS filial_id,
+           substr(data_pagamento, 1, 7) AS mes,
+           forma_pagamento,
+           SUM(valor_centavos) AS receita_centavos,
+           COUNT(*) AS total_pagamentos
+    FROM {tabela}
+    WHERE data_pagamento BETWEEN :inicio AND :fim
+    GROUP BY mes, forma_pagamento
+'''
+
+# Anos arquivados (ver ArquivoPagamentos) entram pelo resumo diário
+SQL_RECEITA_ARQUIVADA = '''
+    SELECT {filial_id} AS filial_id,
+           substr(data_pagamento, 1, 7) AS mes,
+           NULLIF(forma_pagamento, '') AS forma_pagamento,
+           SUM(total_centavos) AS receita_centavos,
+           SUM(quantidade) AS total_pagamentos
+    FROM {esquema}pagamentos_arquivados_por_dia
+    WHERE data_pagamento BETWEEN :inicio AND :fim
+    GROUP BY mes, forma_pagamento
+'''
+
+
+def _consultas_filial(conn, filial_id, esquema=''):
+    """Consultas da receita de uma filial: tabela e, se o banco já tiver, o resumo arquivado"""
+    consultas = [SQL_RECEITA_FILIAL.format(filial_id=int(filial_id), tabela=f"{esquema}pagamentos")]
+    # Banco de filial ainda não migrado (aberto só para leitura aqui) não tem o resumo
+    if conn.execute(f"SELECT 1 FROM {esquema}sqlite_master "
+                    "WHERE name = 'pagamentos_arquivados_por_dia'").fetchone():
+        consultas.append(SQL_RECEITA_ARQUIVADA.format(filial_id=int(filial_id), esquema=esquema))
+    return consultas
+
+
+def _agregar_filial(filial_id, arquivo_db, inicio, fim):
+    """Soma parcial da receita de uma filial (executada num processo do pool)"""
+    conn = sqlite3.connect(f"file:{arquivo_db}?mode=ro", uri=True, timeout=30)
+    try:
+        cursor = conn.execute(" UNION ALL ".join(_consultas_filial(conn, filial_id)),
+                              {'inicio': inicio, 'fim': fim})
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+class MotorRelatorios:
+    """Receita consolidada da rede, por filial, mês e forma de pagamento
+
+    Com poucas filiais os bancos são anexados (ATTACH) a uma conexão em
+    memória e agregados num único UNION ALL; acima de `limite_attach` as
+    somas parciais de cada filial são calculadas num pool de processos e
+    combinadas em pandas.
+    """
+
+    # O SQLite aceita no máximo 10 bancos anexados por conexão (SQLITE_MAX_ATTACHED)
+    LIMITE_ATTACH = 10
+
+    def __init__(self, roteador, limite_attach=LIMITE_ATTACH, max_processos=None):
+        self.roteador = roteador
+        self.limite_attach = min(limite_attach, self.LIMITE_ATTACH)
+        self.max_processos = max_processos or min(os.cpu_count() or 2, 8)
+        self._pool = None
+
+    def _pool_processos(self):
+        # spawn evita herdar as threads do servidor num fork
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_processos,
+                mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def fechar(self):
+        """Encerra o pool de processos, se tiver sido criado"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def escolher_modo(self, total_filiais):
+        """ATTACH enquanto cabe numa conexão; processos a partir daí"""
+        return 'attach' if total_filiais <= self.limite_attach else 'processos'
+
+    def receita_consolidada(self, data_inicio, data_fim, modo='auto', filiais=None):
+        """Retorna a receita por filial, mês e forma de pagamento no período
+
+        `filiais` é um DataFrame com id, nome e arquivo_db (padrão: todas as
+        filiais do roteador). Retorna também o modo efetivamente usado.
+        """
+        if filiais is None:
+            filiais = self.roteador.listar_filiais()
+        if modo == 'auto':
+            modo = self.escolher_modo(len(filiais))
+
+        inicio = pd.Timestamp(data_inicio).strftime('%Y-%m-%d')
+        fim = pd.Timestamp(data_fim).strftime('%Y-%m-%d')
+
+        if modo == 'attach':
+            linhas = self._via_attach(filiais, inicio, fim)
+        elif modo == 'processos':
+            linhas = self._via_processos(filiais, inicio, fim)
+        else:
+            raise ValueError(f"Modo de relatório desconhecido: {modo}")
+
+        df = pd.DataFrame(linhas, columns=COLUNAS_RECEITA)
+        df = df.groupby(['filial_id', 'mes', 'forma_pagamento'], as_index=False,
+                        dropna=False)[['receita_centavos', 'total_pagamentos']].sum()
+        df['receita'] = df['receita_centavos'] / 100
+        df = df.merge(filiais[['id', 'nome']].rename(
+            columns={'id': 'filial_id', 'nome': 'filial'}), on='filial_id')
+
+        return df[['filial', 'mes', 'forma_pagamento', 'receita', 'total_pagamentos']], modo
+
+    def _via_attach(self, filiais, inicio, fim):
+        """Anexa as filiais em grupos de até limite_attach e agrega com UNION ALL"""
+        linhas = []
+        registros = filiais.to_dict('records')
+
+        for i in range(0, len(registros), self.limite_attach):
+            grupo = registros[i:i + self.limite_attach]
+            conn = sqlite3.connect(":memory:", uri=True)
+            try:
+                partes = []
+                for j, filial in enumerate(grupo):
+                    conn.execute(f"ATTACH DATABASE ? AS f{j}",
+                                 (f"file:{filial['arquivo_db']}?mode=ro",))
+                    partes.extend(_consultas_filial(conn, filial['id'], esquema=f"f{j}."))
+
+                cursor = conn.execute(" UNION ALL ".join(partes),
+                                      {'inicio': inicio, 'fim': fim})
+                linhas.extend(cursor.fetchall())
+            finally:
+                conn.close()
+
+        return linhas
+
+    def _via_processos(self, filiais, inicio, fim):
+        """Distribui as somas parciais por filial num pool de processos"""
+        pool = self._pool_processos()
+        futuros = [pool.submit(_agregar_filial, filial['id'], filial['arquivo_db'], inicio, fim)
+                   for filial in filiais.to_dict('records')]
+
+        linhas = []
+        for futuro in futuros:
+            linhas.extend(futuro.result())
+        return linhas
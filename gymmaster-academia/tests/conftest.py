@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do app ficam na raiz de gymmaster-academia (sem pacote)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Banco novo num diretório temporário, fechado ao fim do teste"""
+    banco = DatabaseManager(db_name=str(tmp_path / "academia.db"))
+    yield banco
+    banco.fechar()
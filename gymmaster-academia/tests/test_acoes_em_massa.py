@@ -0,0 +1,92 @@
+import sqlite3
+from datetime import date, timedelta
+
+
+def _atletas(db, quantidade, vencimento):
+    return [db.add_atleta(f"Atleta {i}", "900000000", "", None, vencimento.isoformat(),
+                          "Mensal", 10000, "")
+            for i in range(quantidade)]
+
+
+def test_previa_conta_o_mesmo_que_a_acao_altera(db):
+    ids = _atletas(db, 4, date.today() + timedelta(days=40))
+    db.alterar_plano_em_massa(ids[:1], "Anual")
+
+    assert db.alterar_plano_em_massa(ids, "Anual", previa=True) == 3
+    assert db.alterar_plano_em_massa(ids, "Anual") == 3
+    assert db.alterar_plano_em_massa(ids, "Anual", previa=True) == 0
+    assert set(db.get_all_atletas()['plano']) == {"Anual"}
+
+
+def test_reajuste_atualiza_centavos_e_valor_real(db):
+    ids = _atletas(db, 2, date.today() + timedelta(days=40))
+
+    assert db.reajustar_valor_em_massa(ids, 12.5) == 2
+
+    conn = sqlite3.connect(db.db_name)
+    linhas = conn.execute("SELECT valor_plano, valor_plano_centavos FROM atletas").fetchall()
+    conn.close()
+    assert linhas == [(11250.0, 1125000)] * 2
+
+
+def test_acao_em_massa_invalida_formulario_aberto(db):
+    atleta_id = _atletas(db, 1, date.today() + timedelta(days=40))[0]
+    versao = int(db.get_atleta_by_id(atleta_id)['versao'])
+
+    db.alterar_plano_em_massa([atleta_id], "Trimestral")
+
+    assert not db.update_atleta(atleta_id, "Outro", "", "", None,
+                                (date.today() + timedelta(days=40)).isoformat(),
+                                "Mensal", 10000, "", versao=versao)
+
+
+def test_arquivar_tira_o_atleta_de_todas_as_contagens(db):
+    hoje = date.today()
+    vencido, ativo = _atletas(db, 1, hoje - timedelta(days=10)) + _atletas(db, 1, hoje + timedelta(days=3))
+    db.registrar_pagamento(ativo, hoje.isoformat(), 100, hoje.strftime('%Y-%m'), "Dinheiro", "")
+    db.get_indice_acesso()
+
+    assert db.arquivar_atletas([vencido, ativo], previa=True) == 2
+    assert db.arquivar_atletas([vencido, ativo]) == 2
+
+    estatisticas = db.get_estatisticas_avancadas()
+    assert estatisticas['total_atletas'] == 0
+    assert estatisticas['vencidos'] == estatisticas['alertas'] == 0
+    assert db.get_aging_recebiveis()['atletas'].sum() == 0
+    assert db.get_recebiveis_em_atraso().empty
+    assert db.get_vencimentos_previstos(hoje.isoformat(), (hoje + timedelta(days=60)).isoformat()).empty
+    assert not any("Atleta" in notificacao for notificacao in db.get_notificacoes())
+    assert db.get_all_atletas().empty
+    assert db.buscar_atletas("Atleta") == []
+    assert db.verificar_acesso(ativo) is None
+    assert db.get_indice_acesso().verificar(ativo) is None
+    assert db.verificar_buckets_vencimento(corrigir=False) == {}
+
+    # O histórico financeiro fica
+    assert len(db.get_pagamentos()) == 1
+
+
+def test_excluir_em_massa_remove_pagamentos(db):
+    hoje = date.today()
+    ids = _atletas(db, 3, hoje + timedelta(days=40))
+    for atleta_id in ids:
+        db.registrar_pagamento(atleta_id, hoje.isoformat(), 100, hoje.strftime('%Y-%m'), "Dinheiro", "")
+
+    assert db.excluir_atletas(ids[:2]) == 2
+
+    assert db.get_pagamentos()['atleta_id'].tolist() == [ids[2]]
+    assert db.get_estatisticas_avancadas()['total_atletas'] == 1
+
+
+def test_pagamentos_arquivados_de_atleta_arquivado_continuam_no_historico(db):
+    hoje = date.today()
+    atleta_id = _atletas(db, 1, hoje + timedelta(days=40))[0]
+    antigo = date(hoje.year - 3, 6, 1)
+    db.registrar_pagamento(atleta_id, antigo.isoformat(), 100, antigo.strftime('%Y-%m'), "Dinheiro", "")
+    db.registrar_pagamento(atleta_id, hoje.isoformat(), 200, hoje.strftime('%Y-%m'), "Dinheiro", "")
+    db.arquivo.arquivar_ano(antigo.year)
+
+    db.arquivar_atletas([atleta_id])
+
+    assert sorted(db.get_pagamentos()['valor']) == [100, 200]
+    assert db.get_relatorio_pagamentos(antigo.isoformat(), hoje.isoformat())['valor'].sum() == 300
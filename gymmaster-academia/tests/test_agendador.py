@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from agendador import Agendador, ExpressaoCron
+
+HOJE = date.today()
+
+
+@pytest.mark.parametrize("campo, esperado", [
+    ("*/15", {0, 15, 30, 45}),
+    ("10-20/5", {10, 15, 20}),
+    ("1,5,30-32", {1, 5, 30, 31, 32}),
+    ("7", {7}),
+])
+def test_cron_expande_faixas_passos_e_listas(campo, esperado):
+    assert ExpressaoCron(f"{campo} * * * *").minutos == esperado
+
+
+@pytest.mark.parametrize("expressao", [
+    "60 * * * *", "* * * *", "5-1 * * * *", "*/0 * * * *", "* * 0 * *", "* * * * 7",
+])
+def test_cron_rejeita_campos_invalidos(expressao):
+    with pytest.raises(ValueError):
+        ExpressaoCron(expressao)
+
+
+def test_cron_dia_do_mes_e_dia_da_semana():
+    # 2024-01-07 é domingo
+    semanal = ExpressaoCron("0 4 * * 0")
+    assert semanal.corresponde(datetime(2024, 1, 7, 4, 0))
+    assert not semanal.corresponde(datetime(2024, 1, 8, 4, 0))
+    assert not semanal.corresponde(datetime(2024, 1, 7, 4, 1))
+
+    # Os dois restritos: dia 1 ou segunda-feira
+    ambos = ExpressaoCron("0 0 1 * 1")
+    assert [ambos.corresponde(datetime(2024, mes, dia)) for mes, dia in
+            ((1, 1), (1, 8), (2, 1), (1, 9))] == [True, True, True, False]
+
+    # Só o dia do mês restrito (o dia da semana é '*/2'): os dois precisam valer
+    assert ExpressaoCron("0 0 1 * */2").corresponde(datetime(2024, 1, 1)) is False
+    assert ExpressaoCron("0 0 1 * */2").corresponde(datetime(2024, 9, 1)) is True
+
+
+@pytest.fixture
+def agendadores(db):
+    agendadores = [Agendador(db.db_name) for _ in range(2)]
+    yield agendadores
+    for agendador in agendadores:
+        agendador.parar()
+
+
+def test_so_um_agendador_executa_cada_minuto(agendadores):
+    primeiro, segundo = agendadores
+    execucoes, rodando, liberar = [], threading.Event(), threading.Event()
+
+    def tarefa():
+        execucoes.append(threading.current_thread().name)
+        rodando.set()
+        liberar.wait(5)
+
+    for agendador in agendadores:
+        agendador.registrar("tarefa", "* * * * *", tarefa)
+
+    em_curso = primeiro._executor.submit(
+        primeiro._executar, primeiro.tarefas["tarefa"], "2024-01-01 00:00")
+    rodando.wait(5)
+    # O outro processo não executa o mesmo minuto, nem uma execução manual, enquanto dura o lease
+    assert segundo._executar(segundo.tarefas["tarefa"], "2024-01-01 00:00") is None
+    assert segundo._executar(segundo.tarefas["tarefa"], None) is None
+    liberar.set()
+    assert em_curso.result(5) == "sucesso"
+
+    # Minuto já consumido; o seguinte é executado
+    assert segundo._executar(segundo.tarefas["tarefa"], "2024-01-01 00:00") is None
+    assert segundo._executar(segundo.tarefas["tarefa"], "2024-01-01 00:01") == "sucesso"
+    assert len(execucoes) == 2
+    assert [linha['status'] for linha in segundo.get_historico()] == ["sucesso", "sucesso"]
+
+
+def test_lease_expirado_e_retomado(agendadores):
+    primeiro, segundo = agendadores
+    for agendador in agendadores:
+        agendador.registrar("tarefa", "* * * * *", lambda: None)
+
+    # Processo que tomou o lease e morreu sem liberar
+    assert primeiro._adquirir(primeiro.tarefas["tarefa"], "2024-01-01 00:00")
+    assert segundo._executar(segundo.tarefas["tarefa"], "2024-01-01 00:01") is None
+
+    conn = sqlite3.connect(primeiro.db_name)
+    conn.execute("UPDATE tarefas_agendadas SET bloqueada_ate = 0")
+    conn.commit()
+    conn.close()
+    assert segundo._executar(segundo.tarefas["tarefa"], "2024-01-01 00:01") == "sucesso"
+
+
+def _buckets(db):
+    conn = sqlite3.connect(db.db_name)
+    buckets = dict((bucket, quantidade) for bucket, quantidade in conn.execute(
+        "SELECT bucket, quantidade FROM buckets_vencimento"))
+    conn.close()
+    return buckets
+
+
+def test_virar_dia_reclassifica_os_buckets(db):
+    for dias in (-1, 0, 7, 30, 31):
+        db.add_atleta(f"Atleta {dias}", "", "", None, (HOJE + timedelta(days=dias)).isoformat(),
+                      "Mensal", 10000, "")
+    # Buckets como estavam ontem
+    conn = db.get_connection()
+    db._reclassificar_buckets(conn, (HOJE - timedelta(days=1)).isoformat())
+    conn.commit()
+    conn.close()
+    assert _buckets(db) == {'vencido': 0, 'alerta': 2, 'renovacao': 1, 'ativo': 2}
+
+    db.virar_dia_buckets()
+
+    assert _buckets(db) == {'vencido': 1, 'alerta': 2, 'renovacao': 1, 'ativo': 1}
+    assert db.verificar_buckets_vencimento(corrigir=False) == {}
+    # Escritas depois da virada usam a nova referência
+    db.add_atleta("Novo", "", "", None, HOJE.isoformat(), "Mensal", 10000, "")
+    assert db.verificar_buckets_vencimento(corrigir=False) == {}
@@ -0,0 +1,60 @@
+import csv
+import io
+from datetime import date, timedelta
+
+import pytest
+
+HOJE = date(2024, 6, 30)
+
+# Dias de atraso -> valor do plano (KZ); quem vence hoje ainda não está em atraso
+ATRASOS = {0: 5, 1: 1, 30: 30, 31: 31, 60: 60, 61: 61, 90: 90, 91: 91, 400: 400}
+
+
+@pytest.fixture
+def ids(db):
+    ids = {dias: db.add_atleta(f"Atleta {dias}", "", "", None,
+                               (HOJE - timedelta(days=dias)).isoformat(), "Mensal", valor, "")
+           for dias, valor in ATRASOS.items()}
+    # Arquivado não entra na inadimplência
+    arquivado = db.add_atleta("Arquivado", "", "", None, (HOJE - timedelta(days=45)).isoformat(),
+                              "Mensal", 1000, "")
+    db.arquivar_atletas([arquivado])
+    return ids
+
+
+def test_faixas_de_atraso_nas_bordas(db, ids):
+    aging = db.get_aging_recebiveis(hoje=HOJE)
+
+    assert aging['faixa'].tolist() == ['0-30', '31-60', '61-90', '90+']
+    assert aging['atletas'].tolist() == [2, 2, 2, 2]
+    assert aging['valor_em_aberto'].tolist() == [31.0, 91.0, 151.0, 491.0]
+
+
+def test_lista_por_faixa_bate_com_o_resumo(db, ids):
+    aging = db.get_aging_recebiveis(hoje=HOJE).set_index('faixa')
+
+    for faixa, esperado in (('0-30', [30, 1]), ('31-60', [60, 31]), ('61-90', [90, 61]),
+                            ('90+', [400, 91])):
+        lista = db.get_recebiveis_em_atraso(faixa, hoje=HOJE)
+        assert lista['dias_atraso'].tolist() == esperado
+        assert (lista['faixa'] == faixa).all()
+        assert lista['valor_em_aberto'].sum() == aging.loc[faixa, 'valor_em_aberto']
+
+
+def test_pagamento_tira_o_atleta_da_inadimplencia(db, ids):
+    db.registrar_pagamento(ids[400], HOJE.isoformat(), 400, HOJE.strftime('%Y-%m'), "Dinheiro", "")
+
+    aging = db.get_aging_recebiveis(hoje=HOJE).set_index('faixa')
+    assert aging.loc['90+', 'atletas'] == 1
+    assert ids[400] not in db.get_recebiveis_em_atraso(hoje=HOJE)['id'].tolist()
+
+
+def test_csv_exportado_traz_todos_os_atrasados(db, ids):
+    texto = db.get_recebiveis_em_atraso(hoje=HOJE).to_csv(index=False)
+
+    linhas = list(csv.DictReader(io.StringIO(texto)))
+    assert list(linhas[0]) == ['id', 'nome', 'telefone', 'email', 'plano', 'data_vencimento',
+                               'dias_atraso', 'faixa', 'valor_em_aberto']
+    # Mais antigos primeiro
+    assert [int(linha['dias_atraso']) for linha in linhas] == [400, 91, 90, 61, 60, 31, 30, 1]
+    assert linhas[0]['faixa'] == '90+' and float(linhas[0]['valor_em_aberto']) == 400.0
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import logging
+from datetime import date, timedelta
+
+import pytest
+
+from api import ApiGymMaster
+from filiais import RoteadorFiliais
+
+TOKEN = "segredo"
+
+
+@pytest.fixture
+def roteador(tmp_path):
+    roteador = RoteadorFiliais(db_name=str(tmp_path / "academia.db"), pasta=str(tmp_path / "filiais"))
+    yield roteador
+    roteador.parar_registradores()
+    for db, _ in roteador._abertas.values():
+        db.fechar()
+
+
+@pytest.fixture
+def app(roteador):
+    app = ApiGymMaster(roteador, token=TOKEN, max_threads=2)
+    yield app
+    app._executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def atleta_id(roteador):
+    vencimento = (date.today() + timedelta(days=10)).isoformat()
+    return roteador.obter(1).add_atleta("Atleta", "", "", None, vencimento, "Mensal", 10000, "")
+
+
+def _chamar(app, metodo, caminho, corpo=None, token=TOKEN, consulta=""):
+    """Chama a aplicação direto pelo protocolo ASGI; retorna (status, JSON)"""
+    enviadas = []
+    recebidas = [{'type': 'http.request', 'more_body': False,
+                  'body': corpo if isinstance(corpo, bytes) else json.dumps(corpo or {}).encode()}]
+
+    async def receive():
+        return recebidas.pop(0)
+
+    async def send(mensagem):
+        enviadas.append(mensagem)
+
+    scope = {'type': 'http', 'method': metodo, 'path': caminho,
+             'query_string': consulta.encode(),
+             'headers': [(b'authorization', f"Bearer {token}".encode())] if token else []}
+    asyncio.run(app(scope, receive, send))
+    inicio, corpo_resposta = enviadas
+    assert dict(inicio['headers'])[b'content-type'].startswith(b'application/json')
+    return inicio['status'], json.loads(corpo_resposta['body'])
+
+
+def _lifespan(app, *eventos):
+    recebidas = [{'type': f'lifespan.{evento}'} for evento in eventos]
+    enviadas = []
+
+    async def receive():
+        return recebidas.pop(0)
+
+    async def send(mensagem):
+        enviadas.append(mensagem['type'])
+
+    asyncio.run(app({'type': 'lifespan'}, receive, send))
+    return enviadas
+
+
+@pytest.mark.parametrize("token", [None, "errado"])
+def test_token_ausente_ou_errado_e_recusado(app, token):
+    assert _chamar(app, 'GET', '/saude', token=token) == (401, {'erro': "Token inválido ou ausente"})
+
+
+def test_rotas(app, atleta_id):
+    assert _chamar(app, 'GET', '/saude') == (200, {'status': 'ok'})
+    assert _chamar(app, 'GET', '/nada')[0] == 404
+    assert _chamar(app, 'DELETE', '/saude')[0] == 405
+    assert _chamar(app, 'GET', '/atletas')[0] == 400
+    assert _chamar(app, 'GET', '/atletas', consulta="q=Atl")[1]['atletas'][0]['id'] == atleta_id
+    assert _chamar(app, 'GET', '/atletas/999')[0] == 404
+    assert _chamar(app, 'GET', f'/acesso/{atleta_id}', consulta="filial=99")[0] == 404
+
+    status, pagamento = _chamar(app, 'POST', '/pagamentos', {'atleta_id': atleta_id, 'valor': 100})
+    assert status == 201 and pagamento['pagamento_id'] == 1
+    for caminho in (f'/atletas/{atleta_id}', f'/acesso/{atleta_id}'):
+        assert _chamar(app, 'GET', caminho)[1]['data_vencimento'] == pagamento['data_vencimento']
+    assert _chamar(app, 'POST', '/pagamentos', b'{nao e json')[0] == 400
+    assert _chamar(app, 'POST', '/pagamentos', {'atleta_id': atleta_id, 'valor': -1})[0] == 422
+    assert _chamar(app, 'POST', '/frequencia', {'atleta_id': atleta_id})[0] == 202
+
+
+def test_erro_interno_nao_vaza_a_mensagem(app, roteador, monkeypatch, caplog):
+    def falhar():
+        raise RuntimeError("detalhe interno do banco")
+
+    monkeypatch.setattr(roteador.obter(1), 'get_meta_receita', falhar)
+
+    with caplog.at_level(logging.ERROR, logger='gymmaster.api'):
+        assert _chamar(app, 'GET', '/kpis') == (500, {'erro': "Erro interno"})
+    assert "detalhe interno do banco" in caplog.text
+
+
+def test_lifespan(app):
+    assert _lifespan(app, 'startup', 'shutdown') == [
+        'lifespan.startup.complete', 'lifespan.shutdown.complete']
+
+
+def test_lifespan_falha_ao_carregar_o_indice(app, roteador, monkeypatch):
+    def falhar(filial_id):
+        raise RuntimeError("banco indisponível")
+
+    monkeypatch.setattr(roteador, 'indice_acesso', falhar)
+
+    assert _lifespan(app, 'startup') == ['lifespan.startup.failed']
@@ -0,0 +1,211 @@
+import os
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import arquivo
+
+from filiais import RoteadorFiliais
+from relatorios import MotorRelatorios
+
+HOJE = date.today()
+ANTIGO = HOJE.year - 3
+
+
+@pytest.fixture
+def roteador(tmp_path):
+    roteador = RoteadorFiliais(db_name=str(tmp_path / "academia.db"), pasta=str(tmp_path / "filiais"))
+    yield roteador
+    for db, _ in roteador._abertas.values():
+        db.fechar()
+
+
+def _popular(db):
+    """Dois atletas com pagamentos no ano antigo (um no mesmo dia) e no ano atual"""
+    vencimento = (HOJE + timedelta(days=40)).isoformat()
+    ids = [db.add_atleta(f"Atleta {i}", "", "", None, vencimento, "Mensal", 10000, "")
+           for i in range(2)]
+    pagamentos = [(ids[0], date(ANTIGO, 3, 5), 1000, "Dinheiro"),
+                  (ids[0], date(ANTIGO, 3, 5), 1500, "Multicaixa"),
+                  (ids[1], date(ANTIGO, 7, 1), 2000, "Dinheiro"),
+                  (ids[0], date(ANTIGO, 11, 20), 2500, None),
+                  (ids[0], date(HOJE.year, 1, 1), 3000, "Dinheiro"),
+                  (ids[1], HOJE, 3500, "Transferência")]
+    for atleta_id, dia, valor, forma in pagamentos:
+        db.registrar_pagamento(atleta_id, dia.isoformat(), valor, dia.strftime('%Y-%m'), forma, "")
+    return ids
+
+
+def _historico_completo(db, atleta_id):
+    paginas, cursor = [], None
+    while True:
+        pagina, resumo, cursor = db.get_historico_pagamentos_atleta(atleta_id, limite=2, cursor=cursor)
+        paginas.extend(pagina[['id', 'data_pagamento', 'valor', 'forma_pagamento']]
+                       .itertuples(index=False, name=None))
+        if cursor is None:
+            return paginas, resumo
+
+
+def _leituras(roteador, motor, ids):
+    db = roteador.obter(1)
+    leituras = {}
+    for filtros in ({}, {'atleta_id': ids[0]}, {'forma_pagamento': 'Dinheiro'},
+                    {'mes_referencia': f"{ANTIGO}-03"},
+                    {'atleta_id': ids[0], 'forma_pagamento': 'Dinheiro'}):
+        paginas = [db.buscar_pagamentos(**filtros, limite=2, offset=offset) for offset in (0, 2, 4)]
+        leituras[('busca', *filtros)] = (
+            paginas[0][1], [tuple(pagina['id']) for pagina, _ in paginas])
+    for atleta_id in ids:
+        leituras[('historico', atleta_id)] = _historico_completo(db, atleta_id)
+    for modo in ('attach', 'processos'):
+        receita, _ = motor.receita_consolidada(f"{ANTIGO}-03-01", HOJE, modo=modo)
+        leituras[('relatorio', modo)] = sorted(
+            receita.fillna({'forma_pagamento': ''}).itertuples(index=False, name=None))
+    return leituras
+
+
+def test_arquivar_um_ano_nao_muda_as_leituras(roteador):
+    db = roteador.obter(1)
+    ids = _popular(db)
+    motor = MotorRelatorios(roteador, max_processos=1)
+    try:
+        antes = _leituras(roteador, motor, ids)
+
+        assert db.arquivo.arquivar_ano(ANTIGO) == 4
+        conn = sqlite3.connect(db.db_name)
+        assert conn.execute("SELECT COUNT(*) FROM pagamentos").fetchone()[0] == 2
+        conn.close()
+
+        assert _leituras(roteador, motor, ids) == antes
+    finally:
+        motor.fechar()
+
+
+def test_historico_so_do_arquivo(db):
+    atleta_id = db.add_atleta("Atleta", "", "", None, HOJE.isoformat(), "Mensal", 10000, "")
+    db.registrar_pagamento(atleta_id, f"{ANTIGO}-06-01", 700, f"{ANTIGO}-06", "Dinheiro", "")
+    db.arquivo.arquivar_ano(ANTIGO)
+
+    pagina, resumo, cursor = db.get_historico_pagamentos_atleta(atleta_id)
+
+    assert pagina['valor'].tolist() == [700]
+    assert resumo['total_pagamentos'] == 1 and resumo['valor_total'] == 700
+    assert (resumo['ultimo_pagamento'], resumo['ultimo_valor']) == (f"{ANTIGO}-06-01", 700)
+    assert cursor is None
+
+
+def test_migracao_resume_por_dia_os_anos_ja_arquivados(db):
+    atleta_id = db.add_atleta("Atleta", "", "", None, HOJE.isoformat(), "Mensal", 10000, "")
+    for forma in ("Dinheiro", "Dinheiro", None):
+        db.registrar_pagamento(atleta_id, f"{ANTIGO}-06-01", 100, f"{ANTIGO}-06", forma, "")
+    db.arquivo.arquivar_ano(ANTIGO)
+    conn = sqlite3.connect(db.db_name)
+    esperado = conn.execute("SELECT * FROM pagamentos_arquivados_por_dia ORDER BY 2").fetchall()
+    # Banco arquivado antes de existir o resumo por dia
+    conn.execute("DROP TABLE pagamentos_arquivados_por_dia")
+    conn.commit()
+
+    db.migrate_database()
+
+    assert conn.execute("SELECT * FROM pagamentos_arquivados_por_dia ORDER BY 2").fetchall() == esperado
+    assert esperado == [(f"{ANTIGO}-06-01", "", 1, 10000), (f"{ANTIGO}-06-01", "Dinheiro", 2, 20000)]
+    conn.close()
+
+
+def test_busca_le_do_arquivo_so_os_pagamentos_da_pagina(db, monkeypatch):
+    monkeypatch.setattr(arquivo, 'LINHAS_POR_GRUPO', 2)
+    atleta_id = db.add_atleta("Atleta", "", "", None, HOJE.isoformat(), "Mensal", 10000, "")
+    for mes in range(1, 9):
+        db.registrar_pagamento(atleta_id, f"{ANTIGO}-{mes:02d}-10", mes, f"{ANTIGO}-{mes:02d}",
+                               "Dinheiro", "")
+    db.arquivo.arquivar_ano(ANTIGO)
+    # Retroativo: fica na tabela, no meio dos arquivados
+    retroativo = db.registrar_pagamento(atleta_id, f"{ANTIGO}-06-20", 100, f"{ANTIGO}-06",
+                                        "Dinheiro", "")
+    recente = db.registrar_pagamento(atleta_id, HOJE.isoformat(), 200, HOJE.strftime('%Y-%m'),
+                                     "Dinheiro", "")
+    blocos = []
+    ler_recentes = db.arquivo.ler_recentes
+
+    def contar(*args, **kwargs):
+        for bloco in ler_recentes(*args, **kwargs):
+            blocos.append(len(bloco))
+            yield bloco
+
+    monkeypatch.setattr(db.arquivo, 'ler_recentes', contar)
+
+    pagina, totais = db.buscar_pagamentos(limite=1)
+    assert pagina['id'].tolist() == [recente] and blocos == []
+    assert (totais['total_pagamentos'], totais['valor_total']) == (10, 336)
+
+    pagina, _ = db.buscar_pagamentos(limite=2, offset=2)
+    assert pagina['data_pagamento'].tolist() == [f"{ANTIGO}-07-10", f"{ANTIGO}-06-20"]
+    assert pagina['id'].iloc[1] == retroativo
+    # Dois grupos de duas linhas bastam (meses 8 a 5); os meses 1 a 4 não são lidos
+    assert blocos == [2, 2]
+
+
+def _resumos(db):
+    conn = sqlite3.connect(db.db_name)
+    resumos = [conn.execute(f"SELECT * FROM {tabela} ORDER BY 1, 2").fetchall()
+               for tabela in ('pagamentos_arquivados_por_mes', 'pagamentos_arquivados_por_dia',
+                              'pagamentos_arquivados_por_atleta')]
+    conn.close()
+    return resumos
+
+
+def test_excluir_atleta_tira_os_arquivados_dos_resumos(db):
+    ids = _popular(db)
+    db.arquivo.arquivar_ano(ANTIGO)
+
+    db.excluir_atleta(ids[1])
+
+    por_mes, por_dia, por_atleta = _resumos(db)
+    assert por_mes == [(f"{ANTIGO}-03", 2, 250000, 100000), (f"{ANTIGO}-11", 1, 250000, 0)]
+    assert por_dia == [(f"{ANTIGO}-03-05", "Dinheiro", 1, 100000),
+                       (f"{ANTIGO}-03-05", "Multicaixa", 1, 150000),
+                       (f"{ANTIGO}-11-20", "", 1, 250000)]
+    assert [linha[0] for linha in por_atleta] == [ids[0]]
+    assert db.buscar_pagamentos()[1]['total_pagamentos'] == 4
+
+    # Exclusão em massa passa pelo mesmo desconto
+    assert db.excluir_atletas([ids[0]]) == 1
+    assert _resumos(db) == [[], [], []]
+    assert db.buscar_pagamentos()[1]['total_pagamentos'] == 0
+
+
+def test_arquivo_substituido_fica_ate_a_limpeza(db):
+    ids = _popular(db)
+    db.arquivo.arquivar_ano(ANTIGO)
+    antigo = db.arquivo.anos_arquivados()['arquivo'][0]
+    db.registrar_pagamento(ids[1], f"{ANTIGO}-09-09", 100, f"{ANTIGO}-09", "Dinheiro", "")
+
+    assert db.arquivo.arquivar_ano(ANTIGO) == 1
+    atual = db.arquivo.anos_arquivados()['arquivo'][0]
+    # Quem leu o catálogo antes do commit ainda consegue abrir o arquivo antigo
+    assert atual != antigo and os.path.exists(antigo)
+    assert db.arquivo.limpar_arquivos_antigos() == 0
+
+    assert db.arquivo.limpar_arquivos_antigos(carencia=0) == 1
+    assert not os.path.exists(antigo) and os.path.exists(atual)
+    assert db.buscar_pagamentos()[1]['total_pagamentos'] == 7
+
+
+@pytest.mark.parametrize("particionado", [False, True])
+def test_arquivar_sobe_as_versoes_uma_vez(db, particionado):
+    ids = _popular(db)
+    if particionado:
+        db.particoes.particionar()
+    db.set_cache_coortes(f"{ANTIGO}-12", "{}")
+    antes = db.cache.versoes()
+
+    db.arquivo.arquivar_ano(ANTIGO)
+
+    depois = db.cache.versoes()
+    assert depois['pagamentos'] == antes['pagamentos'] + 1
+    assert depois['cache_coortes'] == antes['cache_coortes'] + 1
+    assert db.get_cache_coortes(f"{ANTIGO}-12") is None
+    # Os triggers voltam para as exclusões seguintes
+    db.excluir_atleta(ids[1])
+    assert db.cache.versoes()['pagamentos'] > depois['pagamentos']
@@ -0,0 +1,22 @@
+from datetime import date, timedelta
+
+
+def test_busca_sem_filtros_le_a_pagina_pelo_indice(db):
+    hoje = date.today()
+    atleta_id = db.add_atleta("Atleta", "", "", None, hoje.isoformat(), "Mensal", 10000, "")
+    for dias in (3, 1, 1, 2):
+        dia = hoje - timedelta(days=dias)
+        db.registrar_pagamento(atleta_id, dia.isoformat(), dias, dia.strftime('%Y-%m'), "Dinheiro", "")
+
+    pagina, totais = db.buscar_pagamentos(limite=3)
+
+    assert pagina['id'].tolist() == [3, 2, 4]
+    assert (totais['total_pagamentos'], totais['valor_total']) == (4, 7)
+
+    conn = db.get_connection()
+    plano = [linha[-1] for linha in conn.execute('''
+        EXPLAIN QUERY PLAN
+        SELECT id FROM pagamentos ORDER BY data_pagamento DESC, id DESC LIMIT 50
+    ''')]
+    conn.close()
+    assert plano == ["SCAN pagamentos USING COVERING INDEX idx_pagamentos_data_id"]
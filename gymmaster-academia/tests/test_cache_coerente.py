@@ -0,0 +1,51 @@
+import sqlite3
+from datetime import date, timedelta
+
+HOJE = date.today()
+
+
+def _outro_processo(db, sql, *params):
+    """Escrita por uma conexão que não é do DatabaseManager (outro worker ou processo)"""
+    conn = sqlite3.connect(db.db_name)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_escrita_de_outra_conexao_invalida_o_cache(db):
+    atleta_id = db.add_atleta("Antes", "", "", None, HOJE.isoformat(), "Mensal", 10000, "")
+    db.get_all_atletas()
+    db.get_meta_receita()
+    token = db.get_versao_dados('atletas')
+
+    assert db.get_all_atletas()['nome'].tolist() == ["Antes"]
+    falhas = db.cache.falhas
+
+    _outro_processo(db, "UPDATE atletas SET nome = 'Depois' WHERE id = ?", atleta_id)
+
+    assert db.get_versao_dados('atletas') != token
+    assert db.get_all_atletas()['nome'].tolist() == ["Depois"]
+    assert db.cache.falhas == falhas + 1
+    # Só as entradas das tabelas alteradas saem do cache
+    acertos = db.cache.acertos
+    db.get_meta_receita()
+    assert db.cache.acertos == acertos + 1
+
+
+def test_cache_de_coortes_so_grava_na_versao_lida(db):
+    atleta_id = db.add_atleta("Atleta", "", "", None, HOJE.isoformat(), "Mensal", 10000, "")
+    mes = HOJE.strftime('%Y-%m')
+    versao = db.cache.versoes()['cache_coortes']
+
+    # Pagamento num mês fechado, gravado por outra conexão, invalida as coortes
+    passado = HOJE.replace(day=1) - timedelta(days=1)
+    _outro_processo(db, '''
+        INSERT INTO pagamentos (atleta_id, data_pagamento, valor_centavos, mes_referencia)
+        VALUES (?, ?, 100, ?)
+    ''', atleta_id, passado.isoformat(), passado.strftime('%Y-%m'))
+
+    assert not db.set_cache_coortes(mes, '{}', versao)
+    assert db.get_cache_coortes(mes) is None
+
+    assert db.set_cache_coortes(mes, '{}', db.cache.versoes()['cache_coortes'])
+    assert db.get_cache_coortes(mes) == '{}'
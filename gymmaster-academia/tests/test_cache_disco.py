@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from cache_disco import CacheDisco, serializar
+
+VALOR = b"x" * 1000
+TAMANHO = len(serializar(VALOR))
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def test_lru_expulsa_as_menos_usadas_pelo_tamanho(arquivo):
+    cache = CacheDisco(arquivo, limite_bytes=3 * TAMANHO)
+    cache.RESOLUCAO_LRU = 0
+    for chave in "abc":
+        cache.gravar(chave, VALOR)
+        time.sleep(0.01)
+    cache.obter("a", lambda: pytest.fail("'a' está no cache"))
+
+    cache.gravar("d", VALOR)
+
+    chaves = [chave for chave, in cache._conexao().execute("SELECT chave FROM entradas ORDER BY 1")]
+    assert chaves == ["a", "c", "d"]
+    assert cache.estatisticas()['bytes'] == 3 * TAMANHO
+
+
+def test_entrada_vencida_e_recalculada(arquivo):
+    cache = CacheDisco(arquivo, ttl=0.05)
+    calculos = []
+
+    def calcular():
+        calculos.append(1)
+        return len(calculos)
+
+    assert cache.obter("chave", calcular) == 1
+    assert cache.obter("chave", calcular) == 1
+    time.sleep(0.1)
+    assert cache.obter("chave", calcular) == 2
+    assert (cache.acertos, cache.falhas) == (1, 2)
+
+
+@pytest.mark.parametrize("vencido", [True, False])
+def test_so_um_worker_recalcula(arquivo, vencido):
+    recalculando, liberar = threading.Event(), threading.Event()
+    workers = [CacheDisco(arquivo, ttl=0.05, espera=0.01) for _ in range(2)]
+    if vencido:
+        workers[0].gravar("chave", "antigo")
+        time.sleep(0.1)
+    calculos, resultados = [], {}
+
+    def calcular():
+        calculos.append(1)
+        recalculando.set()
+        liberar.wait(5)
+        return "novo"
+
+    def obter(i):
+        resultados[i] = workers[i].obter("chave", calcular)
+
+    primeiro = threading.Thread(target=obter, args=(0,))
+    primeiro.start()
+    recalculando.wait(5)
+    segundo = threading.Thread(target=obter, args=(1,))
+    segundo.start()
+    if vencido:
+        # Quem não tem a trava recebe o valor vencido sem esperar
+        segundo.join(5)
+        assert resultados[1] == "antigo" and workers[1].vencidos_servidos == 1
+    liberar.set()
+    primeiro.join(5)
+    segundo.join(5)
+
+    assert len(calculos) == 1
+    assert resultados[0] == "novo"
+    assert resultados[1] == ("antigo" if vencido else "novo")
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+
+import plotly.express as px
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import previsao
+from agendador import Agendador
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def _inserir_pagamento():
+    conn = sqlite3.connect("academia.db")
+    conn.execute("INSERT INTO pagamentos (atleta_id, data_pagamento, valor, mes_referencia) "
+                 "VALUES (1, date('now'), 5000, strftime('%Y-%m', 'now'))")
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def construcoes(tmp_path, monkeypatch):
+    """Conta quantas vezes o dashboard monta cada figura e calcula a previsão"""
+    monkeypatch.chdir(tmp_path)
+    # Sem o agendador: as tarefas de fundo mudariam as versões entre as execuções
+    monkeypatch.setattr(Agendador, 'iniciar', lambda self: None)
+    monkeypatch.setattr(Agendador, 'executar_agora', lambda self, nome: None)
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+    contagem = {'line': 0, 'bar': 0, 'previsao': 0}
+
+    def contar(nome, funcao):
+        def contada(*args, **kwargs):
+            contagem[nome] += 1
+            return funcao(*args, **kwargs)
+        return contada
+
+    monkeypatch.setattr(px, 'line', contar('line', px.line))
+    monkeypatch.setattr(px, 'bar', contar('bar', px.bar))
+    monkeypatch.setattr(previsao, 'prever_receita', contar('previsao', previsao.prever_receita))
+
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.session_state['logged_in'] = True
+    at.session_state['usuario'] = {'id': 1, 'nome': 'T', 'email': 't@t', 'telefone': '',
+                                   'tipo': 'admin'}
+    at.run()
+    conn = sqlite3.connect("academia.db")
+    conn.execute("INSERT INTO atletas (nome, data_vencimento) VALUES ('Atleta', date('now', '+60 days'))")
+    conn.commit()
+    conn.close()
+    _inserir_pagamento()
+    yield at, contagem
+    st.cache_resource.clear()
+
+
+def _construidas(contagem, antes):
+    return {nome: contagem[nome] - antes[nome] for nome in contagem}
+
+
+def test_rerun_sem_mudanca_reaproveita_figuras_e_previsao(construcoes):
+    at, contagem = construcoes
+    at.run()
+    assert not at.exception
+    antes = dict(contagem)
+
+    at.run()
+    at.run()
+
+    assert _construidas(contagem, antes) == {'line': 0, 'bar': 0, 'previsao': 0}
+
+
+def test_pagamento_novo_refaz_so_o_que_depende_de_pagamentos(construcoes):
+    at, contagem = construcoes
+    at.run()
+    antes = dict(contagem)
+    _inserir_pagamento()
+
+    at.run()
+
+    assert not at.exception
+    # O gráfico de status só depende de atletas
+    assert _construidas(contagem, antes) == {'line': 1, 'bar': 0, 'previsao': 1}
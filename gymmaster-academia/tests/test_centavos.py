@@ -0,0 +1,86 @@
+import sqlite3
+
+from database import DatabaseManager
+
+
+def _consultar(db, sql):
+    conn = sqlite3.connect(db.db_name)
+    linhas = conn.execute(sql).fetchall()
+    conn.close()
+    return linhas
+
+
+def _executar(db, sql):
+    conn = sqlite3.connect(db.db_name)
+    conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+
+def test_centavos_sao_a_fonte_da_verdade(db):
+    _executar(db, "INSERT INTO atletas (id, nome, valor_plano_centavos) VALUES (1, 'Só cêntimos', 750050)")
+    _executar(db, "INSERT INTO atletas (id, nome, valor_plano_centavos) VALUES (2, 'Padrão', 1000000)")
+    _executar(db, "INSERT INTO atletas (id, nome, valor_plano, valor_plano_centavos) VALUES (3, 'Os dois', 1, 250000)")
+    _executar(db, "UPDATE atletas SET valor_plano = 1, valor_plano_centavos = 330000 WHERE id = 2")
+
+    assert _consultar(db, "SELECT id, valor_plano, valor_plano_centavos FROM atletas ORDER BY id") == [
+        (1, 7500.5, 750050), (2, 3300.0, 330000), (3, 2500.0, 250000)]
+
+
+def test_integracoes_que_gravam_so_o_real(db):
+    _executar(db, "INSERT INTO atletas (id, nome, valor_plano) VALUES (1, 'Legado', 8000.25)")
+    _executar(db, "INSERT INTO atletas (id, nome) VALUES (2, 'Sem valor')")
+    _executar(db, "UPDATE atletas SET valor_plano = 9000 WHERE id = 2")
+
+    assert _consultar(db, "SELECT id, valor_plano, valor_plano_centavos FROM atletas ORDER BY id") == [
+        (1, 8000.25, 800025), (2, 9000.0, 900000)]
+
+
+def test_pagamentos_sem_valor_padrao(db):
+    _executar(db, "INSERT INTO atletas (id, nome) VALUES (1, 'Atleta')")
+    _executar(db, "INSERT INTO pagamentos (id, atleta_id, valor_centavos) VALUES (1, 1, 12345)")
+    _executar(db, "INSERT INTO pagamentos (id, atleta_id, valor) VALUES (2, 1, 99.9)")
+    _executar(db, "UPDATE pagamentos SET valor_centavos = 500 WHERE id = 2")
+
+    assert _consultar(db, "SELECT id, valor, valor_centavos FROM pagamentos ORDER BY id") == [
+        (1, 123.45, 12345), (2, 5.0, 500)]
+
+
+def test_migracao_converte_datas_legadas_e_registra_o_resto(tmp_path):
+    arquivo = str(tmp_path / "legado.db")
+    conn = sqlite3.connect(arquivo)
+    conn.executescript('''
+        CREATE TABLE atletas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, telefone TEXT, email TEXT,
+            data_cadastro DATE DEFAULT CURRENT_DATE, data_vencimento DATE,
+            status TEXT DEFAULT 'ativo', observacoes TEXT, plano TEXT DEFAULT 'Mensal',
+            valor_plano REAL DEFAULT 10000.00
+        );
+        CREATE TABLE pagamentos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, atleta_id INTEGER,
+            data_pagamento DATE DEFAULT CURRENT_DATE, valor REAL, mes_referencia TEXT,
+            forma_pagamento TEXT, observacoes TEXT
+        );
+        INSERT INTO atletas (id, nome, data_cadastro, data_vencimento, valor_plano) VALUES
+            (1, 'A', '2023-01-05 10:00:00', '05/02/2024', 5000),
+            (2, 'B', '2023/01/06', 'amanhã', 6000.5),
+            (3, 'C', '31/02/2024', '2024-03-01', 7000);
+        INSERT INTO pagamentos (atleta_id, data_pagamento, valor) VALUES (1, '10-01-2024', 5000);
+    ''')
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(db_name=arquivo)
+    try:
+        assert _consultar(db, '''
+            SELECT id, data_cadastro, data_vencimento, valor_plano_centavos FROM atletas ORDER BY id
+        ''') == [(1, '2023-01-05', '2024-02-05', 500000),
+                 (2, '2023-01-06', 'amanhã', 600050),
+                 (3, '31/02/2024', '2024-03-01', 700000)]
+        assert _consultar(db, "SELECT data_pagamento, valor_centavos FROM pagamentos") == [
+            ('2024-01-10', 500000)]
+        assert _consultar(db, "SELECT * FROM datas_invalidas ORDER BY linha_id") == [
+            ('atletas', 2, 'data_vencimento', 'amanhã'),
+            ('atletas', 3, 'data_cadastro', '31/02/2024')]
+    finally:
+        db.fechar()
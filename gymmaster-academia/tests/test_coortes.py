@@ -0,0 +1,76 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from coortes import _indice_mes, calcular_coortes, obter_coortes
+
+
+@pytest.fixture
+def resultado():
+    """Quatro atletas, meses fechados de janeiro a abril de 2024
+
+    A (jan, Mensal) paga jan e fev; B (jan, Trimestral) paga jan e fica
+    até mar; C (fev) nunca paga; D (mar) paga mar e mai, e maio ainda
+    não fechou.
+    """
+    atletas = pd.DataFrame({
+        'id': [1, 2, 3, 4],
+        'mes_cadastro': [_indice_mes(mes) for mes in ("2024-01", "2024-01", "2024-02", "2024-03")],
+        'plano': ["Mensal", "Trimestral", "Mensal", "Mensal"],
+    })
+    pagamentos = pd.DataFrame({
+        'atleta_id': [1, 1, 2, 4, 4],
+        'mes': [_indice_mes(mes) for mes in ("2024-01", "2024-02", "2024-01", "2024-03", "2024-05")],
+    })
+    return calcular_coortes(atletas, pagamentos, "2024-05")
+
+
+def test_retencao_e_sobrevivencia_por_coorte(resultado):
+    assert resultado['tamanhos']['atletas'].to_dict() == {"2024-01": 2, "2024-02": 1, "2024-03": 1}
+
+    nan = np.nan
+    np.testing.assert_array_equal(resultado['retencao'].to_numpy(), [
+        [1.0, 1.0, 0.5, 0.0],
+        [0.0, 0.0, 0.0, nan],
+        [1.0, 0.0, nan, nan],
+    ])
+    np.testing.assert_array_equal(resultado['sobrevivencia'].to_numpy(), [
+        [1.0, 1.0, 0.5, 0.0],
+        [0.0, 0.0, 0.0, nan],
+        [1.0, 0.0, nan, nan],
+    ])
+
+
+def test_curva_pondera_so_as_coortes_observadas(resultado):
+    curva = resultado['curva']
+
+    assert curva['atletas_observados'].tolist() == [4, 4, 3, 2]
+    np.testing.assert_allclose(curva['retencao'], [3 / 4, 2 / 4, 1 / 3, 0.0])
+
+
+def test_churn_mensal(resultado):
+    churn = resultado['churn']
+
+    # Mar: A sai; abr: B (fim do trimestre) e D (o pagamento de maio não conta)
+    assert churn['mes'].tolist() == ["2024-02", "2024-03", "2024-04"]
+    assert churn['ativos_inicio'].tolist() == [2, 2, 2]
+    assert churn['perdidos'].tolist() == [0, 1, 2]
+    assert churn['churn'].tolist() == [0.0, 0.5, 1.0]
+
+
+def test_cache_so_cai_com_escrita_em_mes_fechado(db):
+    hoje = date.today()
+    mes_atual = hoje.strftime('%Y-%m')
+    mes_passado = (hoje.replace(day=1) - pd.Timedelta(days=1)).strftime('%Y-%m')
+    atleta_id = db.add_atleta("Atleta", "", "", None, hoje.isoformat(), "Mensal", 10000, "")
+    obter_coortes(db)
+    assert db.get_cache_coortes(mes_atual) is not None
+
+    # O mês corrente não entra na análise: o cache continua valendo
+    db.registrar_pagamento(atleta_id, hoje.isoformat(), 100, mes_atual, "Dinheiro", "")
+    assert db.get_cache_coortes(mes_atual) is not None
+
+    db.registrar_pagamento(atleta_id, hoje.isoformat(), 100, mes_passado, "Dinheiro", "")
+    assert db.get_cache_coortes(mes_atual) is None
@@ -0,0 +1,78 @@
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+HOJE = date.today()
+VENCIMENTO = (HOJE + timedelta(days=30)).isoformat()
+
+
+def _editar(db, atleta_id, nome, versao):
+    return db.update_atleta(atleta_id, nome, "", "", None, VENCIMENTO, "Mensal", 10000, "",
+                            versao=versao)
+
+
+@pytest.fixture
+def atleta_id(db):
+    return db.add_atleta("Original", "", "", None, VENCIMENTO, "Mensal", 10000, "")
+
+
+def _versao(db, atleta_id):
+    return int(db.get_atleta_by_id(atleta_id)['versao'])
+
+
+def test_segunda_edicao_com_versao_antiga_e_rejeitada(db, atleta_id):
+    lida = _versao(db, atleta_id)
+
+    assert _editar(db, atleta_id, "Primeira", lida)
+    assert not _editar(db, atleta_id, "Segunda", lida)
+
+    assert db.get_atleta_by_id(atleta_id)['nome'] == "Primeira"
+    assert _versao(db, atleta_id) == lida + 1
+    # Relendo a versão, a edição passa
+    assert _editar(db, atleta_id, "Segunda", lida + 1)
+
+
+def test_pagamento_registrado_invalida_edicao_aberta(db, atleta_id):
+    lida = _versao(db, atleta_id)
+    db.registrar_pagamento(atleta_id, HOJE.isoformat(), 100, HOJE.strftime('%Y-%m'), "Dinheiro", "")
+
+    # A edição gravaria o vencimento antigo por cima do estendido pelo pagamento
+    assert not _editar(db, atleta_id, "Editado", lida)
+    assert db.get_atleta_by_id(atleta_id)['data_vencimento'] == (
+        date.fromisoformat(VENCIMENTO) + timedelta(days=30)).isoformat()
+
+
+def test_sem_versao_a_ultima_escrita_vence(db, atleta_id):
+    _editar(db, atleta_id, "Primeira", None)
+
+    assert _editar(db, atleta_id, "Segunda", None)
+    assert db.get_atleta_by_id(atleta_id)['nome'] == "Segunda"
+
+
+def test_atleta_excluido_conta_como_conflito(db, atleta_id):
+    lida = _versao(db, atleta_id)
+    db.excluir_atleta(atleta_id)
+
+    assert not _editar(db, atleta_id, "Editado", lida)
+
+
+def test_edicoes_simultaneas_com_a_mesma_versao(db, atleta_id):
+    lida = _versao(db, atleta_id)
+    largada = threading.Barrier(4)
+    resultados = {}
+
+    def editar(nome):
+        largada.wait()
+        resultados[nome] = _editar(db, atleta_id, nome, lida)
+
+    threads = [threading.Thread(target=editar, args=(f"Sessão {i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    vencedores = [nome for nome, gravou in resultados.items() if gravou]
+    assert len(vencedores) == 1
+    assert db.get_atleta_by_id(atleta_id)['nome'] == vencedores[0]
+    assert _versao(db, atleta_id) == lida + 1
@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+
+import pytest
+
+from escritor import EscritorUnico
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    arquivo = str(tmp_path / "escritor.db")
+    conn = sqlite3.connect(arquivo)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("CREATE TABLE itens (id INTEGER PRIMARY KEY, nome TEXT)")
+    conn.close()
+    return arquivo
+
+
+@pytest.fixture
+def escritor(arquivo):
+    escritor = EscritorUnico(arquivo, timeout=0.2)
+    yield escritor
+    escritor.parar()
+
+
+def _inserir(conn, nome):
+    return conn.execute("INSERT INTO itens (nome) VALUES (?)", (nome,)).lastrowid
+
+
+def _falhar(conn, nome):
+    _inserir(conn, nome)
+    raise ValueError(nome)
+
+
+def _nomes(arquivo):
+    conn = sqlite3.connect(arquivo)
+    nomes = [nome for nome, in conn.execute("SELECT nome FROM itens ORDER BY id")]
+    conn.close()
+    return nomes
+
+
+def _segurar(escritor):
+    """Ocupa a thread do escritor até o Event retornado ser liberado"""
+    ocupado, liberar = threading.Event(), threading.Event()
+
+    def esperar(conn):
+        ocupado.set()
+        liberar.wait(5)
+
+    futuro = escritor.executar(esperar)
+    ocupado.wait(5)
+    return liberar, futuro
+
+
+def test_comandos_na_fila_vao_num_unico_commit(escritor, arquivo):
+    liberar, primeiro = _segurar(escritor)
+    futuros = [escritor.executar(_inserir, f"item {i}") for i in range(10)]
+
+    assert escritor.pendentes() == 10 and not any(futuro.done() for futuro in futuros)
+    liberar.set()
+
+    assert [futuro.result(5) for futuro in futuros] == list(range(1, 11))
+    primeiro.result(5)
+    assert (escritor.transacoes, escritor.comandos) == (2, 11)
+    # O resultado só chega depois do COMMIT: outra conexão já enxerga as linhas
+    assert len(_nomes(arquivo)) == 10
+
+
+def test_erro_de_um_comando_nao_desfaz_os_outros(escritor, arquivo):
+    liberar, _ = _segurar(escritor)
+    futuros = [escritor.executar(_inserir, "a"), escritor.executar(_falhar, "b"),
+               escritor.executar(_inserir, "c")]
+    liberar.set()
+
+    assert futuros[0].result(5) and futuros[2].result(5)
+    with pytest.raises(ValueError, match="b"):
+        futuros[1].result(5)
+    assert _nomes(arquivo) == ["a", "c"]
+    assert escritor.transacoes == 2
+
+
+def test_comando_chamado_de_dentro_de_outro_roda_na_mesma_transacao(escritor, arquivo):
+    def composto(conn):
+        interno = escritor.executar(_inserir, "interno")
+        assert interno.done()
+        return interno.result(), _inserir(conn, "externo")
+
+    assert escritor.executar(composto).result(5) == (1, 2)
+    assert escritor.transacoes == 1
+    assert _nomes(arquivo) == ["interno", "externo"]
+
+
+def test_parar_grava_a_fila_e_executar_reinicia(escritor, arquivo):
+    liberar, _ = _segurar(escritor)
+    pendente = escritor.executar(_inserir, "pendente")
+    liberar.set()
+    escritor.parar()
+
+    assert pendente.done() and _nomes(arquivo) == ["pendente"]
+    assert escritor.executar(_inserir, "depois").result(5) == 2
+
+
+def test_banco_travado_por_outro_processo_falha_o_lote_inteiro(escritor, arquivo):
+    outro = sqlite3.connect(arquivo, isolation_level=None)
+    outro.execute("BEGIN IMMEDIATE")
+    futuros = [escritor.executar(_inserir, nome) for nome in ("a", "b")]
+
+    for futuro in futuros:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            futuro.result(5)
+
+    outro.execute("ROLLBACK")
+    outro.close()
+    assert escritor.executar(_inserir, "c").result(5) == 1
+    assert _nomes(arquivo) == ["c"]
@@ -0,0 +1,116 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import filiais
+from filiais import RoteadorFiliais
+
+
+@pytest.fixture
+def roteador(tmp_path):
+    roteador = RoteadorFiliais(db_name=str(tmp_path / "academia.db"), pasta=str(tmp_path / "filiais"),
+                               max_abertas=2)
+    yield roteador
+    for db, _ in roteador._abertas.values():
+        db.fechar()
+
+
+def test_manutencao_nao_mexe_no_lru(roteador):
+    filiais = [roteador.criar_filial("Centro"), roteador.criar_filial("Norte")]
+    roteador.obter(1)
+    abertas = roteador.filiais_abertas()
+    assert abertas == [filiais[1], 1]
+    usadas = {}
+
+    def tarefa(db):
+        usadas[db.db_name] = db.add_atleta("Manutenção", "", "", None, "2030-01-01", "Mensal", 0, "")
+        return db.db_name
+
+    resultados = roteador.para_cada_filial(tarefa)
+
+    assert sorted(resultados) == [1, *filiais]
+    assert len(usadas) == 3
+    assert roteador.filiais_abertas() == abertas
+    # A filial fechada foi aberta só para a tarefa, e a escrita ficou gravada
+    atleta = roteador.obter(filiais[0]).get_atleta_by_id(usadas[resultados[filiais[0]]])
+    assert atleta['nome'] == "Manutenção"
+
+
+def test_aberturas_do_mesmo_processo_nao_se_sobrepoem(roteador, monkeypatch):
+    simultaneas, maximo, trava = [0], [0], threading.Lock()
+
+    class Medido(filiais.DatabaseManager):
+        def __init__(self, *args, **kwargs):
+            with trava:
+                simultaneas[0] += 1
+                maximo[0] = max(maximo[0], simultaneas[0])
+            time.sleep(0.05)
+            try:
+                super().__init__(*args, **kwargs)
+            finally:
+                with trava:
+                    simultaneas[0] -= 1
+
+    monkeypatch.setattr(filiais, 'DatabaseManager', Medido)
+    # Na partida o agendador roda a manutenção enquanto a primeira sessão abre a filial
+    threads = [threading.Thread(target=roteador.obter, args=(1,)),
+               threading.Thread(target=roteador.para_cada_filial, args=(lambda db: None,))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert maximo[0] == 1
+
+
+@pytest.fixture
+def fechadas(monkeypatch):
+    """Nomes dos bancos cujo pool foi fechado"""
+    nomes = []
+    fechar = filiais.DatabaseManager.fechar
+
+    def registrar(db):
+        nomes.append(db.db_name)
+        fechar(db)
+
+    monkeypatch.setattr(filiais.DatabaseManager, 'fechar', registrar)
+    return nomes
+
+
+def test_lru_fecha_a_filial_menos_usada(roteador, fechadas):
+    centro, norte = roteador.criar_filial("Centro"), roteador.criar_filial("Norte")
+    assert roteador.filiais_abertas() == [centro, norte]
+    roteador.indice_acesso(centro)
+
+    # Consultar o índice conta como uso: Norte passa a ser a menos usada
+    assert roteador.indice_carregado(centro) is not None
+    roteador.obter(1)
+
+    assert roteador.filiais_abertas() == [centro, 1]
+    assert fechadas == [roteador._arquivo_filial(norte)]
+
+    roteador.obter(norte)
+    assert roteador.filiais_abertas() == [1, norte]
+    # O índice some junto com o banco
+    assert roteador.indice_carregado(centro) is None
+
+
+def test_filiais_ociosas_sao_fechadas_e_reabertas(roteador, fechadas, monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(filiais, 'time', SimpleNamespace(monotonic=lambda: agora[0]))
+    roteador.ociosidade_maxima = 60
+    centro = roteador.criar_filial("Centro")
+    atleta_id = roteador.obter(centro).add_atleta("Atleta", "", "", None, "2030-01-01", "Mensal", 0, "")
+    agora[0] += 45
+    roteador.obter(1)
+
+    agora[0] += 30
+    assert roteador.fechar_ociosas() == 1
+    assert roteador.filiais_abertas() == [1]
+    assert fechadas == [roteador._arquivo_filial(centro)]
+
+    # A próxima sessão reabre o banco, com os dados preservados
+    assert roteador.obter(centro).get_atleta_by_id(atleta_id)['nome'] == "Atleta"
+    assert roteador.filiais_abertas() == [1, centro]
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App logado na tela de pagamentos, com banco e caches num diretório temporário"""
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.session_state['logged_in'] = True
+    at.session_state['usuario'] = {'id': 1, 'nome': 'T', 'email': 't@t', 'telefone': '',
+                                   'tipo': 'admin'}
+    at.run()
+    conn = sqlite3.connect("academia.db")
+    conn.execute("INSERT INTO atletas (nome, data_vencimento) VALUES ('Atleta', date('now'))")
+    conn.commit()
+    conn.close()
+    at.sidebar.selectbox[0].set_value("💰 Pagamentos").run()
+    yield at
+    st.cache_resource.clear()
+
+
+def _botao(at, rotulo):
+    return next(botao for botao in at.button if botao.label == rotulo)
+
+
+def _pagamentos():
+    conn = sqlite3.connect("academia.db")
+    total = conn.execute("SELECT COUNT(*) FROM pagamentos").fetchone()[0]
+    conn.close()
+    return total
+
+
+def test_dois_envios_seguidos_gravam_um_pagamento(app):
+    # O segundo clique chega numa nova execução do script, depois da primeira gravar
+    _botao(app, "💾 Registrar Pagamento").click().run()
+    chave = app.session_state['chave_pagamento']
+    _botao(app, "💾 Registrar Pagamento").click().run()
+
+    assert not app.exception
+    assert _pagamentos() == 1
+    assert app.session_state['chave_pagamento'] == chave
+    assert _botao(app, "💾 Registrar Pagamento").disabled
+
+
+def test_novo_registro_troca_a_chave(app):
+    _botao(app, "💾 Registrar Pagamento").click().run()
+    chave = app.session_state['chave_pagamento']
+
+    _botao(app, "➕ Registrar outro pagamento").click().run()
+    assert app.session_state['chave_pagamento'] != chave
+    _botao(app, "💾 Registrar Pagamento").click().run()
+
+    assert not app.exception
+    assert _pagamentos() == 2
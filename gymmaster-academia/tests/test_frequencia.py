@@ -0,0 +1,105 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import frequencia
+from frequencia import RegistradorFrequencia
+
+
+class ConexaoInstavel:
+    """Conexão cujas primeiras `falhas` gravações encontram o banco travado"""
+
+    def __init__(self, conn, falhas):
+        self._conn = conn
+        self.falhas = falhas
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *excecao):
+        return self._conn.__exit__(*excecao)
+
+    def executemany(self, *args):
+        if self.falhas:
+            self.falhas -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self._conn.executemany(*args)
+
+    def close(self):
+        self._conn.close()
+
+
+@pytest.fixture
+def lotes(monkeypatch):
+    """Tamanho de cada lote gravado"""
+    tamanhos = []
+    gravar = RegistradorFrequencia._gravar
+
+    def medir(self, conn, lote):
+        tamanhos.append(len(lote))
+        gravar(self, conn, lote)
+
+    monkeypatch.setattr(RegistradorFrequencia, '_gravar', medir)
+    return tamanhos
+
+
+def _por_hora(db):
+    conn = sqlite3.connect(db.db_name)
+    linhas = conn.execute("SELECT dia, hora, total FROM frequencia_por_hora ORDER BY 1, 2").fetchall()
+    conn.close()
+    return linhas
+
+
+def test_lote_cheio_grava_sem_esperar_o_intervalo(db, lotes):
+    registrador = RegistradorFrequencia(db.db_name, intervalo_ms=1000, tamanho_lote=500)
+    for i in range(1200):
+        registrador.registrar(1, f"2024-03-04 {7 + i % 2:02d}:15:00")
+    registrador.parar()
+
+    assert lotes == [500, 500, 200]
+    assert registrador.gravados == 1200
+    # O resumo por hora acompanha cada lote
+    assert _por_hora(db) == [("2024-03-04", 7, 600), ("2024-03-04", 8, 600)]
+
+
+def test_intervalo_grava_lote_parcial(db, lotes):
+    registrador = RegistradorFrequencia(db.db_name, intervalo_ms=20, tamanho_lote=500)
+    for _ in range(3):
+        registrador.registrar(1, "2024-03-04 07:15:00")
+    registrador.descarregar()
+
+    assert lotes == [3]
+    assert registrador.pendentes() == 0
+    registrador.parar()
+
+
+def _instavel(monkeypatch, falhas):
+    monkeypatch.setattr(frequencia, 'sqlite3', SimpleNamespace(
+        connect=lambda *args, **kwargs: ConexaoInstavel(sqlite3.connect(*args, **kwargs), falhas),
+        OperationalError=sqlite3.OperationalError, Error=sqlite3.Error))
+
+
+def test_banco_ocupado_tenta_de_novo(db, monkeypatch):
+    _instavel(monkeypatch, falhas=2)
+    registrador = RegistradorFrequencia(db.db_name, intervalo_ms=20, tentativas=3)
+    registrador.registrar(1, "2024-03-04 07:15:00")
+    registrador.parar()
+
+    assert (registrador.gravados, registrador.descartados) == (1, 0)
+    assert registrador.ultimo_erro == "database is locked"
+    assert _por_hora(db) == [("2024-03-04", 7, 1)]
+
+
+def test_lote_descartado_nao_trava_os_seguintes(db, monkeypatch):
+    _instavel(monkeypatch, falhas=3)
+    registrador = RegistradorFrequencia(db.db_name, intervalo_ms=20, tentativas=3)
+    registrador.registrar(1, "2024-03-04 07:15:00")
+    registrador.descarregar()
+    registrador.registrar(1, "2024-03-04 08:15:00")
+    registrador.parar()
+
+    assert (registrador.gravados, registrador.descartados) == (1, 1)
+    assert _por_hora(db) == [("2024-03-04", 8, 1)]
+    with pytest.raises(RuntimeError):
+        registrador.registrar(1)
@@ -0,0 +1,79 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+HOJE = date.today()
+
+
+@pytest.fixture
+def atletas(db):
+    """Dois atletas; o primeiro com sete pagamentos, dois deles no mesmo dia"""
+    vencimento = (HOJE + timedelta(days=30)).isoformat()
+    ids = [db.add_atleta(f"Atleta {i}", "", "", None, vencimento, "Mensal", 10000, "")
+           for i in range(2)]
+    dias = [HOJE - timedelta(days=d) for d in (200, 150, 100, 100, 60, 30, 1)]
+    for valor, dia in enumerate(dias, start=1):
+        db.registrar_pagamento(ids[0], dia.isoformat(), valor * 100, dia.strftime('%Y-%m'),
+                               "Dinheiro", "")
+    db.registrar_pagamento(ids[1], HOJE.isoformat(), 5000, HOJE.strftime('%Y-%m'), "Dinheiro", "")
+    return ids
+
+
+def _paginas(db, atleta_id, limite):
+    paginas, resumos, cursor = [], [], None
+    while True:
+        pagina, resumo, cursor = db.get_historico_pagamentos_atleta(atleta_id, limite=limite,
+                                                                    cursor=cursor)
+        paginas.append(list(zip(pagina['data_pagamento'], pagina['id'])))
+        resumos.append(resumo)
+        if cursor is None:
+            return paginas, resumos
+
+
+def test_paginas_percorrem_o_historico_sem_repetir(db, atletas):
+    paginas, resumos = _paginas(db, atletas[0], limite=3)
+
+    assert [len(pagina) for pagina in paginas] == [3, 3, 1]
+    todos = [linha for pagina in paginas for linha in pagina]
+    # Mais recentes primeiro; no mesmo dia, o id desempata
+    assert todos == sorted(todos, reverse=True) and len(set(todos)) == 7
+    # O resumo é do atleta inteiro, em todas as páginas
+    assert all(resumo == resumos[0] for resumo in resumos)
+    assert (resumos[0]['total_pagamentos'], resumos[0]['valor_total']) == (7, 2800.0)
+    assert (resumos[0]['ultimo_pagamento'], resumos[0]['ultimo_valor']) == (
+        (HOJE - timedelta(days=1)).isoformat(), 700.0)
+
+
+def test_pagamento_novo_nao_desloca_a_pagina_seguinte(db, atletas):
+    primeira, _, cursor = db.get_historico_pagamentos_atleta(atletas[0], limite=3)
+    esperado, _, _ = db.get_historico_pagamentos_atleta(atletas[0], limite=3, cursor=cursor)
+
+    db.registrar_pagamento(atletas[0], HOJE.isoformat(), 800, HOJE.strftime('%Y-%m'), "Dinheiro", "")
+    segunda, resumo, _ = db.get_historico_pagamentos_atleta(atletas[0], limite=3, cursor=cursor)
+
+    assert segunda['id'].tolist() == esperado['id'].tolist()
+    assert resumo['total_pagamentos'] == 8
+
+
+def test_atleta_sem_pagamentos(db, atletas):
+    atleta_id = db.add_atleta("Novo", "", "", None, HOJE.isoformat(), "Mensal", 10000, "")
+
+    pagina, resumo, cursor = db.get_historico_pagamentos_atleta(atleta_id)
+
+    assert pagina.empty and cursor is None
+    assert (resumo['total_pagamentos'], resumo['valor_total']) == (0, 0.0)
+
+
+def test_pagina_segue_o_indice_sem_ordenar(db, atletas):
+    conn = sqlite3.connect(db.db_name)
+    plano = " ".join(linha[-1] for linha in conn.execute('''
+        EXPLAIN QUERY PLAN
+        SELECT id FROM pagamentos
+        WHERE atleta_id = 1 AND (data_pagamento, id) < ('2030-01-01', 99)
+        ORDER BY data_pagamento DESC, id DESC LIMIT 21
+    '''))
+    conn.close()
+
+    assert "idx_pagamentos_atleta_data" in plano
+    assert "TEMP B-TREE" not in plano
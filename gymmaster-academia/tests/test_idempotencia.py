@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+from database import DatabaseManager
+
+CLIQUES = 8
+
+
+@pytest.fixture(params=[(True, False), (False, False), (True, True), (False, True)],
+                ids=["escritor", "direto", "escritor-particionado", "direto-particionado"])
+def banco(request, tmp_path):
+    escritor_unico, particionado = request.param
+    db = DatabaseManager(db_name=str(tmp_path / "academia.db"), tamanho_pool=CLIQUES,
+                         escritor_unico=escritor_unico)
+    if particionado:
+        db.particoes.particionar()
+    yield db
+    db.fechar()
+
+
+def _registrar_em_paralelo(db, atleta_id, chave):
+    """Dispara CLIQUES chamadas simultâneas com a mesma chave; retorna (ids, erros)"""
+    hoje = date.today()
+    largada = threading.Barrier(CLIQUES)
+    ids, erros = [], []
+
+    def clique():
+        largada.wait()
+        try:
+            ids.append(db.registrar_pagamento(atleta_id, hoje.isoformat(), 5000, hoje.strftime('%Y-%m'),
+                                              "Dinheiro", "", chave_idempotencia=chave))
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=clique) for _ in range(CLIQUES)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return ids, erros
+
+
+def test_cliques_simultaneos_gravam_um_pagamento(banco):
+    vencimento = date.today() + timedelta(days=10)
+    atleta_id = banco.add_atleta("Atleta", "", "", None, vencimento.isoformat(), "Mensal", 5000, "")
+
+    ids, erros = _registrar_em_paralelo(banco, atleta_id, "form-1")
+
+    assert erros == []
+    assert len(ids) == CLIQUES and len(set(ids)) == 1
+    conn = sqlite3.connect(banco.db_name)
+    assert conn.execute("SELECT COUNT(*), MIN(id) FROM pagamentos").fetchone() == (1, ids[0])
+    # O vencimento foi estendido uma única vez
+    assert conn.execute("SELECT data_vencimento FROM atletas").fetchone()[0] == \
+        (vencimento + timedelta(days=30)).isoformat()
+    conn.close()
+
+
+def test_chaves_diferentes_e_sem_chave_gravam_todos(banco):
+    hoje = date.today()
+    atleta_id = banco.add_atleta("Atleta", "", "", None, hoje.isoformat(), "Mensal", 5000, "")
+    argumentos = (atleta_id, hoje.isoformat(), 5000, hoje.strftime('%Y-%m'), "Dinheiro", "")
+
+    ids = [banco.registrar_pagamento(*argumentos, chave_idempotencia="a"),
+           banco.registrar_pagamento(*argumentos, chave_idempotencia="b"),
+           banco.registrar_pagamento(*argumentos),
+           banco.registrar_pagamento(*argumentos)]
+
+    assert len(set(ids)) == 4
+    assert len(banco.get_pagamentos()) == 4
@@ -0,0 +1,61 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from database import DatabaseManager
+
+HOJE = date.today()
+
+
+@pytest.fixture(params=[True, False], ids=["escritor", "direto"])
+def banco(request, tmp_path):
+    db = DatabaseManager(db_name=str(tmp_path / "academia.db"), escritor_unico=request.param)
+    yield db
+    db.fechar()
+
+
+def _add(db, dias):
+    return db.add_atleta("Atleta", "", "", None, (HOJE + timedelta(days=dias)).isoformat(),
+                         "Mensal", 10000, "")
+
+
+def _escrita_externa(db, sql):
+    conn = sqlite3.connect(db.db_name)
+    conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+
+def test_escritas_proprias_nao_recarregam(banco):
+    indice = banco.get_indice_acesso()
+    atleta_id = _add(banco, 3)
+    outro = _add(banco, 30)
+    banco.update_atleta(outro, "Outro", "", "", None, (HOJE - timedelta(days=1)).isoformat(),
+                        "Mensal", 10000, "")
+    banco.registrar_pagamento(atleta_id, HOJE.isoformat(), 100, HOJE.strftime('%Y-%m'), "Dinheiro", "")
+    banco.reajustar_valor_em_massa([atleta_id, outro], 10)
+    banco.update_atleta_status()
+
+    assert indice.sincronizar() is False
+    assert indice.verificar(atleta_id)['data_vencimento'] == (HOJE + timedelta(days=33)).isoformat()
+    assert indice.verificar(outro)['decisao'] == 'negar'
+
+    banco.arquivar_atletas([outro])
+    banco.excluir_atleta(atleta_id)
+
+    assert indice.sincronizar() is False
+    assert len(indice) == 0
+
+
+def test_escrita_de_outro_processo_recarrega(banco):
+    indice = banco.get_indice_acesso()
+    atleta_id = _add(banco, 3)
+    _escrita_externa(banco, f"UPDATE atletas SET data_vencimento = '{HOJE + timedelta(days=60)}' "
+                            f"WHERE id = {atleta_id}")
+    # Escrita própria depois da externa: a externa ainda precisa aparecer
+    _add(banco, 5)
+
+    assert indice.sincronizar() is True
+    assert indice.verificar(atleta_id)['dias_restantes'] == 60
+    assert indice.sincronizar() is False
@@ -0,0 +1,104 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from particoes import tabela_particao
+
+HOJE = date.today()
+
+
+def _pagar(db, atleta_id, dia, valor=100, forma="Dinheiro"):
+    return db.registrar_pagamento(atleta_id, dia.isoformat(), valor, dia.strftime('%Y-%m'), forma, "")
+
+
+def _linhas(db, sql, *params):
+    conn = sqlite3.connect(db.db_name)
+    linhas = conn.execute(sql, params).fetchall()
+    conn.close()
+    return linhas
+
+
+@pytest.fixture
+def atleta_id(db):
+    return db.add_atleta("Atleta", "", "", None, (HOJE + timedelta(days=40)).isoformat(),
+                         "Mensal", 10000, "")
+
+
+def test_particionar_move_cada_ano_e_preserva_as_leituras(db, atleta_id):
+    ano_passado = date(HOJE.year - 2, 5, 10)
+    ids = [_pagar(db, atleta_id, ano_passado, 100), _pagar(db, atleta_id, HOJE, 200, "Multicaixa")]
+    excluido = _pagar(db, atleta_id, HOJE, 300)
+    conn = sqlite3.connect(db.db_name)
+    conn.execute("DELETE FROM pagamentos WHERE id = ?", (excluido,))
+    conn.commit()
+    conn.close()
+    periodo = (ano_passado.isoformat(), HOJE.isoformat())
+    antes = (db.get_relatorio_pagamentos(*periodo).to_dict('records'),
+             db.buscar_pagamentos()[1], db.get_historico_pagamentos_atleta(atleta_id)[1])
+
+    anos = db.particoes.particionar()
+
+    assert anos == [ano_passado.year, HOJE.year, HOJE.year + 1]
+    assert _linhas(db, f"SELECT id FROM {tabela_particao(ano_passado.year)}") == [(ids[0],)]
+    assert _linhas(db, f"SELECT id FROM {tabela_particao(HOJE.year)}") == [(ids[1],)]
+    assert _linhas(db, "SELECT type FROM sqlite_master WHERE name = 'pagamentos'") == [('view',)]
+    assert (db.get_relatorio_pagamentos(*periodo).to_dict('records'),
+            db.buscar_pagamentos()[1], db.get_historico_pagamentos_atleta(atleta_id)[1]) == antes
+    # A sequência continua depois do maior id já usado, mesmo excluído
+    assert _pagar(db, atleta_id, HOJE) == excluido + 1
+    assert db.particoes.particionar() == []
+
+
+def test_pagamento_de_ano_novo_cria_a_particao(db, atleta_id):
+    db.particoes.particionar()
+    antigo = date(HOJE.year - 5, 1, 15)
+
+    pagamento_id = _pagar(db, atleta_id, antigo)
+
+    conn = db.get_connection()
+    assert db.particoes.anos(conn)[0] == antigo.year
+    conn.close()
+    assert _linhas(db, f"SELECT id FROM {tabela_particao(antigo.year)}") == [(pagamento_id,)]
+    assert db.get_pagamentos()['id'].tolist() == [pagamento_id]
+
+
+def test_escritas_na_view_sao_roteadas(db, atleta_id):
+    db.particoes.particionar()
+    conn = sqlite3.connect(db.db_name)
+    conn.execute('''
+        INSERT INTO pagamentos (atleta_id, data_pagamento, valor_centavos, mes_referencia)
+        VALUES (?, ?, 5000, ?)
+    ''', (atleta_id, HOJE.isoformat(), HOJE.strftime('%Y-%m')))
+    conn.execute("UPDATE pagamentos SET forma_pagamento = 'Transferência'")
+    conn.commit()
+
+    assert conn.execute(f'''
+        SELECT valor, valor_centavos, forma_pagamento FROM {tabela_particao(HOJE.year)}
+    ''').fetchall() == [(50.0, 5000, 'Transferência')]
+
+    # Sem partição para o ano ou mudando o pagamento de ano: rejeitado
+    with pytest.raises(sqlite3.IntegrityError, match="Sem partição"):
+        conn.execute("INSERT INTO pagamentos (atleta_id, data_pagamento) VALUES (?, '1990-01-01')",
+                     (atleta_id,))
+    with pytest.raises(sqlite3.IntegrityError, match="CHECK"):
+        conn.execute("UPDATE pagamentos SET data_pagamento = ?",
+                     (date(HOJE.year + 1, 1, 1).isoformat(),))
+    conn.rollback()
+
+    conn.execute("DELETE FROM pagamentos")
+    conn.commit()
+    assert conn.execute(f"SELECT COUNT(*) FROM {tabela_particao(HOJE.year)}").fetchone() == (0,)
+    conn.close()
+
+
+def test_fonte_usa_so_as_particoes_do_periodo(db):
+    db.particoes.particionar()
+    conn = db.get_connection()
+
+    fonte = db.particoes.fonte(conn, f"{HOJE.year}-01-01", f"{HOJE.year}-12-31", colunas=['id'])
+    vazia = db.particoes.fonte(conn, "1990-01-01", "1990-12-31", colunas=['id'])
+
+    assert tabela_particao(HOJE.year) in fonte and tabela_particao(HOJE.year + 1) not in fonte
+    assert conn.execute(f"SELECT COUNT(*) FROM {vazia}").fetchone() == (0,)
+    conn.close()
@@ -0,0 +1,75 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from previsao import LIMITES_FATOR_SAZONAL, fatores_sazonais, prever_receita
+
+# Índice sazonal de referência: janeiro fraco, dezembro forte (média 1)
+SAZONAL = np.array([0.8] + [1.0] * 10 + [1.2])
+
+
+def _meses(inicio, quantidade):
+    ano, mes = inicio
+    return [f"{ano + (mes - 1 + i) // 12:04d}-{(mes - 1 + i) % 12 + 1:02d}" for i in range(quantidade)]
+
+
+def test_serie_sazonal_recupera_os_fatores():
+    meses = _meses((2021, 1), 36)
+    totais = np.array([1000 * SAZONAL[int(m[5:7]) - 1] for m in meses])
+
+    np.testing.assert_allclose(fatores_sazonais(meses, totais), SAZONAL)
+
+
+def test_mes_sem_pagamento_conta_como_zero():
+    meses = [m for m in _meses((2021, 1), 36) if m != "2022-06"]
+    totais = np.full(len(meses), 1000.0)
+
+    fatores = fatores_sazonais(meses, totais)
+    assert fatores[5] < fatores[4]
+    assert fatores.mean() == pytest.approx(1.0, abs=0.05)
+
+
+@pytest.mark.parametrize("quantidade", [0, 23])
+def test_historico_curto_nao_tem_sazonalidade(quantidade):
+    meses = _meses((2021, 1), quantidade)
+
+    assert fatores_sazonais(meses, np.arange(1, quantidade + 1) * 1000.0).tolist() == [1.0] * 12
+
+
+def test_fatores_extremos_sao_limitados():
+    meses = _meses((2021, 1), 36)
+    totais = np.array([5000.0 if m.endswith("-12") else 100.0 for m in meses])
+
+    fatores = fatores_sazonais(meses, totais)
+    assert fatores.min() >= LIMITES_FATOR_SAZONAL[0]
+    assert fatores[11] == LIMITES_FATOR_SAZONAL[1]
+
+
+def test_previsao_de_novos_segue_o_mes_previsto(db):
+    # Três anos com um atleta novo por mês; dezembro rende 30% a mais
+    for mes in _meses((2021, 11), 36):
+        valor = 130 if mes.endswith("-12") else 100
+        atleta_id = db.add_atleta(f"Atleta {mes}", "", "", None, f"{mes}-01", "Mensal", valor, "")
+        db.registrar_pagamento(atleta_id, f"{mes}-05", valor, mes, "Dinheiro", "")
+
+    previsao = prever_receita(db, date(2024, 11, 10))
+
+    # Os últimos meses (sem dezembro) dessazonalizados e reaplicados a dezembro
+    assert previsao['proximo_mes']['mes'] == "2024-12"
+    assert previsao['proximo_mes']['receita_novos'] == pytest.approx(130, rel=1e-6)
+    assert previsao['proximo_mes']['fator_sazonal'] > 1 > previsao['mes_atual']['fator_sazonal']
+
+
+def test_renovacao_que_vence_de_novo_no_periodo(db):
+    db.add_atleta("Junho", "", "", None, "2024-06-20", "Mensal", 100, "")
+    db.add_atleta("Julho", "", "", None, "2024-07-15", "Mensal", 200, "")
+
+    previsao = prever_receita(db, date(2024, 6, 10))
+
+    # Sem histórico de churn, vale a taxa padrão (0,8)
+    assert previsao['taxa_renovacao'] == 0.8
+    assert previsao['mes_atual']['receita_renovacoes'] == pytest.approx(80)
+    # Julho: a renovação de 20/06 vence de novo em 20/07 (0,8²) mais a de 15/07
+    assert previsao['proximo_mes']['renovacoes_previstas'] == pytest.approx(0.64 + 0.8)
+    assert previsao['proximo_mes']['receita_renovacoes'] == pytest.approx(64 + 160)
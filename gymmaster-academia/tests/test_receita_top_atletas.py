@@ -0,0 +1,15 @@
+from datetime import date
+
+
+def test_outros_so_aparece_quando_sobram_atletas(db):
+    hoje = date.today()
+    for valor in (300, 100, 200):
+        atleta_id = db.add_atleta(f"Atleta {valor}", "", "", None, hoje.isoformat(), "Mensal", 10000, "")
+        db.registrar_pagamento(atleta_id, hoje.isoformat(), valor, hoje.strftime('%Y-%m'), "Dinheiro", "")
+
+    top = db.get_receita_top_atletas(limite=1)
+    assert top[['rotulo', 'valor']].values.tolist() == [["Atleta 300 (#1)", 300], ["Outros", 300]]
+
+    todos = db.get_receita_top_atletas(limite=3)
+    assert todos['valor'].tolist() == [300, 200, 100]
+    assert "Outros" not in todos['rotulo'].tolist()
@@ -0,0 +1,103 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from filiais import RoteadorFiliais
+from relatorios import MotorRelatorios
+
+HOJE = date.today()
+ANTIGO = HOJE.year - 3
+
+
+@pytest.fixture
+def roteador(tmp_path):
+    roteador = RoteadorFiliais(db_name=str(tmp_path / "academia.db"), pasta=str(tmp_path / "filiais"))
+    yield roteador
+    for db, _ in roteador._abertas.values():
+        db.fechar()
+
+
+@pytest.fixture
+def motor(roteador):
+    motor = MotorRelatorios(roteador, max_processos=2)
+    yield motor
+    motor.fechar()
+
+
+def _pagar(db, atleta_id, dia, valor, forma):
+    db.registrar_pagamento(atleta_id, dia.isoformat(), valor, dia.strftime('%Y-%m'), forma, "")
+
+
+@pytest.fixture
+def filiais(roteador):
+    """Principal com um ano arquivado e um retroativo na tabela; Centro só com o ano atual"""
+    centro = roteador.criar_filial("Centro")
+    principal = roteador.obter(1)
+    atleta_id = principal.add_atleta("Atleta", "", "", None, HOJE.isoformat(), "Mensal", 10000, "")
+    for dia, valor, forma in ((date(ANTIGO, 3, 5), 100, "Dinheiro"),
+                              (date(ANTIGO, 3, 5), 200, "Dinheiro"),
+                              (date(ANTIGO, 3, 9), 300, None)):
+        _pagar(principal, atleta_id, dia, valor, forma)
+    principal.arquivo.arquivar_ano(ANTIGO)
+    # Retroativos depois do arquivamento: os mesmos grupos, parte na tabela
+    _pagar(principal, atleta_id, date(ANTIGO, 3, 20), 400, "Dinheiro")
+    _pagar(principal, atleta_id, date(ANTIGO, 3, 21), 500, None)
+
+    outro = roteador.obter(centro)
+    atleta_id = outro.add_atleta("Atleta", "", "", None, HOJE.isoformat(), "Mensal", 10000, "")
+    _pagar(outro, atleta_id, HOJE, 700, "Multicaixa")
+    return centro
+
+
+def _linhas(receita):
+    return sorted(receita.fillna({'forma_pagamento': ''}).itertuples(index=False, name=None))
+
+
+@pytest.mark.parametrize("modo", ["attach", "processos"])
+def test_arquivo_e_tabela_somam_no_mesmo_grupo(motor, filiais, modo):
+    receita, usado = motor.receita_consolidada(date(ANTIGO, 1, 1), HOJE, modo=modo)
+
+    assert usado == modo
+    # Sem forma: NULL na tabela e '' no resumo arquivado caem no mesmo grupo
+    assert _linhas(receita) == [
+        ("Centro", HOJE.strftime('%Y-%m'), "Multicaixa", 700.0, 1),
+        ("Principal", f"{ANTIGO}-03", "", 800.0, 2),
+        ("Principal", f"{ANTIGO}-03", "Dinheiro", 700.0, 3),
+    ]
+
+
+def test_periodo_filtra_o_resumo_por_dia(motor, filiais):
+    receita, _ = motor.receita_consolidada(date(ANTIGO, 3, 6), date(ANTIGO, 3, 20), modo='attach')
+
+    assert _linhas(receita) == [
+        ("Principal", f"{ANTIGO}-03", "", 300.0, 1),
+        ("Principal", f"{ANTIGO}-03", "Dinheiro", 400.0, 1),
+    ]
+
+
+def test_filial_sem_resumo_arquivado(roteador, motor, filiais):
+    # Banco de filial de uma versão anterior ao arquivo: só a tabela é lida
+    conn = sqlite3.connect(roteador._arquivo_filial(filiais))
+    conn.execute("DROP TABLE pagamentos_arquivados_por_dia")
+    conn.commit()
+    conn.close()
+
+    for modo in ("attach", "processos"):
+        receita, _ = motor.receita_consolidada(HOJE - timedelta(days=1), HOJE, modo=modo)
+        assert _linhas(receita) == [("Centro", HOJE.strftime('%Y-%m'), "Multicaixa", 700.0, 1)]
+
+
+def test_resumo_por_dia_bate_com_o_catalogo(roteador, filiais):
+    db = roteador.obter(1)
+    conn = sqlite3.connect(db.db_name)
+    por_dia = conn.execute('''
+        SELECT data_pagamento, forma_pagamento, quantidade, total_centavos
+        FROM pagamentos_arquivados_por_dia ORDER BY 1, 2
+    ''').fetchall()
+    conn.close()
+
+    assert por_dia == [(f"{ANTIGO}-03-05", "Dinheiro", 2, 30000), (f"{ANTIGO}-03-09", "", 1, 30000)]
+    catalogo = db.arquivo.anos_arquivados().iloc[0]
+    assert catalogo['linhas'] == sum(linha[2] for linha in por_dia)
+    assert catalogo['valor_total'] * 100 == sum(linha[3] for linha in por_dia)